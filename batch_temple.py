@@ -0,0 +1,315 @@
+import numpy as np
+from temple import ValidRoomType, ROOM_CONNECTIONS
+from strategy_spec import StrategySpec, UPGRADE, SIDEGRADE, SIDEGRADE_NO_T0, DEFAULT_TARGET_ROOMS, get_strategy_spec
+
+ROOM_TYPES: list[ValidRoomType] = list(ValidRoomType)
+NUM_ROOMS = len(ROOM_CONNECTIONS)
+NUM_ROOM_TYPES = len(ROOM_TYPES)
+EMPTY = -1
+NEXUS = ROOM_TYPES.index(ValidRoomType.ADJACENT_ROOM_LEVELS)
+
+ADJACENCY = np.zeros((NUM_ROOMS, NUM_ROOMS), dtype=bool)
+for _room, _connections in enumerate(ROOM_CONNECTIONS):
+    ADJACENCY[_room, list(_connections)] = True
+
+def _sample_positions(rng: np.random.Generator, mask: np.ndarray, count: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Samples up to count distinct positions per row from the True entries of mask, in random order.
+
+    :param rng: The numpy Generator to draw from.
+    :param mask: 2D bool array of positions that may be sampled.
+    :param count: How many positions to sample per row.
+    :return: The sampled positions and whether each sampled position is valid (rows may have fewer than count).
+    """
+    keys = rng.random(mask.shape)
+    keys[~mask] = np.inf
+    order = np.argsort(keys, axis=1)[:, :count]
+    return order, np.take_along_axis(mask, order, axis=1)
+
+
+class BatchTemple:
+    def __init__(self, num_temples: int,
+                 rng: np.random.Generator,
+                 num_starting_tiered_rooms: int = 7,
+                 desired_room: None | ValidRoomType = None,
+                 start_with_desired_room: bool = False):
+        """
+        num_temples temples of Atzoatl stored as struct-of-arrays. Room tiers and room types are (num_temples, 11)
+        arrays, the room types remaining are a (num_temples, 25) bool mask. Room types are stored as their index in
+        ValidRoomType, with EMPTY for un-tiered rooms. Follows the same rules as Temple.
+
+        :param num_temples: How many temples to simulate at once.
+        :param rng: The numpy Generator used for every random draw.
+        :param num_starting_tiered_rooms: How many rooms to start at tier 1.
+        :param desired_room: The desired T3 room for these temples.
+        :param start_with_desired_room: controls whether these temples start with a T1 version of the desired room.
+        """
+        self.rng = rng
+        self.tiers = np.zeros((num_temples, NUM_ROOMS), dtype=np.int8)
+        self.types = np.full((num_temples, NUM_ROOMS), EMPTY, dtype=np.int8)
+        self.remaining = np.ones((num_temples, NUM_ROOM_TYPES), dtype=bool)
+        rows = np.arange(num_temples)[:, None]
+        rooms_to_tier, _ = _sample_positions(rng, np.ones((num_temples, NUM_ROOMS), dtype=bool),
+                                             num_starting_tiered_rooms)
+        starting_room_types_remaining = np.ones((num_temples, NUM_ROOM_TYPES), dtype=bool)
+        num_sampled_types = num_starting_tiered_rooms
+        if desired_room is not None:
+            starting_room_types_remaining[:, ROOM_TYPES.index(desired_room)] = False
+            if start_with_desired_room:
+                num_sampled_types -= 1
+        rooms_to_tier_types, _ = _sample_positions(rng, starting_room_types_remaining, num_sampled_types)
+        if desired_room is not None and start_with_desired_room:
+            desired_column = np.full((num_temples, 1), ROOM_TYPES.index(desired_room))
+            rooms_to_tier_types = np.concatenate((desired_column, rooms_to_tier_types), axis=1)
+        self.tiers[rows, rooms_to_tier] = 1
+        self.types[rows, rooms_to_tier] = rooms_to_tier_types
+        self.remaining[rows, rooms_to_tier_types] = False
+
+    def __len__(self):
+        return self.tiers.shape[0]
+
+    def get_room_upgrade_options(self, rows: np.ndarray, two_options: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Draws upgrade options for the given temples, like Temple.get_room_upgrade_option.
+
+        :param rows: Indices of the temples to draw for.
+        :param two_options: Per row, whether two options are drawn (the room is T0) instead of one.
+        :return: The first and second option for each row. The second option is EMPTY when only one is drawn.
+        """
+        options, _ = _sample_positions(self.rng, self.remaining[rows], 2)
+        return options[:, 0], np.where(two_options, options[:, 1], EMPTY)
+
+    def upgrade_rooms(self, rows: np.ndarray, rooms: np.ndarray, new_room_types: np.ndarray, rr: bool = False):
+        """
+        Upgrades one room per given temple, like Temple.upgrade_room.
+
+        :param rows: Indices of the temples to upgrade a room in.
+        :param rooms: The room number to upgrade for each row.
+        :param new_room_types: The room type for each upgraded room to be changed to.
+        :param rr: Is Resource Reallocation active.
+        :return: None
+        """
+        old_room_types = self.types[rows, rooms]
+        old_tiers = self.tiers[rows, rooms]
+        self.remaining[rows, new_room_types] = False
+        sidegraded = (old_room_types != EMPTY) & (old_room_types != new_room_types)
+        self.remaining[rows[sidegraded], old_room_types[sidegraded]] = True
+        upgrade_amount = np.ones(len(rows), dtype=np.int8)
+        if rr:
+            rolled = (new_room_types == old_room_types) & (old_tiers == 1)
+            upgrade_amount += rolled & (self.rng.random(len(rows)) < 0.5)
+        self.tiers[rows, rooms] = old_tiers + upgrade_amount
+        self.types[rows, rooms] = new_room_types
+
+    def apply_nexus(self):
+        """
+        Updates the room tiers adjacent to an "Adjacent Room Levels" room in every temple, like Temple.apply_nexus.
+
+        :return: None
+        """
+        is_nexus = self.types == NEXUS
+        rows = np.nonzero(is_nexus.any(axis=1))[0]
+        nexus_rooms = is_nexus[rows].argmax(axis=1)
+        nexus_tiers = self.tiers[rows, nexus_rooms]
+        tiers = self.tiers[rows]
+        connections_to_upgrade = ADJACENCY[nexus_rooms] & (tiers > 0)
+        needs_sample = (nexus_tiers < 3) & (nexus_tiers < connections_to_upgrade.sum(axis=1))
+        keys = self.rng.random(connections_to_upgrade.shape)
+        keys[~connections_to_upgrade] = np.inf
+        rank = np.argsort(np.argsort(keys, axis=1), axis=1)
+        connections_to_upgrade &= ~needs_sample[:, None] | (rank < nexus_tiers[:, None])
+        self.tiers[rows] = tiers + (connections_to_upgrade & (tiers < 3))
+
+    def target_positions(self, target_ids: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """
+        Returns the room number of every target room type in the given temples, or EMPTY if it isn't present.
+
+        :param target_ids: The target room type indices.
+        :param rows: Indices of the temples to look in.
+        :return: (len(rows), len(target_ids)) array of room numbers.
+        """
+        matches = self.types[rows][:, :, None] == target_ids[None, None, :]
+        return np.where(matches.any(axis=1), matches.argmax(axis=1), EMPTY)
+
+
+def _in_options(room_type, first_option: np.ndarray, second_option: np.ndarray) -> np.ndarray:
+    return (first_option == room_type) | (second_option == room_type)
+
+
+def _prio_upgrade_unless_target(temples: BatchTemple, rows, room_types, tiers, target_ids) -> np.ndarray:
+    first_option, second_option = temples.get_room_upgrade_options(rows, tiers == 0)
+    room_type = np.where(room_types == EMPTY, first_option, room_types)
+    for target_id in target_ids:
+        room_type = np.where(_in_options(target_id, first_option, second_option), target_id, room_type)
+    return room_type
+
+
+def _prio_sidegrade_unless_target(temples: BatchTemple, rows, room_types, tiers, target_ids) -> np.ndarray:
+    first_option, second_option = temples.get_room_upgrade_options(rows, tiers == 0)
+    room_type = np.where(np.isin(room_types, target_ids), room_types, first_option)
+    for target_id in target_ids:
+        room_type = np.where((tiers == 0) & _in_options(target_id, first_option, second_option), target_id, room_type)
+    return room_type
+
+
+def _prio_sidegrade_unless_target_no_t0(temples: BatchTemple, rows, room_types, tiers, target_ids) -> np.ndarray:
+    first_option, second_option = temples.get_room_upgrade_options(rows, tiers == 0)
+    removed = np.full(len(rows), EMPTY)
+    for target_id in target_ids:
+        removed = np.where((removed == EMPTY) & _in_options(target_id, first_option, second_option),
+                           target_id, removed)
+    room_type = np.where(first_option == removed, second_option, first_option)
+    tiered = np.nonzero(tiers != 0)[0]
+    room_type[tiered] = _prio_sidegrade_unless_target(temples, rows[tiered], room_types[tiered], tiers[tiered],
+                                                      target_ids)
+    return room_type
+
+
+_DECISIONS = {
+    UPGRADE: _prio_upgrade_unless_target,
+    SIDEGRADE: _prio_sidegrade_unless_target,
+    SIDEGRADE_NO_T0: _prio_sidegrade_unless_target_no_t0,
+}
+
+
+def _decide(strategy: StrategySpec, temples: BatchTemple, rows, rooms, target_ids) -> np.ndarray:
+    """
+    Picks the new room type for each (temple, room) pair, mirroring the up_room_logic functions used by strategy.
+    """
+    room_types = temples.types[rows, rooms].astype(np.intp)
+    tiers = temples.tiers[rows, rooms]
+    decision = np.full(len(rows), strategy.decision, dtype=object)
+    if strategy.upgrade_once_target_exists and len(target_ids):
+        target_exists = ~temples.remaining[rows][:, target_ids].all(axis=1)
+        decision[target_exists] = UPGRADE
+    new_room_types = np.empty(len(rows), dtype=np.intp)
+    undecided = np.ones(len(rows), dtype=bool)
+    if strategy.prio_nexus:
+        room_is_target = np.isin(room_types, target_ids)
+        new_room_types[room_is_target] = room_types[room_is_target]
+        undecided = ~room_is_target
+        drawn = np.nonzero(undecided)[0]
+        first_option, second_option = temples.get_room_upgrade_options(rows[drawn], tiers[drawn] == 0)
+        target_rooms = temples.target_positions(target_ids, rows[drawn])
+        target_adjacent = (ADJACENCY[rooms[drawn][:, None], target_rooms] & (target_rooms != EMPTY)).any(axis=1)
+        nexus_is_upgrade_option = _in_options(NEXUS, first_option, second_option) | (room_types[drawn] == NEXUS)
+        nexus_chosen = drawn[nexus_is_upgrade_option & target_adjacent]
+        new_room_types[nexus_chosen] = NEXUS
+        undecided[nexus_chosen] = False
+    for decision_name, decision_func in _DECISIONS.items():
+        selected = np.nonzero(undecided & (decision == decision_name))[0]
+        if len(selected):
+            new_room_types[selected] = decision_func(temples, rows[selected], room_types[selected], tiers[selected],
+                                                     target_ids)
+    return new_room_types
+
+
+def run_batch(strategy: StrategySpec, temples: BatchTemple,
+              target_rooms: None | list[ValidRoomType] = None,
+              aotv: bool = False,
+              rr: bool = False) -> BatchTemple:
+    """
+    Runs every temple in temples with the given strategy, and applies the nexus at the end.
+
+    :param strategy: The StrategySpec to run the temples with.
+    :param temples: The BatchTemple to run.
+    :param target_rooms: The desired target rooms. Defaults to DEFAULT_TARGET_ROOMS, like the run_t_* functions.
+    :param aotv: Whether Artefacts of the Vaal is active.
+    :param rr: Whether Resource Reallocation is active.
+    :return: The completed BatchTemple.
+    """
+    if target_rooms is None:
+        target_rooms = DEFAULT_TARGET_ROOMS
+    if not isinstance(target_rooms, list):
+        target_rooms = [target_rooms]
+    if not strategy.use_target_rooms:
+        target_rooms = []
+    target_ids = np.array([ROOM_TYPES.index(room) for room in target_rooms if room is not None], dtype=np.intp)
+    incurs_per_area, num_areas = (4, 3) if aotv else (3, 4)
+    incursions_remaining = np.full(len(temples), incurs_per_area * num_areas)
+    areas_remaining = num_areas
+    while incursions_remaining.any() and (strategy.early_stop or areas_remaining > 0):
+        areas_remaining -= 1
+        picked_rooms, picked = _sample_positions(temples.rng, temples.tiers < 3, incurs_per_area)
+        incursions_remaining[~picked[:, 0]] = 0
+        in_area = incursions_remaining > 0
+        area_size = np.minimum(incursions_remaining, incurs_per_area)
+        for incursion in range(incurs_per_area):
+            rows = np.nonzero(in_area & picked[:, incursion] & (incursion < area_size))[0]
+            if len(rows) == 0:
+                break
+            rooms = picked_rooms[rows, incursion]
+            new_room_types = _decide(strategy, temples, rows, rooms, target_ids)
+            temples.upgrade_rooms(rows, rooms, new_room_types, rr=rr)
+            incursions_remaining[rows] -= 1
+            if strategy.early_stop:
+                in_area[rows[np.isin(new_room_types, target_ids)]] = False
+    temples.apply_nexus()
+    return temples
+
+
+def _batches(num_runs: int, batch_size: int):
+    while num_runs > 0:
+        yield min(batch_size, num_runs)
+        num_runs -= batch_size
+
+
+def batch_calc_ratio_t3_rooms(run_method_func,
+                              num_runs: int = 100000,
+                              aotv: bool = False,
+                              rr: bool = False,
+                              batch_size: int = 100000,
+                              seed: int | None = None) -> float:
+    """
+    Vectorized equivalent of main.calc_ratio_t3_rooms.
+
+    :param run_method_func: The run_t_* function (or a StrategySpec) to use for running the temples.
+    :param num_runs: How many temple runs to do.
+    :param aotv: Whether Artefacts of the Vaal is active.
+    :param rr: Whether Resource Reallocation is active.
+    :param batch_size: How many temples to simulate at once.
+    :param seed: Seed for the numpy Generator.
+    :return: The ratio of T3 rooms.
+    """
+    strategy = get_strategy_spec(run_method_func)
+    rng = np.random.default_rng(seed)
+    t3_rooms = 0
+    for size in _batches(num_runs, batch_size):
+        temples = run_batch(strategy, BatchTemple(size, rng), aotv=aotv, rr=rr)
+        t3_rooms += np.count_nonzero(temples.tiers == 3)
+    return round(t3_rooms / (num_runs * NUM_ROOMS), 4)
+
+
+def batch_calc_ratio_target_t3_rooms(run_method_func,
+                                     target_rooms: list[ValidRoomType],
+                                     initial_room: ValidRoomType | None = None,
+                                     start_with_initial_room: bool = False,
+                                     num_runs: int = 100000,
+                                     aotv: bool = False,
+                                     batch_size: int = 100000,
+                                     seed: int | None = None) -> float:
+    """
+    Vectorized equivalent of main.calc_ratio_target_t3_rooms. rr is assumed active.
+
+    :param run_method_func: The run_t_* function (or a StrategySpec) to use for running the temples.
+    :param target_rooms: The desired target rooms.
+    :param initial_room: Which room to start the temple with or not, depending on start_with_initial_room.
+    :param start_with_initial_room: Controls whether the room specified by initial_room starts in the temple.
+    :param num_runs: How many temple runs to do.
+    :param aotv: Whether Artefacts of the Vaal is active.
+    :param batch_size: How many temples to simulate at once.
+    :param seed: Seed for the numpy Generator.
+    :return: The ratio of T3 desired target rooms.
+    """
+    strategy = get_strategy_spec(run_method_func)
+    if not isinstance(target_rooms, list):
+        target_rooms = [target_rooms]
+    target_ids = np.array([ROOM_TYPES.index(room) for room in target_rooms], dtype=np.intp)
+    rng = np.random.default_rng(seed)
+    successes = 0
+    for size in _batches(num_runs, batch_size):
+        temples = BatchTemple(size, rng, desired_room=initial_room, start_with_desired_room=start_with_initial_room)
+        run_batch(strategy, temples, target_rooms=target_rooms, aotv=aotv, rr=True)
+        successes += np.count_nonzero(((temples.types[:, :, None] == target_ids) & (temples.tiers[:, :, None] == 3))
+                                      .any(axis=(1, 2)))
+    return round(successes / num_runs, 4)
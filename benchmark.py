@@ -0,0 +1,250 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+from time import perf_counter
+import main
+from strategy_spec import DEFAULT_TARGET_ROOMS
+from temple import Temple, ValidRoomType
+from up_room_logic import (prio_upgrade_unless_target,
+                           prio_sidegrade_unless_target,
+                           prio_sidegrade_unless_target_no_t0,
+                           prio_adjacent_nexus)
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+# A benchmark regresses when its median latency grows by more than this fraction of the baseline's. The median is
+# used rather than the throughput, which GC pauses and other outliers make noisy.
+DEFAULT_THRESHOLD = 0.1
+PERCENTILES = (50, 90, 99)
+
+
+class BenchmarkResult:
+    def __init__(self, name: str, num_calls: int, total_seconds: float, percentiles: dict[int, float]):
+        """
+        The timings of one benchmark.
+
+        :param name: The name of the benchmark.
+        :param num_calls: How many calls were timed.
+        :param total_seconds: The time spent in the timed calls.
+        :param percentiles: Percentile -> per-call latency in seconds.
+        """
+        self.name = name
+        self.num_calls = num_calls
+        self.total_seconds = total_seconds
+        self.percentiles = percentiles
+
+    @property
+    def calls_per_second(self) -> float:
+        """
+        The throughput of the benchmark. For run_t_* benchmarks, one call is one temple.
+        """
+        return self.num_calls / self.total_seconds if self.total_seconds else float('inf')
+
+    def to_dict(self) -> dict:
+        return {'num_calls': self.num_calls,
+                'total_seconds': self.total_seconds,
+                'percentiles': {str(percentile): latency for percentile, latency in self.percentiles.items()}}
+
+    @classmethod
+    def from_dict(cls, name: str, data: dict):
+        return cls(name,
+                   data['num_calls'],
+                   data['total_seconds'],
+                   {int(percentile): latency for percentile, latency in data['percentiles'].items()})
+
+    def __repr__(self):
+        latencies = '  '.join(f"p{percentile} {latency * 1e6:8.1f}us"
+                              for percentile, latency in self.percentiles.items())
+        return f"{self.name:<82} {self.calls_per_second:>12,.0f}/s  {latencies}"
+
+
+def _percentile(sorted_latencies: list[float], percentile: int) -> float:
+    index = min(len(sorted_latencies) - 1, round(percentile / 100 * (len(sorted_latencies) - 1)))
+    return sorted_latencies[index]
+
+
+def time_calls(name: str, setup, call, num_calls: int, repeat: int = 3, warmup: int = 100) -> BenchmarkResult:
+    """
+    Times num_calls calls of call, each on a fresh argument from setup. Only the calls themselves are timed. Like
+    timeit, the timing is repeated and the fastest repeat (by median latency) is kept, as slower repeats measure
+    interference from the rest of the machine rather than the code.
+
+    :param name: The name of the benchmark.
+    :param setup: Function returning the argument of one call.
+    :param call: The function to time, taking setup's result.
+    :param num_calls: How many calls to time per repeat.
+    :param repeat: How many times to repeat the timing.
+    :param warmup: How many untimed calls to make first.
+    :return: BenchmarkResult
+    """
+    for _ in range(warmup):
+        call(setup())
+    best = None
+    for _ in range(repeat):
+        latencies = []
+        for _ in range(num_calls):
+            argument = setup()
+            start = perf_counter()
+            call(argument)
+            latencies.append(perf_counter() - start)
+        total_seconds = sum(latencies)
+        latencies.sort()
+        result = BenchmarkResult(name,
+                                 num_calls,
+                                 total_seconds,
+                                 {percentile: _percentile(latencies, percentile) for percentile in PERCENTILES})
+        if best is None or result.percentiles[50] < best.percentiles[50]:
+            best = result
+    return best
+
+
+def _random_room(temple: Temple):
+    return temple, random.choice(temple.valid_rooms_remaining)
+
+
+def _upgrade_random_room(temple_and_room):
+    temple, room = temple_and_room
+    new_room_type = room.type if room.type is not None else temple.get_room_upgrade_option()[0]
+    temple.upgrade_room(room, new_room_type, rr=True)
+
+
+def _nexus_temple() -> Temple:
+    return Temple(desired_room=ValidRoomType.ADJACENT_ROOM_LEVELS, start_with_desired_room=True)
+
+
+def strategies() -> dict:
+    """
+    Returns every run_t_* function of main, by name.
+
+    :return: dict
+    """
+    return {name: value for name, value in vars(main).items() if name.startswith('run_t_') and callable(value)}
+
+
+def run_benchmarks(num_calls: int = 20000,
+                   num_temples: int = 2000,
+                   repeat: int = 3,
+                   seed=0) -> dict[str, BenchmarkResult]:
+    """
+    Times temple construction, Temple.reset, upgrade_room, apply_nexus, every up_room_logic decision function, and
+    every run_t_* strategy with and without aotv and rr. The global RNG is seeded before each benchmark, so every
+    benchmark does the same work on every run.
+
+    :param num_calls: How many calls to time per temple method and decision function.
+    :param num_temples: How many temples to run per strategy benchmark.
+    :param repeat: How many times to repeat each benchmark, see time_calls.
+    :param seed: The seed of the benchmarks.
+    :return: Benchmark name -> BenchmarkResult
+    """
+    target_rooms = DEFAULT_TARGET_ROOMS
+    temple = Temple()
+    benchmarks = [('temple.Temple', lambda: None, lambda _: Temple(), num_calls),
+                  ('temple.Temple.reset', lambda: temple, Temple.reset, num_calls),
+                  ('temple.Temple.upgrade_room', lambda: _random_room(Temple()), _upgrade_random_room, num_calls),
+                  ('temple.Temple.apply_nexus', _nexus_temple, Temple.apply_nexus, num_calls)]
+    for decision in (prio_upgrade_unless_target, prio_sidegrade_unless_target, prio_sidegrade_unless_target_no_t0):
+        benchmarks.append((f"up_room_logic.{decision.__name__}",
+                           lambda: _random_room(Temple()),
+                           lambda temple_and_room, decision=decision: decision(temple=temple_and_room[0],
+                                                                               room=temple_and_room[1],
+                                                                               target_rooms=target_rooms),
+                           num_calls))
+    benchmarks.append(("up_room_logic.prio_adjacent_nexus",
+                       lambda: _random_room(Temple()),
+                       lambda temple_and_room: prio_adjacent_nexus(default_decision=prio_upgrade_unless_target,
+                                                                   temple=temple_and_room[0],
+                                                                   room=temple_and_room[1],
+                                                                   target_rooms=target_rooms),
+                       num_calls))
+    for name, run_method_func in strategies().items():
+        for aotv in (False, True):
+            for rr in (False, True):
+                benchmarks.append((f"main.{name}[aotv={aotv},rr={rr}]",
+                                   lambda: None,
+                                   lambda _, run_method_func=run_method_func, aotv=aotv, rr=rr:
+                                   run_method_func(Temple(), target_rooms=target_rooms, aotv=aotv, rr=rr),
+                                   num_temples))
+    results = {}
+    for name, setup, call, count in benchmarks:
+        random.seed(f"{seed}/{name}")
+        results[name] = time_calls(name, setup, call, count, repeat=repeat)
+    return results
+
+
+def save_baseline(results: dict[str, BenchmarkResult], path: str = BASELINE_FILE):
+    """
+    Saves benchmark results as a JSON baseline.
+
+    :param results: Benchmark name -> BenchmarkResult, as returned by run_benchmarks.
+    :param path: The file to save to.
+    """
+    data = {'python': platform.python_version(),
+            'machine': platform.machine(),
+            'benchmarks': {name: result.to_dict() for name, result in results.items()}}
+    with open(path, 'w') as file:
+        json.dump(data, file, indent=2)
+
+
+def load_baseline(path: str = BASELINE_FILE) -> dict[str, BenchmarkResult]:
+    """
+    Loads a JSON baseline saved by save_baseline.
+
+    :param path: The file to load.
+    :return: Benchmark name -> BenchmarkResult
+    """
+    with open(path) as file:
+        data = json.load(file)
+    return {name: BenchmarkResult.from_dict(name, result) for name, result in data['benchmarks'].items()}
+
+
+def compare(baseline: dict[str, BenchmarkResult],
+            results: dict[str, BenchmarkResult],
+            threshold: float = DEFAULT_THRESHOLD) -> tuple[str, list[str]]:
+    """
+    Compares benchmark results to a baseline. Benchmarks missing from either side are skipped.
+
+    :param baseline: Benchmark name -> BenchmarkResult of the baseline.
+    :param results: Benchmark name -> BenchmarkResult of the current code.
+    :param threshold: The fraction of the baseline's median latency a benchmark may gain before it counts as a
+    regression.
+    :return: (a report of the median latency change of every benchmark, the names of the regressed benchmarks)
+    """
+    lines = []
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before, after = baseline[name].percentiles[50], result.percentiles[50]
+        change = after / before - 1
+        regressed = change > threshold
+        if regressed:
+            regressions.append(name)
+        lines.append(f"{name:<82} p50 {before * 1e6:8.1f}us -> {after * 1e6:8.1f}us  {change:+7.1%}"
+                     f"{'  REGRESSION' if regressed else ''}")
+    return '\n'.join(lines), regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the temple simulator.")
+    parser.add_argument('--calls', type=int, default=20000, help="calls per temple method and decision function")
+    parser.add_argument('--temples', type=int, default=2000, help="temples per strategy benchmark")
+    parser.add_argument('--repeat', type=int, default=3, help="repeats per benchmark, the fastest is kept")
+    parser.add_argument('--save', nargs='?', const=BASELINE_FILE, help="save the results as a baseline")
+    parser.add_argument('--compare', nargs='?', const=BASELINE_FILE, help="compare the results to a baseline")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="median latency growth counted as a regression")
+    args = parser.parse_args()
+    benchmark_results = run_benchmarks(num_calls=args.calls, num_temples=args.temples, repeat=args.repeat)
+    for benchmark_result in benchmark_results.values():
+        print(benchmark_result)
+    if args.compare:
+        report, regressed = compare(load_baseline(args.compare), benchmark_results, args.threshold)
+        print(f"\n### Compared to {args.compare}:")
+        print(report)
+        if regressed:
+            print(f"\n{len(regressed)} benchmark(s) regressed by more than {args.threshold:.0%}.")
+            sys.exit(1)
+    if args.save:
+        save_baseline(benchmark_results, args.save)
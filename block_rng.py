@@ -0,0 +1,99 @@
+import numpy as np
+
+DEFAULT_BLOCK_SIZE = 4096
+
+
+class BlockRNG:
+    def __init__(self, seed=None, block_size: int = DEFAULT_BLOCK_SIZE, generator: np.random.Generator | None = None):
+        """
+        A source of randomness for Temple and the drivers of main, with the sample, randint and randrange methods of
+        random.Random. Draws come from a numpy Generator in blocks of block_size uniform floats, generated at once and
+        handed out one by one, so each draw costs a list lookup rather than a call into the random module. A draw
+        below n is int(u * n), biased by at most n / 2**53.
+
+        Unlike the random module's global state, every BlockRNG is its own stream: the same seed always gives the same
+        draws, and spawn gives independent child streams, e.g. one per worker process.
+
+        :param seed: The seed of the stream, anything numpy.random.default_rng takes. None seeds from the OS.
+        :param block_size: How many uniform floats to generate at once.
+        :param generator: The numpy Generator to draw from. Overrides seed.
+        """
+        self.generator = generator if generator is not None else np.random.default_rng(seed)
+        self.block_size = block_size
+        self._block: list[float] = []
+        self._position = 0
+
+    def _refill(self):
+        self._block = self.generator.random(self.block_size).tolist()
+        self._position = 0
+
+    def random(self) -> float:
+        """
+        Returns a uniform float in [0, 1).
+
+        :return: float
+        """
+        if self._position == len(self._block):
+            self._refill()
+        u = self._block[self._position]
+        self._position += 1
+        return u
+
+    def randrange(self, stop: int) -> int:
+        """
+        Returns a uniform int in [0, stop).
+
+        Raises ValueError if stop isn't positive.
+
+        :param stop: The exclusive upper bound.
+        :return: int
+        """
+        if stop <= 0:
+            raise ValueError(f"empty range for randrange({stop}).")
+        if self._position == len(self._block):
+            self._refill()
+        u = self._block[self._position]
+        self._position += 1
+        return int(u * stop)
+
+    def randint(self, a: int, b: int) -> int:
+        """
+        Returns a uniform int in [a, b], both included.
+
+        :param a: The lower bound.
+        :param b: The upper bound.
+        :return: int
+        """
+        return a + self.randrange(b - a + 1)
+
+    def sample(self, population, k: int) -> list:
+        """
+        Returns k distinct random elements of population, in random order, by a partial Fisher-Yates shuffle.
+
+        Raises ValueError if k is negative or larger than the population.
+
+        :param population: A sequence, e.g. a list or a range.
+        :param k: How many elements to sample.
+        :return: list
+        """
+        pool = list(population)
+        n = len(pool)
+        if not 0 <= k <= n:
+            raise ValueError("sample larger than population or is negative.")
+        for i in range(k):
+            j = i + self.randrange(n - i)
+            pool[i], pool[j] = pool[j], pool[i]
+        return pool[:k]
+
+    def spawn(self, n: int) -> list:
+        """
+        Returns n independent child streams, with the same block size. Spawning is deterministic: the same seed
+        always spawns the same children.
+
+        :param n: How many streams to spawn.
+        :return: list[BlockRNG]
+        """
+        return [BlockRNG(block_size=self.block_size, generator=child) for child in self.generator.spawn(n)]
+
+    def __repr__(self):
+        return f"BlockRNG({self.generator}, block_size={self.block_size})"
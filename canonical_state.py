@@ -0,0 +1,171 @@
+from temple import Temple, ValidRoomType, ROOM_CONNECTIONS
+
+NUM_ROOMS = len(ROOM_CONNECTIONS)
+# The mirror symmetry of the layout: room i is the mirror image of room MIRROR[i].
+MIRROR: tuple[int, ...] = (1, 0, 5, 4, 3, 2, 8, 7, 6, 10, 9)
+SYMMETRIES: tuple[tuple[int, ...], ...] = (tuple(range(NUM_ROOMS)), MIRROR)
+# Room classes of the key. Every room type that is neither a target nor the nexus is OTHER.
+EMPTY = 0
+OTHER = 1
+NEXUS = 2
+FIRST_TARGET = 3
+TIER_BITS = 2
+
+
+def room_classes(temple: Temple, target_rooms: None | list[ValidRoomType] = None) -> list[int]:
+    """
+    Returns the class of each room of the temple: EMPTY, OTHER, NEXUS, or FIRST_TARGET plus the position of its type
+    in target_rooms.
+
+    :param temple: The Temple.
+    :param target_rooms: The desired target rooms. None if only the nexus matters, as for the ratio of T3 rooms.
+    :return: list[int]
+    """
+    target_classes = {room_type: FIRST_TARGET + position for position, room_type in enumerate(target_rooms or [])}
+    target_classes.setdefault(ValidRoomType.ADJACENT_ROOM_LEVELS, NEXUS)
+    return [EMPTY if room.type is None else target_classes.get(room.type, OTHER) for room in temple.rooms]
+
+
+def class_bits(target_rooms: None | list[ValidRoomType] = None) -> int:
+    """
+    Returns how many bits a room class takes in the key.
+
+    :param target_rooms: The desired target rooms.
+    :return: int
+    """
+    return (FIRST_TARGET + len(target_rooms or []) - 1).bit_length()
+
+
+def canonical_key(temple: Temple, target_rooms: None | list[ValidRoomType] = None) -> int:
+    """
+    Maps the temple to a packed integer key, the same for every temple that only differs by the mirror symmetry of
+    the layout or by which interchangeable room types (neither target nor nexus) its rooms have. No up_room_logic
+    decision tells those temples apart, so anything from such a state onwards, e.g. the chance of a T3 target room,
+    is the same for all of them.
+
+    Each room takes TIER_BITS bits of tier and class_bits bits of class, room 0 in the lowest bits. Of the two room
+    orders of the symmetry, the one giving the smallest int is the key.
+
+    :param temple: The Temple.
+    :param target_rooms: The desired target rooms. None if only the nexus matters, as for the ratio of T3 rooms.
+    :return: int
+    """
+    classes = room_classes(temple, target_rooms)
+    room_bits = TIER_BITS + class_bits(target_rooms)
+    codes = [room.tier | room_class << TIER_BITS for room, room_class in zip(temple.rooms, classes)]
+    return min(sum(codes[room] << room_bits * position for position, room in enumerate(symmetry))
+               for symmetry in SYMMETRIES)
+
+
+def decode_key(key: int, target_rooms: None | list[ValidRoomType] = None) -> list[tuple[int, int]]:
+    """
+    Returns the (tier, class) of each room of a canonical key, in room order of the canonical representative.
+
+    :param key: A key from canonical_key.
+    :param target_rooms: The target rooms the key was made with.
+    :return: list[tuple[int, int]]
+    """
+    room_bits = TIER_BITS + class_bits(target_rooms)
+    codes = [key >> room_bits * room & (1 << room_bits) - 1 for room in range(NUM_ROOMS)]
+    return [(code & (1 << TIER_BITS) - 1, code >> TIER_BITS) for code in codes]
+
+
+class CanonicalMemo:
+    def __init__(self, target_rooms: None | list[ValidRoomType] = None):
+        """
+        A memo table of the conditional success probability from a temple state onwards, keyed on canonical_key, so
+        symmetric and lumped states share one entry. A state is the temple plus any context its value depends on,
+        e.g. the incursions left, given as extra key parts.
+
+        Values are either set exactly, e.g. by an exact solver, or estimated by adding the outcomes of runs through
+        the state.
+
+        :param target_rooms: The desired target rooms the keys are made with.
+        """
+        self.target_rooms = target_rooms
+        self._values: dict[tuple, float] = {}
+        # key -> [successes, runs] of the outcomes added.
+        self._outcomes: dict[tuple, list[int]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, temple: Temple, *context) -> tuple:
+        """
+        Returns the memo key of the state: the canonical key of the temple, then the context.
+
+        :param temple: The Temple.
+        :param context: The rest of the state, hashable.
+        :return: tuple
+        """
+        return (canonical_key(temple, self.target_rooms),) + context
+
+    def get(self, temple: Temple, *context) -> float | None:
+        """
+        Returns the success probability of the state: its value if set, its estimate if outcomes were added, None
+        otherwise.
+
+        :param temple: The Temple.
+        :param context: The rest of the state.
+        :return: float | None
+        """
+        key = self.key(temple, *context)
+        value = self._values.get(key)
+        if value is None and key in self._outcomes:
+            successes, runs = self._outcomes[key]
+            value = successes / runs
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, temple: Temple, probability: float, *context):
+        """
+        Stores the success probability of the state.
+
+        :param temple: The Temple.
+        :param probability: The success probability from the state onwards.
+        :param context: The rest of the state.
+        :return: None
+        """
+        self._values[self.key(temple, *context)] = probability
+
+    def get_or_compute(self, temple: Temple, compute, *context) -> float:
+        """
+        Returns the success probability of the state, calling compute(temple) and storing its result on a miss.
+
+        :param temple: The Temple.
+        :param compute: Function of the temple returning its success probability.
+        :param context: The rest of the state.
+        :return: float
+        """
+        probability = self.get(temple, *context)
+        if probability is None:
+            probability = compute(temple)
+            self.set(temple, probability, *context)
+        return probability
+
+    def add_outcome(self, temple: Temple, success: bool, *context):
+        """
+        Adds the outcome of a run through the state to its estimate.
+
+        :param temple: The Temple, as it was in the state.
+        :param success: Whether the run succeeded.
+        :param context: The rest of the state.
+        :return: None
+        """
+        outcome = self._outcomes.setdefault(self.key(temple, *context), [0, 0])
+        outcome[0] += success
+        outcome[1] += 1
+
+    def runs(self, temple: Temple, *context) -> int:
+        """
+        Returns how many outcomes were added for the state.
+        """
+        return self._outcomes.get(self.key(temple, *context), (0, 0))[1]
+
+    def __len__(self):
+        return len(self._values.keys() | self._outcomes.keys())
+
+    def __repr__(self):
+        return f"CanonicalMemo({len(self)} states, {self.hits} hits, {self.misses} misses)"
@@ -0,0 +1,158 @@
+import json
+import os
+import random
+from collections import Counter
+from time import monotonic
+from temple import ValidRoomType
+from main import count_t3_room_levels, count_target_t3_results
+from result_cache import cache_key
+
+
+def save_checkpoint(path: str, key: str, num_runs_done: int, results: Counter):
+    """
+    Atomically writes a checkpoint: the evaluation's cache_key, the runs done so far, their partial Counter and the
+    state of the global RNG.
+
+    :param path: The checkpoint file.
+    :param key: The cache_key of the evaluation.
+    :param num_runs_done: How many runs results covers.
+    :param results: The partial Counter.
+    """
+    version, internal_state, gauss_next = random.getstate()
+    checkpoint = {'key': key,
+                  'num_runs_done': num_runs_done,
+                  # Counter keys are tiers (int) or results (bool), a list of pairs keeps their type through JSON.
+                  'results': sorted(results.items()),
+                  'rng_state': [version, list(internal_state), gauss_next]}
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w') as file:
+        json.dump(checkpoint, file)
+    os.replace(temp_path, path)
+
+
+def load_checkpoint(path: str, key: str) -> tuple[int, Counter] | None:
+    """
+    Loads a checkpoint of the evaluation and restores the global RNG to its state.
+
+    Raises ValueError if the checkpoint belongs to a different evaluation.
+
+    :param path: The checkpoint file.
+    :param key: The cache_key of the evaluation.
+    :return: (runs done, partial Counter), or None if there is no checkpoint.
+    """
+    try:
+        with open(path) as file:
+            checkpoint = json.load(file)
+    except FileNotFoundError:
+        return None
+    if checkpoint['key'] != key:
+        raise ValueError(f"{path} is a checkpoint of a different evaluation.")
+    version, internal_state, gauss_next = checkpoint['rng_state']
+    random.setstate((version, tuple(internal_state), gauss_next))
+    return checkpoint['num_runs_done'], Counter({result: count for result, count in checkpoint['results']})
+
+
+def checkpointed_count(count_func,
+                       run_method_func,
+                       checkpoint_path: str,
+                       num_runs: int = 100000,
+                       seed: int = 0,
+                       batch_size: int = 10000,
+                       checkpoint_interval: float = 60.0,
+                       **kwargs) -> Counter:
+    """
+    Returns count_func's Counter for the evaluation, running it in batches and checkpointing the partial Counter and
+    the global RNG state to checkpoint_path at most every checkpoint_interval seconds. If the checkpoint exists, the
+    evaluation resumes from it. As every batch continues the RNG stream where the last one left off, the result is the
+    same as seeding with seed and running all num_runs at once. The checkpoint is deleted once done.
+
+    Raises ValueError if the checkpoint belongs to a different evaluation, or covers more than num_runs runs.
+
+    :param count_func: The counting function, e.g. main.count_target_t3_results.
+    :param run_method_func: The function to use for running the temples.
+    :param checkpoint_path: The checkpoint file.
+    :param num_runs: How many temple runs to do.
+    :param seed: The seed of the evaluation.
+    :param batch_size: How many temple runs to do between checks of the time since the last checkpoint.
+    :param checkpoint_interval: The minimum number of seconds between checkpoints.
+    :param kwargs: Passed on to count_func.
+    :return: The aggregated Counter.
+    """
+    key = cache_key(count_func, run_method_func, seed, **kwargs)
+    checkpoint = load_checkpoint(checkpoint_path, key)
+    if checkpoint is None:
+        random.seed(seed)
+        num_runs_done, results = 0, Counter()
+    else:
+        num_runs_done, results = checkpoint
+        if num_runs_done > num_runs:
+            raise ValueError(f"{checkpoint_path} already covers {num_runs_done} runs, more than {num_runs}.")
+    last_checkpoint = monotonic()
+    while num_runs_done < num_runs:
+        current_batch = min(batch_size, num_runs - num_runs_done)
+        results.update(count_func(run_method_func, num_runs=current_batch, **kwargs))
+        num_runs_done += current_batch
+        if num_runs_done < num_runs and monotonic() - last_checkpoint >= checkpoint_interval:
+            save_checkpoint(checkpoint_path, key, num_runs_done, results)
+            last_checkpoint = monotonic()
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return results
+
+
+def checkpointed_calc_ratio_t3_rooms(run_method_func,
+                                     checkpoint_path: str,
+                                     num_runs: int = 100000,
+                                     aotv: bool = False,
+                                     rr: bool = False,
+                                     seed: int = 0,
+                                     checkpoint_interval: float = 60.0) -> float:
+    """
+    Resumable equivalent of main.calc_ratio_t3_rooms.
+
+    :param run_method_func: The function to use for running the temples.
+    :param checkpoint_path: The checkpoint file.
+    :param num_runs: How many temple runs to do.
+    :param aotv: Whether Artefacts of the Vaal is active.
+    :param rr: Whether Resource Reallocation is active.
+    :param seed: The seed of the evaluation.
+    :param checkpoint_interval: The minimum number of seconds between checkpoints.
+    :return: The ratio of T3 rooms.
+    """
+    temple_room_level_totals = checkpointed_count(count_t3_room_levels, run_method_func, checkpoint_path,
+                                                  num_runs=num_runs, seed=seed,
+                                                  checkpoint_interval=checkpoint_interval,
+                                                  aotv=aotv, rr=rr)
+    return round(temple_room_level_totals[3] / temple_room_level_totals.total(), 4)
+
+
+def checkpointed_calc_ratio_target_t3_rooms(run_method_func,
+                                            target_rooms: list[ValidRoomType],
+                                            checkpoint_path: str,
+                                            initial_room: ValidRoomType | None = None,
+                                            start_with_initial_room: bool = False,
+                                            num_runs: int = 100000,
+                                            aotv: bool = False,
+                                            seed: int = 0,
+                                            checkpoint_interval: float = 60.0) -> float:
+    """
+    Resumable equivalent of main.calc_ratio_target_t3_rooms. rr is assumed active.
+
+    :param run_method_func: The function to use for running the temples.
+    :param target_rooms: The desired target rooms.
+    :param checkpoint_path: The checkpoint file.
+    :param initial_room: Which room to start the temple with or not, depending on start_with_initial_room.
+    :param start_with_initial_room: Controls whether the room specified by initial_room starts in the temple.
+    :param num_runs: How many temple runs to do.
+    :param aotv: Whether Artefacts of the Vaal is active.
+    :param seed: The seed of the evaluation.
+    :param checkpoint_interval: The minimum number of seconds between checkpoints.
+    :return: The ratio of T3 desired target rooms.
+    """
+    results = checkpointed_count(count_target_t3_results, run_method_func, checkpoint_path,
+                                 num_runs=num_runs, seed=seed, checkpoint_interval=checkpoint_interval,
+                                 target_rooms=target_rooms,
+                                 initial_room=initial_room,
+                                 start_with_initial_room=start_with_initial_room,
+                                 aotv=aotv)
+    return round(results[True] / results.total(), 4)
@@ -0,0 +1,784 @@
+from collections import defaultdict
+from functools import lru_cache
+from itertools import combinations, permutations
+from math import comb
+from operator import add, sub
+from temple import ValidRoomType, ROOM_CONNECTIONS
+from strategy_spec import StrategySpec, UPGRADE, SIDEGRADE, SIDEGRADE_NO_T0, DEFAULT_TARGET_ROOMS, get_strategy_spec
+
+NUM_ROOMS = len(ROOM_CONNECTIONS)
+
+EMPTY = 0
+OTHER = 1
+NEXUS = 2
+FIRST_TARGET = 3
+# Decision result meaning "keep the current room type" (an upgrade rather than a sidegrade).
+KEEP = -1
+# Groups of interchangeable rooms: (adjacent to a target, picked this area) -> index into the groups tuple.
+ADJACENT_UNPICKED, ADJACENT_PICKED, APART_UNPICKED, APART_PICKED = range(4)
+NO_ROOMS = (0, 0, 0, 0)
+# Position of the target room of a settled state, see ExactTempleSolver._settle.
+SETTLED = 'settled'
+NUM_POSITIONS_BY_DEGREE = {degree: [len(connections) for connections in ROOM_CONNECTIONS].count(degree)
+                           for degree in sorted({len(connections) for connections in ROOM_CONNECTIONS})}
+
+
+def nexus_neighbourhood(target_position: int, nexus_position: int) -> tuple[bool, int, int]:
+    """
+    Returns what a single target room strategy can see of a nexus position: whether it is adjacent to the target,
+    how many of its neighbours are adjacent to the target, and its number of neighbours.
+    """
+    nexus_connections = ROOM_CONNECTIONS[nexus_position]
+    return (target_position in nexus_connections,
+            len(set(nexus_connections) & set(ROOM_CONNECTIONS[target_position])),
+            len(nexus_connections))
+
+
+# What a single target room strategy can see of a target position: the neighbourhoods of the positions a nexus can
+# take next to it, and away from it.
+TARGET_NEIGHBOURHOODS = tuple((tuple(sorted(nexus_neighbourhood(target, nexus) for nexus in ROOM_CONNECTIONS[target])),
+                               tuple(sorted(nexus_neighbourhood(target, nexus) for nexus in range(NUM_ROOMS)
+                                            if nexus != target and nexus not in ROOM_CONNECTIONS[target])))
+                              for target in range(NUM_ROOMS))
+
+
+def _with(values: tuple, index: int, value) -> tuple:
+    return values[:index] + (value,) + values[index + 1:]
+
+
+def _add_room(counts: tuple, tier: int, amount: int = 1) -> tuple:
+    return _with(counts, tier, counts[tier] + amount)
+
+
+def _add_counts(counts: tuple, other_counts: tuple, sign: int = 1) -> tuple:
+    return tuple(map(add if sign == 1 else sub, counts, other_counts))
+
+
+@lru_cache(maxsize=None)
+def hypergeometric_splits(counts: tuple, size: int) -> tuple[tuple[tuple, float], ...]:
+    """
+    Returns every way of drawing size rooms without replacement from a group of rooms, as (drawn counts, probability).
+
+    :param counts: Number of rooms per kind.
+    :param size: How many rooms to draw.
+    :return: tuple of (drawn counts, probability)
+    """
+    total = sum(counts)
+    if size > total:
+        return ()
+
+    def split(index: int, remaining: int):
+        if index == len(counts) - 1:
+            if remaining <= counts[index]:
+                yield (remaining,), comb(counts[index], remaining)
+            return
+        for drawn in range(min(counts[index], remaining) + 1):
+            for rest, ways in split(index + 1, remaining - drawn):
+                yield (drawn,) + rest, ways * comb(counts[index], drawn)
+
+    return tuple((drawn_counts, ways / comb(total, size)) for drawn_counts, ways in split(0, size))
+
+
+class ExactTempleSolver:
+    def __init__(self, strategy,
+                 target_rooms: None | list[ValidRoomType] = None,
+                 aotv: bool = False,
+                 rr: bool = False,
+                 initial_room: ValidRoomType | None = None,
+                 start_with_initial_room: bool = False,
+                 num_starting_tiered_rooms: int = 7):
+        """
+        Computes exact outcome probabilities of a run_t_* strategy by treating the temple as a Markov chain.
+
+        Room types that are neither a target nor the nexus are interchangeable for every up_room_logic policy, and room
+        picks are uniform, so those rooms are only tracked as tier counts. They are split into rooms adjacent to a
+        target room and the rest, as that is the only position information a decision can look at. Target and nexus
+        rooms are tracked individually, with their position once the strategy can depend on it (prio_nexus). With a
+        single target room, positions are dropped again once the target and nexus both exist (see _settle). Every
+        state's value is memoized, so each one is solved once.
+
+        Strategies without prio_nexus are solved in seconds. prio_nexus strategies take minutes and a couple of GB of
+        memory with a single target room, and more with several.
+
+        Raises ValueError if ADJACENT_ROOM_LEVELS is a target room.
+
+        :param strategy: A run_t_* function with a known StrategySpec, or a StrategySpec.
+        :param target_rooms: The desired target rooms. Defaults to DEFAULT_TARGET_ROOMS, like the run_t_* functions.
+        :param aotv: Whether Artefacts of the Vaal is active.
+        :param rr: Whether Resource Reallocation is active.
+        :param initial_room: Which room to start the temple with or not, depending on start_with_initial_room.
+        :param start_with_initial_room: Controls whether the room specified by initial_room starts in the temple.
+        :param num_starting_tiered_rooms: How many rooms to start at tier 1.
+        """
+        if target_rooms is None:
+            target_rooms = DEFAULT_TARGET_ROOMS
+        if not isinstance(target_rooms, list):
+            target_rooms = [target_rooms]
+        target_rooms = list(dict.fromkeys(room for room in target_rooms if room is not None))
+        if ValidRoomType.ADJACENT_ROOM_LEVELS in target_rooms:
+            raise ValueError('ADJACENT_ROOM_LEVELS can not be a target room for the exact solver.')
+        self.spec: StrategySpec = get_strategy_spec(strategy)
+        self.target_rooms = target_rooms
+        self.target_classes = tuple(range(FIRST_TARGET, FIRST_TARGET + len(target_rooms)))
+        self.decision_targets = self.target_classes if self.spec.use_target_rooms else ()
+        # Special slots: one per target class, then the nexus. A slot is None or (tier, position, picked).
+        self.nexus_slot = len(target_rooms)
+        self.num_other_types = len(ValidRoomType) - 1 - len(target_rooms)
+        self.track_positions = self.spec.prio_nexus and bool(self.decision_targets)
+        self.rr = rr
+        self.incurs_per_area, self.num_areas = (4, 3) if aotv else (3, 4)
+        self.initial_room = initial_room
+        self.start_with_initial_room = start_with_initial_room
+        self.num_starting_tiered_rooms = num_starting_tiered_rooms
+        self._reward = None
+        self._counts_t3 = True
+        self._memo: dict = {}
+        self._terminal_memo: dict = {}
+        self._decision_memo: dict = {}
+
+    def slot_class(self, slot: int) -> int:
+        return NEXUS if slot == self.nexus_slot else FIRST_TARGET + slot
+
+    def class_slot(self, room_class: int) -> int:
+        return self.nexus_slot if room_class == NEXUS else room_class - FIRST_TARGET
+
+    def room_class(self, room_type: ValidRoomType) -> int:
+        if room_type in self.target_rooms:
+            return FIRST_TARGET + self.target_rooms.index(room_type)
+        if room_type is ValidRoomType.ADJACENT_ROOM_LEVELS:
+            return NEXUS
+        return OTHER
+
+    # Positions
+
+    def _target_positions(self, specials: tuple) -> list[int]:
+        return [specials[self.class_slot(target)][1] for target in self.decision_targets
+                if specials[self.class_slot(target)] is not None]
+
+    def _adjacent_positions(self, specials: tuple) -> tuple[set, set]:
+        """
+        Returns the positions of non-special rooms adjacent to a target room, and of the other non-special rooms.
+        """
+        taken = {special[1] for special in specials if special is not None}
+        adjacent = {room for position in self._target_positions(specials) for room in ROOM_CONNECTIONS[position]}
+        adjacent -= taken
+        return adjacent, set(range(NUM_ROOMS)) - taken - adjacent
+
+    def _place(self, specials: tuple, groups: tuple, slots: list[int], candidates, probability: float) -> list:
+        """
+        Gives the unpositioned special rooms in slots uniformly random distinct positions from candidates, and moves
+        the interchangeable rooms that ended up adjacent to a target room into the adjacent groups.
+        """
+        placements = list(permutations(candidates, len(slots)))
+        apart = groups[APART_UNPICKED] + groups[APART_PICKED]
+        states = []
+        for positions in placements:
+            placed = specials
+            for slot, position in zip(slots, positions):
+                placed = _with(placed, slot, (placed[slot][0], position, placed[slot][2]))
+            adjacent_positions, _ = self._adjacent_positions(placed)
+            num_moved = len(adjacent_positions) - sum(groups[ADJACENT_UNPICKED]) - sum(groups[ADJACENT_PICKED])
+            for moved, split_probability in hypergeometric_splits(apart, num_moved):
+                new_groups = (_add_counts(groups[ADJACENT_UNPICKED], moved[:4]),
+                              _add_counts(groups[ADJACENT_PICKED], moved[4:]),
+                              _add_counts(groups[APART_UNPICKED], moved[:4], -1),
+                              _add_counts(groups[APART_PICKED], moved[4:], -1))
+                states.append((probability * split_probability / len(placements), placed, new_groups))
+        return states
+
+    def _is_settled(self, specials: tuple) -> bool:
+        target = specials[self.class_slot(self.decision_targets[0])] if self.decision_targets else None
+        return target is not None and target[1] == SETTLED
+
+    def _decisions_fixed(self, specials: tuple) -> bool:
+        """
+        With a single target room, once both the target room and the nexus exist, neither can change type any more
+        and the nexus is no longer in the pool. Every decision is then fixed: the target and nexus keep their type,
+        and the interchangeable rooms are upgraded (an empty room can only get a non-special type).
+        """
+        if len(self.decision_targets) != 1 or not (self.spec.upgrade_once_target_exists
+                                                   or self.spec.decision == UPGRADE):
+            return False
+        target, nexus = specials[self.class_slot(self.decision_targets[0])], specials[self.nexus_slot]
+        return target is not None and nexus is not None and target[1] is not None and nexus[1] is not None
+
+    def _settle(self, specials: tuple, groups: tuple) -> list:
+        """
+        Once decisions are fixed, only the final apply_nexus looks at positions. So at the end of an area, the
+        interchangeable rooms are re-split into rooms adjacent to the nexus and the rest, and the positions are
+        dropped. The target becomes (tier, SETTLED, picked) and the nexus (tier, (SETTLED, adjacent to the target),
+        picked).
+        """
+        target_slot = self.class_slot(self.decision_targets[0])
+        target, nexus = specials[target_slot], specials[self.nexus_slot]
+        adjacent_positions, apart_positions = self._adjacent_positions(specials)
+        nexus_connections = set(ROOM_CONNECTIONS[nexus[1]])
+        adjacent_rooms = groups[ADJACENT_UNPICKED] + groups[ADJACENT_PICKED]
+        apart_rooms = groups[APART_UNPICKED] + groups[APART_PICKED]
+        all_rooms = _add_counts(adjacent_rooms, apart_rooms)
+        settled = _with(specials, target_slot, (target[0], SETTLED, target[2]))
+        settled = _with(settled, self.nexus_slot, (nexus[0], (SETTLED, target[1] in nexus_connections), nexus[2]))
+        states = []
+        for adjacent_drawn, adjacent_probability in hypergeometric_splits(adjacent_rooms,
+                                                                          len(nexus_connections & adjacent_positions)):
+            for apart_drawn, apart_probability in hypergeometric_splits(apart_rooms,
+                                                                        len(nexus_connections & apart_positions)):
+                drawn = _add_counts(adjacent_drawn, apart_drawn)
+                rest = _add_counts(all_rooms, drawn, -1)
+                states.append((adjacent_probability * apart_probability, settled,
+                               (drawn[:4], drawn[4:], rest[:4], rest[4:])))
+        return states
+
+    def _positioned(self, specials: tuple, groups: tuple, probability: float) -> list:
+        """
+        Starts tracking positions once the strategy depends on them and a target room exists, otherwise returns the
+        state as is. Until then every room is interchangeable, so the special rooms take uniformly random positions.
+        """
+        unpositioned = [slot for slot, special in enumerate(specials) if special is not None and special[1] is None]
+        if (self.track_positions and unpositioned
+                and any(specials[self.class_slot(target)] is not None for target in self.decision_targets)):
+            taken = {special[1] for special in specials if special is not None and special[1] is not None}
+            candidates = [room for room in range(NUM_ROOMS) if room not in taken]
+            return self._place(specials, groups, unpositioned, candidates, probability)
+        return [(probability, specials, groups)]
+
+    # Initial temples
+
+    def initial_states(self) -> dict[tuple, float]:
+        """
+        Returns the exact distribution of starting temples, mirroring Temple.__init__.
+
+        :return: dict of (specials, groups) -> probability.
+        """
+        specials = list(self.target_classes) + [NEXUS]
+        num_types = len(ValidRoomType)
+        forced = []
+        num_sampled = self.num_starting_tiered_rooms
+        if self.initial_room is not None:
+            num_types -= 1
+            initial_class = self.room_class(self.initial_room)
+            if initial_class != OTHER:
+                specials.remove(initial_class)
+            if self.start_with_initial_room:
+                forced.append(initial_class)
+                num_sampled -= 1
+        num_non_special = num_types - len(specials)
+        states = defaultdict(float)
+        for num_specials in range(min(len(specials), num_sampled) + 1):
+            for sampled_specials in combinations(specials, num_specials):
+                probability = comb(num_non_special, num_sampled - num_specials) / comb(num_types, num_sampled)
+                placed = [room_class for room_class in forced + list(sampled_specials) if room_class != OTHER]
+                state_specials = [None] * (self.nexus_slot + 1)
+                for room_class in placed:
+                    state_specials[self.class_slot(room_class)] = (1, None, False)
+                num_others = self.num_starting_tiered_rooms - len(placed)
+                apart = (NUM_ROOMS - self.num_starting_tiered_rooms, num_others, 0, 0)
+                state = (tuple(state_specials), (NO_ROOMS, NO_ROOMS, apart, NO_ROOMS))
+                for final_probability, final_specials, final_groups in self._positioned(*state, probability):
+                    states[(final_specials, final_groups)] += final_probability
+        return states
+
+    # Decisions
+
+    def _pool(self, specials: tuple, groups: tuple) -> list[tuple[int, int]]:
+        """
+        Returns the room types remaining as (room class, number of room types) pairs.
+        """
+        pool = [(self.slot_class(slot), 1) for slot, special in enumerate(specials) if special is None]
+        others_present = sum(sum(counts[1:]) for counts in groups)
+        pool.append((OTHER, self.num_other_types - others_present))
+        return pool
+
+    @staticmethod
+    def _draws(pool: list[tuple[int, int]], count: int) -> list[tuple[float, tuple]]:
+        """
+        Returns every ordered class outcome of Temple.get_room_upgrade_option(count) with its probability.
+        """
+        total = sum(number for _, number in pool)
+        if count == 1:
+            return [(number / total, (room_class,)) for room_class, number in pool if number]
+        draws = []
+        for first, first_number in pool:
+            for second, second_number in pool:
+                second_number -= first == second
+                if first_number and second_number > 0:
+                    draws.append((first_number / total * second_number / (total - 1), (first, second)))
+        return draws
+
+    def _upgrade_unless_target(self, room_class: int, options: tuple) -> int:
+        result = options[0] if room_class == EMPTY else KEEP
+        for target in self.decision_targets:
+            if target in options:
+                result = target
+        return result
+
+    def _sidegrade_unless_target(self, room_class: int, options: tuple) -> int:
+        result = KEEP if room_class in self.decision_targets else options[0]
+        if room_class == EMPTY:
+            for target in self.decision_targets:
+                if target in options:
+                    result = target
+        return result
+
+    def _decide(self, decision: str, room_class: int, tier: int, pool: list, outcomes: dict, probability: float):
+        """
+        Adds the distribution of room type decisions of the given up_room_logic decision to outcomes.
+        """
+        if decision == SIDEGRADE_NO_T0 and tier != 0:
+            # prio_sidegrade_unless_target_no_t0 discards its own draw and falls back onto a fresh one.
+            decision = SIDEGRADE
+        for draw_probability, options in self._draws(pool, 2 if tier == 0 else 1):
+            draw_probability *= probability
+            if decision == UPGRADE:
+                outcomes[self._upgrade_unless_target(room_class, options)] += draw_probability
+            elif decision == SIDEGRADE:
+                outcomes[self._sidegrade_unless_target(room_class, options)] += draw_probability
+            else:
+                options = list(options)
+                for target in self.decision_targets:
+                    if target in options:
+                        options.remove(target)
+                        break
+                outcomes[options[0]] += draw_probability
+
+    def decision_outcomes(self, room_class: int, tier: int, target_adjacent: bool,
+                          pool: list, target_exists: bool) -> dict[int, float]:
+        """
+        Returns the distribution of the room type the strategy chooses for a room, as KEEP or a room class.
+
+        :param room_class: The class of the room being upgraded.
+        :param tier: The tier of the room being upgraded.
+        :param target_adjacent: Whether the room is adjacent to a target room.
+        :param pool: The room types remaining, from _pool.
+        :param target_exists: Whether a target room exists in the temple.
+        :return: dict of KEEP or room class -> probability.
+        """
+        key = (room_class, tier, target_adjacent, tuple(pool), target_exists)
+        if key in self._decision_memo:
+            return self._decision_memo[key]
+        self._decision_memo[key] = outcomes = self._decision_outcomes(room_class, tier, target_adjacent, pool,
+                                                                      target_exists)
+        return outcomes
+
+    def _decision_outcomes(self, room_class: int, tier: int, target_adjacent: bool,
+                           pool: list, target_exists: bool) -> dict[int, float]:
+        spec = self.spec
+        decision = UPGRADE if spec.upgrade_once_target_exists and target_exists else spec.decision
+        outcomes = defaultdict(float)
+        if not spec.prio_nexus:
+            self._decide(decision, room_class, tier, pool, outcomes, 1.0)
+            return outcomes
+        if room_class in self.decision_targets:
+            return {KEEP: 1.0}
+        for draw_probability, options in self._draws(pool, 2 if tier == 0 else 1):
+            if target_adjacent and (NEXUS in options or room_class == NEXUS):
+                outcomes[KEEP if room_class == NEXUS else NEXUS] += draw_probability
+            else:
+                self._decide(decision, room_class, tier, pool, outcomes, draw_probability)
+        return outcomes
+
+    def _tier_outcomes(self, result: int, tier: int) -> list[tuple[float, int]]:
+        if result == KEEP and self.rr and tier == 1:
+            return [(0.5, 2), (0.5, 3)]
+        return [(1.0, tier + 1)]
+
+    # Transitions
+
+    def incursion_outcomes(self, specials: tuple, groups: tuple) -> list[tuple[float, tuple, tuple, bool]]:
+        """
+        Returns the distribution of temple states after one incursion: a uniformly picked eligible room followed by
+        the strategy's decision and the upgrade.
+
+        :param specials: The special rooms of the current state.
+        :param groups: The interchangeable room groups of the current state.
+        :return: list of (probability, specials, groups, whether the picked room became a target room).
+        """
+        pool = self._pool(specials, groups)
+        target_exists = any(specials[self.class_slot(target)] is not None for target in self.decision_targets)
+        target_positions = self._target_positions(specials)
+        picks = []
+        for slot, special in enumerate(specials):
+            if special is not None and special[0] < 3 and not special[2]:
+                picks.append((1, slot, None, special[0]))
+        for group in (ADJACENT_UNPICKED, APART_UNPICKED):
+            for tier in range(3):
+                if groups[group][tier]:
+                    picks.append((groups[group][tier], None, group, tier))
+        num_eligible = sum(pick[0] for pick in picks)
+        outcomes = []
+        for count, slot, group, tier in picks:
+            pick_probability = count / num_eligible
+            if slot is None:
+                room_class = EMPTY if tier == 0 else OTHER
+                target_adjacent = group == ADJACENT_UNPICKED
+                base_groups = _with(groups, group, _add_room(groups[group], tier, -1))
+                base_specials = specials
+            else:
+                room_class = self.slot_class(slot)
+                position = specials[slot][1]
+                target_adjacent = position is not None and any(position in ROOM_CONNECTIONS[target]
+                                                                for target in target_positions)
+                base_groups = groups
+                base_specials = _with(specials, slot, None)
+            for result, decision_probability in self.decision_outcomes(room_class, tier, target_adjacent,
+                                                                       pool, target_exists).items():
+                new_class = room_class if result == KEEP else result
+                for tier_probability, new_tier in self._tier_outcomes(result, tier):
+                    probability = pick_probability * decision_probability * tier_probability
+                    stop = new_class in self.decision_targets
+                    for state in self._move(base_specials, base_groups, slot, group, new_class, new_tier,
+                                            specials, probability):
+                        outcomes.append(state + (stop,))
+        return outcomes
+
+    def _move(self, specials: tuple, groups: tuple, old_slot, old_group, new_class: int, new_tier: int,
+              old_specials: tuple, probability: float) -> list:
+        """
+        Puts the picked room (already taken out of specials / groups) back into the state with its new class and tier.
+        """
+        old_position = old_specials[old_slot][1] if old_slot is not None else None
+        if new_class in (EMPTY, OTHER):
+            if old_slot is None:
+                group = old_group + 1
+            elif old_position is None:
+                group = APART_PICKED
+            else:
+                adjacent_positions, _ = self._adjacent_positions(specials)
+                group = ADJACENT_PICKED if old_position in adjacent_positions else APART_PICKED
+            return [(probability, specials, _with(groups, group, _add_room(groups[group], new_tier)))]
+        slot = self.class_slot(new_class)
+        if old_slot is not None:
+            if (old_position is not None and new_class in self.decision_targets
+                    and self.slot_class(old_slot) not in self.decision_targets):
+                # The room keeps its position, but its neighbours are now adjacent to a target room.
+                new_specials = _with(specials, slot, (new_tier, None, True))
+                return self._place(new_specials, groups, [slot], [old_position], probability)
+            return self._positioned(_with(specials, slot, (new_tier, old_position, True)), groups, probability)
+        new_specials = _with(specials, slot, (new_tier, None, True))
+        if not self.track_positions or not self._target_positions(old_specials):
+            return self._positioned(new_specials, groups, probability)
+        # A non-special room became special, it takes a uniformly random position of its group.
+        adjacent_positions, apart_positions = self._adjacent_positions(old_specials)
+        candidates = adjacent_positions if old_group == ADJACENT_UNPICKED else apart_positions
+        return self._place(new_specials, groups, [slot], candidates, probability)
+
+    def _fixed_area_outcomes(self, specials: tuple, groups: tuple, area_left: int,
+                             early_stop: bool | None = None) -> dict:
+        """
+        Once decisions are fixed, an area's incursions are a uniform draw without replacement from the rooms not picked
+        yet, so the rest of an area is resolved at once, as in Temple's sample of valid_rooms_remaining. With early
+        stop, the area ends at the target room's position in the draw.
+
+        :param early_stop: Whether the area ends once the target room is picked. Defaults to the strategy's.
+        :return: dict of (specials, groups, number of incursions used) -> probability.
+        """
+        if early_stop is None:
+            early_stop = self.spec.early_stop
+        target_slot = self.class_slot(self.decision_targets[0])
+        eligible_slots = [slot for slot in (target_slot, self.nexus_slot)
+                          if specials[slot][0] < 3 and not specials[slot][2]]
+        rooms = groups[ADJACENT_UNPICKED][:3] + groups[APART_UNPICKED][:3]
+        num_eligible = len(eligible_slots) + sum(rooms)
+        num_picked = min(area_left, num_eligible)
+        if early_stop and target_slot in eligible_slots:
+            other_slots = [slot for slot in eligible_slots if slot != target_slot]
+            draws = [(1 / num_eligible, [target_slot], other_slots, position) for position in range(num_picked)]
+            if num_picked < num_eligible:
+                draws.append(((num_eligible - num_picked) / num_eligible, [], other_slots, num_picked))
+        else:
+            draws = [(1.0, [], eligible_slots, num_picked)]
+        outcomes = defaultdict(float)
+        for probability, forced_slots, slots, count in draws:
+            for drawn, split_probability in hypergeometric_splits(tuple(1 for _ in slots) + rooms, count):
+                upgraded = forced_slots + [slot for slot, taken in zip(slots, drawn) if taken]
+                states = [(probability * split_probability, specials, groups)]
+                for slot in upgraded:
+                    states = [(state_probability * tier_probability,
+                               _with(state_specials, slot, (new_tier,) + state_specials[slot][1:]),
+                               state_groups)
+                              for state_probability, state_specials, state_groups in states
+                              for tier_probability, new_tier in self._tier_outcomes(KEEP, state_specials[slot][0])]
+                for group, group_drawn in ((ADJACENT_UNPICKED, drawn[len(slots):len(slots) + 3]),
+                                           (APART_UNPICKED, drawn[len(slots) + 3:])):
+                    states = [split_state
+                              for state in states
+                              for split_state in self._upgrade_group(state, group, group_drawn)]
+                for state_probability, state_specials, state_groups in states:
+                    outcomes[(state_specials, state_groups, len(forced_slots) + count)] += state_probability
+        return outcomes
+
+    def _upgrade_group(self, state: tuple, group: int, drawn: tuple) -> list:
+        """
+        Upgrades the drawn rooms (counts per tier below 3) of a group. Tier 1 rooms keep their type, so with rr each
+        of them independently goes up one or two tiers.
+        """
+        probability, specials, groups = state
+        counts = list(groups[group])
+        for tier in range(3):
+            counts[tier] -= drawn[tier]
+            counts[tier + 1] += drawn[tier]
+        num_doubled = range(drawn[1] + 1) if self.rr else [0]
+        states = []
+        for doubled in num_doubled:
+            doubled_probability = comb(drawn[1], doubled) / 2 ** drawn[1] if self.rr else 1.0
+            new_counts = (counts[0], counts[1], counts[2] - doubled, counts[3] + doubled)
+            states.append((probability * doubled_probability, specials, _with(groups, group, new_counts)))
+        return states
+
+    # Values
+
+    def _final_reward(self, tiers: list, num_t3: int) -> float:
+        target_tiers = tuple(tiers[self.class_slot(target)] for target in self.target_classes)
+        return self._reward(target_tiers, num_t3)
+
+    def _nexus_value(self, tiers: list, slots: list[int], others: tuple, nexus_tier: int, num_t3: int) -> float:
+        """
+        Expected reward after applying a nexus of nexus_tier to its neighbours, like Temple.apply_nexus.
+
+        :param tiers: The tier of every special slot (0 if missing).
+        :param slots: The special slots adjacent to the nexus.
+        :param others: Tier counts of the interchangeable rooms adjacent to the nexus.
+        :param nexus_tier: The tier of the nexus.
+        :param num_t3: Number of T3 rooms before applying the nexus.
+        """
+        items = tuple(1 for _ in slots) + (0,) + others[1:]
+        num_connections = len(slots) + sum(others[1:])
+        if 3 > nexus_tier < num_connections:
+            choices = hypergeometric_splits(items, nexus_tier)
+        else:
+            choices = [(items, 1.0)]
+        total = 0.0
+        for upgraded, probability in choices:
+            new_tiers = list(tiers)
+            new_t3 = num_t3 + upgraded[len(slots) + 2]
+            for slot, taken in zip(slots, upgraded):
+                if taken and new_tiers[slot] < 3:
+                    new_tiers[slot] += 1
+                    new_t3 += new_tiers[slot] == 3
+            total += probability * self._final_reward(new_tiers, new_t3)
+        return total
+
+    def _terminal_value(self, specials: tuple, groups: tuple) -> float:
+        """
+        Expected reward of a finished temple, after applying the nexus.
+        """
+        all_others = tuple(map(sum, zip(*groups)))
+        key = (specials, groups if specials[self.nexus_slot] and specials[self.nexus_slot][1] is not None
+               else all_others)
+        if key in self._terminal_memo:
+            return self._terminal_memo[key]
+        tiers = [special[0] if special is not None else 0 for special in specials]
+        num_t3 = all_others[3] + tiers.count(3)
+        nexus = specials[self.nexus_slot]
+        if nexus is None:
+            self._terminal_memo[key] = result = self._final_reward(tiers, num_t3)
+            return result
+        nexus_tier, nexus_position = nexus[0], nexus[1]
+        other_slots = [slot for slot, special in enumerate(specials) if special is not None and slot != self.nexus_slot]
+        result = 0.0
+        if self._is_settled(specials):
+            slots = [self.class_slot(self.decision_targets[0])] if nexus_position[1] else []
+            result = self._nexus_value(tiers, slots, _add_counts(groups[ADJACENT_UNPICKED], groups[ADJACENT_PICKED]),
+                                       nexus_tier, num_t3)
+        elif nexus_position is None:
+            # Nothing is positioned: the nexus and its neighbours are uniformly random rooms.
+            items = tuple(1 for _ in other_slots) + all_others
+            for degree, num_positions in NUM_POSITIONS_BY_DEGREE.items():
+                for drawn, probability in hypergeometric_splits(items, degree):
+                    slots = [slot for slot, taken in zip(other_slots, drawn) if taken]
+                    result += probability * num_positions / NUM_ROOMS * self._nexus_value(
+                        tiers, slots, drawn[len(other_slots):], nexus_tier, num_t3)
+        else:
+            adjacent_positions, _ = self._adjacent_positions(specials)
+            slots = [slot for slot in other_slots if specials[slot][1] in ROOM_CONNECTIONS[nexus_position]]
+            num_adjacent = sum(room in adjacent_positions for room in ROOM_CONNECTIONS[nexus_position])
+            num_apart = len(ROOM_CONNECTIONS[nexus_position]) - len(slots) - num_adjacent
+            adjacent_rooms = _add_counts(groups[ADJACENT_UNPICKED], groups[ADJACENT_PICKED])
+            apart_rooms = _add_counts(groups[APART_UNPICKED], groups[APART_PICKED])
+            for adjacent_drawn, adjacent_probability in hypergeometric_splits(adjacent_rooms, num_adjacent):
+                for apart_drawn, apart_probability in hypergeometric_splits(apart_rooms, num_apart):
+                    result += adjacent_probability * apart_probability * self._nexus_value(
+                        tiers, slots, _add_counts(adjacent_drawn, apart_drawn), nexus_tier, num_t3)
+        self._terminal_memo[key] = result
+        return result
+
+    def _memo_specials(self, specials: tuple) -> tuple:
+        """
+        With a single target room, the future only depends on positions through their neighbourhoods: the nexus
+        through nexus_neighbourhood, and the target, before the nexus exists, through TARGET_NEIGHBOURHOODS. Once
+        decisions are fixed, the target position doesn't matter beyond the nexus neighbourhood. States that only differ
+        in positions beyond that share their value.
+        """
+        if len(self.decision_targets) != 1 or self._is_settled(specials):
+            return specials
+        target_slot = self.class_slot(self.decision_targets[0])
+        target, nexus = specials[target_slot], specials[self.nexus_slot]
+        if target is None or target[1] is None:
+            return specials
+        if nexus is None:
+            return _with(specials, target_slot, (target[0], TARGET_NEIGHBOURHOODS[target[1]], target[2]))
+        if nexus[1] is None:
+            return specials
+        if self._decisions_fixed(specials):
+            specials = _with(specials, target_slot, (target[0], None, target[2]))
+        return _with(specials, self.nexus_slot, (nexus[0], nexus_neighbourhood(target[1], nexus[1]), nexus[2]))
+
+    def _memo_groups(self, specials: tuple, groups: tuple) -> tuple:
+        """
+        When the reward ignores the number of T3 rooms, the tiered rooms next to a settled nexus only matter as nexus
+        neighbours, which they stay. Swapping one of them with a tiered room elsewhere doesn't change the value, so
+        they are keyed as the highest tiers available. With the nexus apart from the target, the split doesn't matter.
+        T3 rooms can't be picked again, so they are keyed as unpicked.
+        """
+        if groups[ADJACENT_PICKED][3] or groups[APART_PICKED][3]:
+            groups = (_add_room(groups[ADJACENT_UNPICKED], 3, groups[ADJACENT_PICKED][3]),
+                      _with(groups[ADJACENT_PICKED], 3, 0),
+                      _add_room(groups[APART_UNPICKED], 3, groups[APART_PICKED][3]),
+                      _with(groups[APART_PICKED], 3, 0))
+        if (self._counts_t3 or not self._is_settled(specials)
+                or any(groups[ADJACENT_PICKED]) or any(groups[APART_PICKED])):
+            return groups
+        all_rooms = _add_counts(groups[ADJACENT_UNPICKED], groups[APART_UNPICKED])
+        if not specials[self.nexus_slot][1][1]:
+            return NO_ROOMS, NO_ROOMS, all_rooms, NO_ROOMS
+        num_tiered = sum(groups[ADJACENT_UNPICKED][1:])
+        adjacent = [groups[ADJACENT_UNPICKED][0], 0, 0, 0]
+        for tier in (3, 2, 1):
+            adjacent[tier] = min(num_tiered, all_rooms[tier])
+            num_tiered -= adjacent[tier]
+        return tuple(adjacent), NO_ROOMS, _add_counts(all_rooms, adjacent, -1), NO_ROOMS
+
+    @staticmethod
+    def _any_eligible(specials: tuple, groups: tuple) -> bool:
+        """
+        Returns whether any room can still be picked this area: below tier 3 and not picked yet.
+        """
+        return (any(special is not None and special[0] < 3 and not special[2] for special in specials)
+                or any(groups[ADJACENT_UNPICKED][:3]) or any(groups[APART_UNPICKED][:3]))
+
+    def value(self, specials: tuple, groups: tuple, area_left: int, rest: int) -> float:
+        """
+        Expected reward from the given state onwards.
+
+        :param specials: The target and nexus rooms, each None or (tier, position, picked this area).
+        :param groups: Tier counts of the interchangeable rooms: adjacent / apart from targets, unpicked / picked.
+        :param area_left: Incursions left in the current area.
+        :param rest: Areas left (or, for early stop strategies, incursions left in total).
+        :return: float
+        """
+        if area_left == 0 or not self._any_eligible(specials, groups):
+            # The area is over: every room can be picked again.
+            specials = tuple(special if special is None else special[:2] + (False,) for special in specials)
+            groups = (_add_counts(groups[ADJACENT_UNPICKED], groups[ADJACENT_PICKED]), NO_ROOMS,
+                      _add_counts(groups[APART_UNPICKED], groups[APART_PICKED]), NO_ROOMS)
+            area_left = 0
+        target_tiers = tuple(specials[self.class_slot(target)][0] if specials[self.class_slot(target)] else 0
+                             for target in self.target_classes)
+        if not self._counts_t3 and target_tiers and min(target_tiers) == 3:
+            # T3 rooms can't change any more, the reward is known.
+            return self._reward(target_tiers, 0)
+        key = (self._memo_specials(specials), self._memo_groups(specials, groups), area_left, rest)
+        if key in self._memo:
+            return self._memo[key]
+        if area_left == 0 and self._decisions_fixed(specials) and not self._is_settled(specials):
+            settled_states = self._settle(specials, groups)
+            self._memo[key] = result = sum(probability * self.value(new_specials, new_groups, 0, rest)
+                                           for probability, new_specials, new_groups in settled_states)
+            return result
+        if area_left == 0:
+            all_t3 = (all(special is None or special[0] == 3 for special in specials)
+                      and not any(groups[ADJACENT_UNPICKED][:3]) and not any(groups[APART_UNPICKED][:3]))
+            if rest == 0 or all_t3:
+                result = self._terminal_value(specials, groups)
+            elif self.spec.early_stop:
+                result = self.value(specials, groups, min(self.incurs_per_area, rest), rest)
+            else:
+                result = self.value(specials, groups, self.incurs_per_area, rest - 1)
+            self._memo[key] = result
+            return result
+        self._memo[key] = result = self._incursion_value(specials, groups, area_left, rest)
+        return result
+
+    def _incursion_value(self, specials: tuple, groups: tuple, area_left: int, rest: int) -> float:
+        """
+        Expected reward from a state with incursions left in the current area: the average over the next incursion's
+        outcomes, or over the rest of the area once decisions are fixed.
+        """
+        total = 0.0
+        if self._decisions_fixed(specials):
+            outcomes = self._fixed_area_outcomes(specials, groups, area_left)
+            for (new_specials, new_groups, used), probability in outcomes.items():
+                total += probability * self.value(new_specials, new_groups, 0,
+                                                  rest - used if self.spec.early_stop else rest)
+            return total
+        for probability, new_specials, new_groups, became_target in self.incursion_outcomes(specials, groups):
+            stop = self.spec.early_stop and became_target
+            total += probability * self.value(new_specials,
+                                              new_groups,
+                                              0 if stop else area_left - 1,
+                                              rest - 1 if self.spec.early_stop else rest)
+        return total
+
+    def solve(self, reward, counts_t3: bool = True) -> float:
+        """
+        Returns the exact expected value of reward over finished temples.
+
+        :param reward: Function of (final tier of each target room (0 if missing), number of T3 rooms) to a float.
+        :param counts_t3: Whether reward depends on the number of T3 rooms. If not, more states can be merged.
+        :return: float
+        """
+        self._reward = reward
+        self._counts_t3 = counts_t3
+        self._memo = {}
+        self._terminal_memo = {}
+        rest = self.incurs_per_area * self.num_areas if self.spec.early_stop else self.num_areas
+        return sum(probability * self.value(specials, groups, 0, rest)
+                   for (specials, groups), probability in self.initial_states().items())
+
+    def t3_room_ratio(self) -> float:
+        """
+        The exact expected ratio of T3 rooms.
+        """
+        return self.solve(lambda target_tiers, num_t3: num_t3 / NUM_ROOMS)
+
+    def target_t3_probability(self) -> float:
+        """
+        The exact probability that at least one target room is T3.
+        """
+        return self.solve(lambda target_tiers, num_t3: float(3 in target_tiers), counts_t3=False)
+
+
+def exact_ratio_t3_rooms(run_method_func, aotv: bool = False, rr: bool = False) -> float:
+    """
+    Exact equivalent of main.calc_ratio_t3_rooms.
+
+    :param run_method_func: The run_t_* function (or StrategySpec) to evaluate.
+    :param aotv: Whether Artefacts of the Vaal is active.
+    :param rr: Whether Resource Reallocation is active.
+    :return: The exact ratio of T3 rooms.
+    """
+    return ExactTempleSolver(run_method_func, aotv=aotv, rr=rr).t3_room_ratio()
+
+
+def exact_ratio_target_t3_rooms(run_method_func,
+                                target_rooms: list[ValidRoomType],
+                                initial_room: ValidRoomType | None = None,
+                                start_with_initial_room: bool = False,
+                                aotv: bool = False) -> float:
+    """
+    Exact equivalent of main.calc_ratio_target_t3_rooms. rr is assumed active.
+
+    :param run_method_func: The run_t_* function (or StrategySpec) to evaluate.
+    :param target_rooms: The desired target rooms.
+    :param initial_room: Which room to start the temple with or not, depending on start_with_initial_room.
+    :param start_with_initial_room: Controls whether the room specified by initial_room starts in the temple.
+    :param aotv: Whether Artefacts of the Vaal is active.
+    :return: The exact probability of a T3 desired target room.
+    """
+    solver = ExactTempleSolver(run_method_func,
+                               target_rooms=target_rooms,
+                               aotv=aotv,
+                               rr=True,
+                               initial_room=initial_room,
+                               start_with_initial_room=start_with_initial_room)
+    return solver.target_t3_probability()
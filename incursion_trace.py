@@ -0,0 +1,222 @@
+import json
+import os
+import struct
+import numpy as np
+from block_rng import BlockRNG
+from temple import Temple, ValidRoomType, ROOM_CONNECTIONS
+
+MAGIC = b'AOTVTRC1'
+# Bump when the way draws are turned into events changes, as replaying an older corpus would then give other runs.
+TRACE_VERSION = 1
+# How many draws each stream of a trace holds, enough for any run_t_* strategy: the temple stream draws 2 per
+# starting room, at most 1 Resource Reallocation roll per incursion and at most 2 for the nexus. The pick stream draws
+# at most 4 per area and the option stream at most 4 per incursion, with an area per incursion when stopping early.
+TEMPLE_DRAWS = 32
+PICK_DRAWS = 48
+OPTION_DRAWS = 64
+STREAMS = ('temple', 'pick', 'option')
+SCALE = 2.0 ** -32
+
+
+def trace_dtype(temple_draws: int = TEMPLE_DRAWS, pick_draws: int = PICK_DRAWS,
+                option_draws: int = OPTION_DRAWS) -> np.dtype:
+    """
+    Returns the record layout of a trace: the trace number, then the draws of each stream as 32 bit fractions of 1.
+
+    :return: np.dtype
+    """
+    return np.dtype([('trace', '<u4'),
+                     ('temple', '<u4', (temple_draws,)),
+                     ('pick', '<u4', (pick_draws,)),
+                     ('option', '<u4', (option_draws,))])
+
+
+class TraceExhausted(Exception):
+    pass
+
+
+class TraceRNG(BlockRNG):
+    def __init__(self, draws: list[int], stream: str = ''):
+        """
+        A BlockRNG that hands out the recorded draws of one stream of a trace instead of generating them. Raises
+        TraceExhausted if a run needs more draws than the stream holds.
+
+        :param draws: The recorded draws, as 32 bit fractions of 1.
+        :param stream: The name of the stream, for error messages.
+        """
+        self.generator = None
+        self.block_size = len(draws)
+        self.stream = stream
+        self._block = [draw * SCALE for draw in draws]
+        self._position = 0
+
+    def _refill(self):
+        raise TraceExhausted(f"the {self.stream} stream of the trace ran out of its {len(self._block)} draws.")
+
+    @property
+    def draws_used(self) -> int:
+        return self._position
+
+    def spawn(self, n: int) -> list:
+        raise TypeError("a recorded stream can't spawn new streams.")
+
+
+def trace_temple(record,
+                 initial_room: ValidRoomType | None = None,
+                 start_with_initial_room: bool = False) -> Temple:
+    """
+    Builds the temple of a trace: its starting rooms, Resource Reallocation rolls and nexus come from the temple
+    stream, its room picks from the pick stream and its upgrade options from the option stream. Like
+    strategy_comparison.crn_temple, every strategy replayed on it sees the same starting rooms, and its n-th room pick
+    and n-th option draw use the same draws as any other strategy's, so replays are common random numbers. Replaying
+    the strategy a trace was recorded with gives back the recorded run exactly.
+
+    :param record: A record of a trace, e.g. an element of TraceCorpus.records.
+    :param initial_room: Which room to start the temple with or not, depending on start_with_initial_room.
+    :param start_with_initial_room: Controls whether the room specified by initial_room starts in the temple.
+    :return: Temple
+    """
+    rng, pick_rng, option_rng = (TraceRNG(record[stream].tolist(), stream) for stream in STREAMS)
+    return Temple(desired_room=initial_room,
+                  start_with_desired_room=start_with_initial_room,
+                  rng=rng,
+                  pick_rng=pick_rng,
+                  option_rng=option_rng)
+
+
+def write_corpus(path: str, num_traces: int, seed=0, metadata: dict | None = None, chunk_size: int = 65536):
+    """
+    Records a corpus of num_traces traces to path: the file starts with MAGIC, the length of a JSON header and the
+    header itself (the version, the seed, the record layout and the metadata), then one fixed-width record per trace.
+    The draws come from numpy Generators spawned from seed, one per chunk of traces, so the same seed always records
+    the same corpus. An existing file is overwritten.
+
+    :param path: The corpus file.
+    :param num_traces: How many traces to record.
+    :param seed: The seed of the corpus.
+    :param metadata: Anything worth keeping about the corpus. Must be JSON-able.
+    :param chunk_size: How many traces to generate at once.
+    :return: None
+    """
+    dtype = trace_dtype()
+    header = json.dumps({'version': TRACE_VERSION,
+                         'seed': seed,
+                         'draws': {stream: dtype[stream].shape[0] for stream in STREAMS},
+                         'metadata': metadata or {}}).encode()
+    num_chunks = -(-num_traces // chunk_size)
+    with open(path, 'wb') as file:
+        file.write(MAGIC + struct.pack('<I', len(header)) + header)
+        for chunk, generator in enumerate(np.random.default_rng(seed).spawn(num_chunks)):
+            records = np.empty(min(chunk_size, num_traces - chunk * chunk_size), dtype=dtype)
+            records['trace'] = np.arange(chunk * chunk_size, chunk * chunk_size + len(records))
+            for stream in STREAMS:
+                records[stream] = generator.integers(0, 1 << 32, records[stream].shape, dtype=np.uint32)
+            file.write(records.tobytes())
+
+
+class TraceCorpus:
+    def __init__(self, path: str):
+        """
+        Reads a corpus written by write_corpus. The records are memory-mapped, not loaded, so a corpus of millions of
+        traces is replayed in one sequential pass over the file.
+
+        Raises ValueError if path isn't a trace corpus, or was recorded by another TRACE_VERSION.
+
+        :param path: The corpus file.
+        """
+        with open(path, 'rb') as file:
+            if file.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a trace corpus.")
+            header_length, = struct.unpack('<I', file.read(4))
+            header = json.loads(file.read(header_length))
+        if header['version'] != TRACE_VERSION:
+            raise ValueError(f"{path} was recorded by trace version {header['version']}, not {TRACE_VERSION}.")
+        self.path = path
+        self.seed = header['seed']
+        self.metadata: dict = header['metadata']
+        dtype = trace_dtype(**{f"{stream}_draws": header['draws'][stream] for stream in STREAMS})
+        offset = len(MAGIC) + 4 + header_length
+        num_records = (os.path.getsize(path) - offset) // dtype.itemsize
+        self.records = (np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(num_records,))
+                        if num_records else np.empty(0, dtype=dtype))
+
+    def temple(self, trace: int,
+               initial_room: ValidRoomType | None = None,
+               start_with_initial_room: bool = False) -> Temple:
+        """
+        Returns the temple of one trace, e.g. to debug the run of an offending trace step by step.
+
+        :param trace: The index of the trace.
+        :param initial_room: Which room to start the temple with or not, depending on start_with_initial_room.
+        :param start_with_initial_room: Controls whether the room specified by initial_room starts in the temple.
+        :return: Temple
+        """
+        return trace_temple(self.records[trace], initial_room, start_with_initial_room)
+
+    def replay(self, run_method_func,
+               initial_room: ValidRoomType | None = None,
+               start_with_initial_room: bool = False,
+               start: int = 0,
+               stop: int | None = None,
+               **kwargs):
+        """
+        Replays the traces through a strategy, in order, without drawing any new random numbers.
+
+        :param run_method_func: The function to use for running the temples.
+        :param initial_room: Which room to start the temple with or not, depending on start_with_initial_room.
+        :param start_with_initial_room: Controls whether the room specified by initial_room starts in the temple.
+        :param start: The first trace to replay.
+        :param stop: The trace to stop before. None to replay to the end.
+        :param kwargs: Passed on to run_method_func, e.g. target_rooms, aotv and rr.
+        :return: Generator of the finished Temple of each trace.
+        """
+        for record in self.records[start:stop]:
+            yield run_method_func(trace_temple(record, initial_room, start_with_initial_room), **kwargs)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __repr__(self):
+        return f"TraceCorpus({self.path}, {len(self)} traces, seed {self.seed}, {self.metadata})"
+
+
+def replay_strategies(corpus: TraceCorpus,
+                      run_method_funcs: list,
+                      target_rooms: None | list[ValidRoomType] = None,
+                      initial_room: ValidRoomType | None = None,
+                      start_with_initial_room: bool = False,
+                      aotv: bool = False,
+                      rr: bool = True,
+                      sink=None) -> dict[str, float]:
+    """
+    Replays every trace of the corpus through each strategy, in a single pass over the corpus.
+
+    :param corpus: The TraceCorpus.
+    :param run_method_funcs: The functions to use for running the temples.
+    :param target_rooms: The desired target rooms. If None, strategies are scored on their ratio of T3 rooms.
+    :param initial_room: Which room to start the temple with or not, depending on start_with_initial_room.
+    :param start_with_initial_room: Controls whether the room specified by initial_room starts in the temple.
+    :param aotv: Whether Artefacts of the Vaal is active.
+    :param rr: Whether Resource Reallocation is active.
+    :param sink: Optional function of (trace, strategy name, finished temple), e.g. to log the traces where
+    strategies disagree.
+    :return: Strategy name -> the ratio of T3 target rooms, or the ratio of T3 rooms if target_rooms is None.
+    """
+    kwargs = {'aotv': aotv, 'rr': rr}
+    if target_rooms is not None:
+        if not isinstance(target_rooms, list):
+            target_rooms = [target_rooms]
+        kwargs['target_rooms'] = target_rooms
+    totals = [0] * len(run_method_funcs)
+    for record in corpus.records:
+        for index, run_method_func in enumerate(run_method_funcs):
+            temple = run_method_func(trace_temple(record, initial_room, start_with_initial_room), **kwargs)
+            if target_rooms is None:
+                totals[index] += sum(room.tier == 3 for room in temple)
+            else:
+                totals[index] += any(room.tier == 3 and room.type in target_rooms for room in temple)
+            if sink is not None:
+                sink(int(record['trace']), run_method_func.__name__, temple)
+    trials = len(corpus) * (1 if target_rooms is not None else len(ROOM_CONNECTIONS))
+    return {run_method_func.__name__: round(total / trials, 4) if trials else 0.0
+            for run_method_func, total in zip(run_method_funcs, totals)}
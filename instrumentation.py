@@ -0,0 +1,303 @@
+import sys
+from contextlib import contextmanager
+from functools import wraps
+from time import perf_counter
+import main
+import up_room_logic
+from strategy_engine import compile_strategy
+from temple import Temple, ValidRoomType
+
+# The functions instrumented besides the run_t_* strategies, as (owner, attribute name).
+PROBES = ((Temple, 'upgrade_room'),
+          (Temple, 'get_room_upgrade_option'),
+          (Temple, 'apply_nexus'),
+          (up_room_logic, 'prio_upgrade_unless_target'),
+          (up_room_logic, 'prio_sidegrade_unless_target'),
+          (up_room_logic, 'prio_sidegrade_unless_target_no_t0'),
+          (up_room_logic, 'prio_adjacent_nexus'))
+# The strategy name of calls made outside any run_t_* function.
+NO_STRATEGY = '-'
+
+
+class ProbeStats:
+    def __init__(self):
+        """
+        The calls, time and decision outcomes counted for one instrumented function within one strategy.
+        """
+        self.calls = 0
+        self.seconds = 0.0
+        self.outcomes: dict[str, int] = {}
+
+    def to_dict(self) -> dict:
+        return {'calls': self.calls, 'seconds': self.seconds, 'outcomes': dict(self.outcomes)}
+
+
+def _as_list(target_rooms) -> list:
+    return target_rooms if isinstance(target_rooms, list) else [target_rooms]
+
+
+def _decision_outcome(room, room_type: ValidRoomType, target_rooms) -> str:
+    if room_type in _as_list(target_rooms):
+        return 'target'
+    if room.type is None:
+        return 'new_room'
+    return 'upgrade' if room_type == room.type else 'sidegrade'
+
+
+class Instrumentation:
+    def __init__(self):
+        """
+        Counts the calls, time and decision outcomes of the functions in PROBES, per run_t_* strategy. Nothing is
+        counted until enable is called: the functions are then replaced by counting wrappers, and disable puts the
+        originals back, so a disabled Instrumentation costs nothing.
+
+        Only the current process is instrumented, not the workers of parallel_runner.
+
+        Times are inclusive: the time of prio_adjacent_nexus includes that of its fallback decision, and the time of a
+        strategy includes everything it calls.
+
+        Outcomes counted:
+            decisions: target, new_room, upgrade or sidegrade, by the room type chosen for the room.
+            prio_adjacent_nexus: kept_target, nexus or fallback, by which branch decided.
+            upgrade_room: new_room, upgrade, rr_double (RR upgraded by two) or sidegrade.
+            apply_nexus: no_nexus or applied.
+        """
+        self.stats: dict[str, dict[str, ProbeStats]] = {}
+        self._strategy = NO_STRATEGY
+        self._originals: list[tuple[object, str, object]] = []
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._originals)
+
+    def _stats(self, name: str) -> ProbeStats:
+        strategy_stats = self.stats.setdefault(self._strategy, {})
+        if name not in strategy_stats:
+            strategy_stats[name] = ProbeStats()
+        return strategy_stats[name]
+
+    def _record(self, name: str, seconds: float, outcome: str | None = None):
+        stats = self._stats(name)
+        stats.calls += 1
+        stats.seconds += seconds
+        if outcome is not None:
+            stats.outcomes[outcome] = stats.outcomes.get(outcome, 0) + 1
+
+    def _wrap_strategy(self, func):
+        @wraps(func)
+        def wrapper(temple, **kwargs):
+            previous, self._strategy = self._strategy, func.__name__
+            try:
+                start = perf_counter()
+                result = func(temple, **kwargs)
+                self._record(func.__name__, perf_counter() - start)
+            finally:
+                self._strategy = previous
+            return result
+        return wrapper
+
+    def _wrap_decision(self, func):
+        @wraps(func)
+        def wrapper(temple, room, target_rooms=None):
+            start = perf_counter()
+            result = func(temple=temple, room=room, target_rooms=target_rooms)
+            elapsed = perf_counter() - start
+            self._record(func.__name__, elapsed, _decision_outcome(room, result, target_rooms))
+            return result
+        return wrapper
+
+    def _wrap_prio_adjacent_nexus(self, func):
+        @wraps(func)
+        def wrapper(default_decision, temple, room, target_rooms=None):
+            fell_back = False
+
+            def fallback(**kwargs):
+                nonlocal fell_back
+                fell_back = True
+                return default_decision(**kwargs)
+
+            kept_target = room.type is not None and room.type in _as_list(target_rooms)
+            start = perf_counter()
+            result = func(default_decision=fallback, temple=temple, room=room, target_rooms=target_rooms)
+            elapsed = perf_counter() - start
+            self._record(func.__name__, elapsed,
+                         'kept_target' if kept_target else 'fallback' if fell_back else 'nexus')
+            return result
+        return wrapper
+
+    def _wrap_compiled_decision(self, name: str, func):
+        # The decisions of strategy_engine, counted under the name of their up_room_logic equivalent.
+        if name == 'prio_adjacent_nexus':
+            def wrapper(default_decision, temple, room, targets):
+                fell_back = False
+
+                def fallback(*args):
+                    nonlocal fell_back
+                    fell_back = True
+                    return default_decision(*args)
+
+                kept_target = room.type is not None and room.type in targets.last
+                start = perf_counter()
+                result = func(fallback, temple, room, targets)
+                elapsed = perf_counter() - start
+                self._record(name, elapsed, 'kept_target' if kept_target else 'fallback' if fell_back else 'nexus')
+                return result
+        else:
+            def wrapper(temple, room, targets):
+                start = perf_counter()
+                result = func(temple, room, targets)
+                elapsed = perf_counter() - start
+                self._record(name, elapsed, _decision_outcome(room, result, targets.rooms))
+                return result
+        return wrapper
+
+    def _wrap_upgrade_room(self, func):
+        @wraps(func)
+        def wrapper(temple, room, new_room_type, rr=False):
+            room = temple.rooms[room] if isinstance(room, int) else room
+            room_type, tier = room.type, room.tier
+            start = perf_counter()
+            func(temple, room, new_room_type, rr)
+            elapsed = perf_counter() - start
+            if room_type is None:
+                outcome = 'new_room'
+            elif new_room_type != room_type:
+                outcome = 'sidegrade'
+            else:
+                outcome = 'rr_double' if room.tier - tier == 2 else 'upgrade'
+            self._record('upgrade_room', elapsed, outcome)
+        return wrapper
+
+    def _wrap_apply_nexus(self, func):
+        @wraps(func)
+        def wrapper(temple):
+            start = perf_counter()
+            func(temple)
+            elapsed = perf_counter() - start
+            self._record('apply_nexus', elapsed,
+                         'no_nexus' if temple.room_index(ValidRoomType.ADJACENT_ROOM_LEVELS) is None else 'applied')
+        return wrapper
+
+    def _wrap_timed(self, func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            result = func(*args, **kwargs)
+            self._record(func.__name__, perf_counter() - start)
+            return result
+        return wrapper
+
+    def _wrapper(self, name: str, func):
+        if name.startswith('run_t_') and hasattr(func, 'spec'):
+            # Compiled strategies don't call up_room_logic, so they are recompiled with instrumented decisions.
+            return self._wrap_strategy(wraps(func)(compile_strategy(func.spec, self._wrap_compiled_decision)))
+        if name.startswith('run_t_'):
+            return self._wrap_strategy(func)
+        if name == 'prio_adjacent_nexus':
+            return self._wrap_prio_adjacent_nexus(func)
+        if name.startswith('prio_'):
+            return self._wrap_decision(func)
+        if name == 'upgrade_room':
+            return self._wrap_upgrade_room(func)
+        if name == 'apply_nexus':
+            return self._wrap_apply_nexus(func)
+        return self._wrap_timed(func)
+
+    def enable(self):
+        """
+        Replaces the run_t_* functions of main and the functions in PROBES with counting wrappers. Modules that
+        imported one of these functions by name get the wrapper too.
+
+        Raises RuntimeError if already enabled.
+
+        :return: None
+        """
+        if self.enabled:
+            raise RuntimeError("instrumentation is already enabled.")
+        targets = [(owner, name) for owner, name in PROBES]
+        targets.extend((main, name) for name, value in vars(main).items()
+                       if name.startswith('run_t_') and callable(value))
+        for owner, name in targets:
+            original = vars(owner)[name]
+            wrapper = self._wrapper(name, original)
+            self._originals.append((owner, name, original))
+            setattr(owner, name, wrapper)
+            if isinstance(owner, type):
+                continue
+            for module in list(sys.modules.values()):
+                if module is not owner and getattr(module, name, None) is original:
+                    self._originals.append((module, name, original))
+                    setattr(module, name, wrapper)
+
+    def disable(self):
+        """
+        Puts back the functions replaced by enable. The counts are kept.
+
+        :return: None
+        """
+        for owner, name, original in reversed(self._originals):
+            setattr(owner, name, original)
+        self._originals.clear()
+
+    def reset(self):
+        """
+        Clears the counts.
+
+        :return: None
+        """
+        self.stats.clear()
+
+    def to_dict(self) -> dict:
+        """
+        Returns the counts as plain data, for exporting as JSON: strategy -> function -> calls, seconds and outcomes.
+
+        :return: dict
+        """
+        return {strategy: {name: stats.to_dict() for name, stats in strategy_stats.items()}
+                for strategy, strategy_stats in self.stats.items()}
+
+    def report(self) -> str:
+        """
+        Returns a table per strategy of each instrumented function's calls, calls per temple, time per call and
+        outcome shares.
+
+        :return: str
+        """
+        lines = []
+        for strategy, strategy_stats in self.stats.items():
+            runs = strategy_stats[strategy].calls if strategy in strategy_stats else None
+            lines.append(f"### {strategy}" + (f" ({runs} temples)" if runs else ""))
+            width = max(len(name) for name in strategy_stats)
+            for name, stats in strategy_stats.items():
+                per_temple = f"{stats.calls / runs:7.2f}/temple" if runs else ""
+                outcomes = '  '.join(f"{outcome} {count / stats.calls:.1%}"
+                                     for outcome, count in sorted(stats.outcomes.items()))
+                lines.append(f"{name:<{width}}  {stats.calls:>9} calls {per_temple:>14}  "
+                             f"{stats.seconds / stats.calls * 1e6:8.2f}us/call  {outcomes}")
+            lines.append("")
+        return '\n'.join(lines)
+
+    def __repr__(self):
+        return self.report()
+
+
+@contextmanager
+def instrument(instrumentation: Instrumentation | None = None):
+    """
+    Enables instrumentation for the duration of a with block, e.g.
+
+        with instrument() as instrumentation:
+            main.calc_ratio_t3_rooms(main.run_t_always_upgrade, num_runs=1000)
+        print(instrumentation.report())
+
+    Strategy functions must be looked up inside the block (main.run_t_...) for calls to be attributed to them.
+
+    :param instrumentation: The Instrumentation to count into. Defaults to a new one.
+    :return: The Instrumentation.
+    """
+    instrumentation = instrumentation or Instrumentation()
+    instrumentation.enable()
+    try:
+        yield instrumentation
+    finally:
+        instrumentation.disable()
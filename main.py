@@ -1,10 +1,7 @@
-from random import sample
 from collections import Counter
 from temple import Temple, ValidRoomType
-from up_room_logic import (prio_upgrade_unless_target,
-                           prio_sidegrade_unless_target,
-                           prio_sidegrade_unless_target_no_t0,
-                           prio_adjacent_nexus)
+from strategy_engine import strategy
+from outcome_distribution import TargetDistribution
 
 
 def text_red(text, conditional: bool) -> str:
@@ -18,6 +15,7 @@ def text_red(text, conditional: bool) -> str:
     return '\033[91m' + str(text) + '\033[0m' if conditional else str(text)
 
 
+@strategy()
 def run_t_always_upgrade(temple: Temple, **kwargs) -> Temple:
     """
     Run a temple, always upgrading rooms. Choose a random room type when upgrading un-tiered rooms.
@@ -27,20 +25,9 @@ def run_t_always_upgrade(temple: Temple, **kwargs) -> Temple:
     :keyword rr (bool): (default False) Whether Resource Reallocation is active.
     :return: The completed Temple object.
     """
-    aotv = kwargs['aotv'] if 'aotv' in kwargs else False
-    rr = kwargs['rr'] if 'rr' in kwargs else False
-    incurs_per_area, num_areas = (4, 3) if aotv else (3, 4)
-    for _ in range(num_areas):
-        for picked_room in sample(temple.valid_rooms_remaining, incurs_per_area):
-            temple.upgrade_room(room=picked_room,
-                                new_room_type=prio_upgrade_unless_target(temple=temple,
-                                                                         room=picked_room,
-                                                                         target_rooms=None),
-                                rr=rr)
-    temple.apply_nexus()
-    return temple
 
 
+@strategy()
 def run_t_always_pick_target_rooms(temple: Temple, **kwargs):
     """
     Run a temple, always picking target rooms, otherwise just upgrading.
@@ -52,25 +39,9 @@ def run_t_always_pick_target_rooms(temple: Temple, **kwargs):
     :keyword rr (bool): (default False) Whether Resource Reallocation is active.
     :return: The completed Temple object.
     """
-    if 'target_room' in kwargs:
-        raise KeyError('invalid key target_room. Should be target_rooms.')
-    target_rooms = kwargs['target_rooms'] if 'target_rooms' in kwargs else [ValidRoomType.ITEM_DOUBLE_CORRUPT]
-    aotv = kwargs['aotv'] if 'aotv' in kwargs else False
-    rr = kwargs['rr'] if 'rr' in kwargs else False
-    if not isinstance(target_rooms, list):
-        target_rooms = [target_rooms]
-    incurs_per_area, num_areas = (4, 3) if aotv else (3, 4)
-    for _ in range(num_areas):
-        for picked_room in sample(temple.valid_rooms_remaining, incurs_per_area):
-            temple.upgrade_room(room=picked_room,
-                                new_room_type=prio_upgrade_unless_target(temple=temple,
-                                                                         room=picked_room,
-                                                                         target_rooms=target_rooms),
-                                rr=rr)
-    temple.apply_nexus()
-    return temple
 
 
+@strategy()
 def run_t_place_desired_room_on_t2_no_t0(temple: Temple, **kwargs) -> Temple:
     """
     Run a temple that is missing a desired room, prioritising getting rooms to t2 by side-grading them, and then
@@ -84,25 +55,9 @@ def run_t_place_desired_room_on_t2_no_t0(temple: Temple, **kwargs) -> Temple:
     :keyword rr (bool): (default False) Whether Resource Reallocation is active.
     :return:
     """
-    if 'target_room' in kwargs:
-        raise KeyError('invalid key target_room. Should be target_rooms.')
-    target_rooms = kwargs['target_rooms'] if 'target_rooms' in kwargs else [ValidRoomType.ITEM_DOUBLE_CORRUPT]
-    aotv = kwargs['aotv'] if 'aotv' in kwargs else False
-    rr = kwargs['rr'] if 'rr' in kwargs else False
-    if not isinstance(target_rooms, list):
-        target_rooms = [target_rooms]
-    incurs_per_area, num_areas = (4, 3) if aotv else (3, 4)
-    for _ in range(num_areas):
-        for picked_room in sample(temple.valid_rooms_remaining, incurs_per_area):
-            temple.upgrade_room(room=picked_room,
-                                new_room_type=prio_sidegrade_unless_target_no_t0(temple=temple,
-                                                                                 room=picked_room,
-                                                                                 target_rooms=target_rooms),
-                                rr=rr)
-    temple.apply_nexus()
-    return temple
 
 
+@strategy()
 def run_t_place_desired_room_on_t2(temple: Temple, **kwargs) -> Temple:
     """
     Run a temple that is missing a desired room, prioritising getting rooms to t2 by side-grading them, and then
@@ -115,25 +70,9 @@ def run_t_place_desired_room_on_t2(temple: Temple, **kwargs) -> Temple:
     :keyword rr (bool): (default False) Whether Resource Reallocation is active.
     :return:
     """
-    if 'target_room' in kwargs:
-        raise KeyError('invalid key target_room. Should be target_rooms.')
-    target_rooms = kwargs['target_rooms'] if 'target_rooms' in kwargs else [ValidRoomType.ITEM_DOUBLE_CORRUPT]
-    aotv = kwargs['aotv'] if 'aotv' in kwargs else False
-    rr = kwargs['rr'] if 'rr' in kwargs else False
-    if not isinstance(target_rooms, list):
-        target_rooms = [target_rooms]
-    incurs_per_area, num_areas = (4, 3) if aotv else (3, 4)
-    for _ in range(num_areas):
-        for picked_room in sample(temple.valid_rooms_remaining, incurs_per_area):
-            temple.upgrade_room(room=picked_room,
-                                new_room_type=prio_sidegrade_unless_target(temple=temple,
-                                                                           room=picked_room,
-                                                                           target_rooms=target_rooms),
-                                rr=rr)
-    temple.apply_nexus()
-    return temple
 
 
+@strategy()
 def run_t_prio_t2_until_target_exists(temple: Temple, **kwargs) -> Temple:
     """
     Run a temple that is missing a desired room, prioritising getting rooms to t2 by side-grading them, and then
@@ -147,25 +86,9 @@ def run_t_prio_t2_until_target_exists(temple: Temple, **kwargs) -> Temple:
     :keyword rr (bool): (default False) Whether Resource Reallocation is active.
     :return:
     """
-    if 'target_room' in kwargs:
-        raise KeyError('invalid key target_room. Should be target_rooms.')
-    target_rooms = kwargs['target_rooms'] if 'target_rooms' in kwargs else [ValidRoomType.ITEM_DOUBLE_CORRUPT]
-    aotv = kwargs['aotv'] if 'aotv' in kwargs else False
-    rr = kwargs['rr'] if 'rr' in kwargs else False
-    if not isinstance(target_rooms, list):
-        target_rooms = [target_rooms]
-    incurs_per_area, num_areas = (4, 3) if aotv else (3, 4)
-    for _ in range(num_areas):
-        for picked_room in sample(temple.valid_rooms_remaining, incurs_per_area):
-            target_exists = any([target_room not in temple.valid_room_types_remaining for target_room in target_rooms])
-            decision_type = prio_upgrade_unless_target if target_exists else prio_sidegrade_unless_target
-            temple.upgrade_room(room=picked_room,
-                                new_room_type=decision_type(temple=temple, room=picked_room, target_rooms=target_rooms),
-                                rr=rr)
-    temple.apply_nexus()
-    return temple
 
 
+@strategy()
 def run_t_prio_t2_until_target_exists_prio_nexus(temple: Temple, **kwargs) -> Temple:
     """
     Run a temple that is missing a desired room, prioritising getting rooms to t2 by side-grading them, and then
@@ -180,28 +103,9 @@ def run_t_prio_t2_until_target_exists_prio_nexus(temple: Temple, **kwargs) -> Te
     :keyword rr (bool): (default False) Whether Resource Reallocation is active.
     :return:
     """
-    if 'target_room' in kwargs:
-        raise KeyError('invalid key target_room. Should be target_rooms.')
-    target_rooms = kwargs['target_rooms'] if 'target_rooms' in kwargs else [ValidRoomType.ITEM_DOUBLE_CORRUPT]
-    aotv = kwargs['aotv'] if 'aotv' in kwargs else False
-    rr = kwargs['rr'] if 'rr' in kwargs else False
-    if not isinstance(target_rooms, list):
-        target_rooms = [target_rooms]
-    incurs_per_area, num_areas = (4, 3) if aotv else (3, 4)
-    for _ in range(num_areas):
-        for picked_room in sample(temple.valid_rooms_remaining, incurs_per_area):
-            target_exists = any([target_room not in temple.valid_room_types_remaining for target_room in target_rooms])
-            decision_type = prio_upgrade_unless_target if target_exists else prio_sidegrade_unless_target
-            temple.upgrade_room(room=picked_room,
-                                new_room_type=prio_adjacent_nexus(default_decision=decision_type,
-                                                                  temple=temple,
-                                                                  room=picked_room,
-                                                                  target_rooms=target_rooms),
-                                rr=rr)
-    temple.apply_nexus()
-    return temple
 
 
+@strategy()
 def run_t_prio_t2_until_target_exists_prio_nexus_early_stop(temple: Temple, **kwargs) -> Temple:
     """
     Run a temple that is missing a desired room, prioritising getting rooms to t2 by side-grading them, and then
@@ -217,34 +121,45 @@ def run_t_prio_t2_until_target_exists_prio_nexus_early_stop(temple: Temple, **kw
     :keyword rr (bool): (default False) Whether Resource Reallocation is active.
     :return:
     """
-    if 'target_room' in kwargs:
-        raise KeyError('invalid key target_room. Should be target_rooms.')
-    target_rooms = kwargs['target_rooms'] if 'target_rooms' in kwargs else [ValidRoomType.ITEM_DOUBLE_CORRUPT]
-    aotv = kwargs['aotv'] if 'aotv' in kwargs else False
-    rr = kwargs['rr'] if 'rr' in kwargs else False
-    if not isinstance(target_rooms, list):
-        target_rooms = [target_rooms]
-    incurs_per_area, num_areas = (4, 3) if aotv else (3, 4)
-    incursions_remaining = incurs_per_area * num_areas
-    while incursions_remaining > 0:
-        incurs_in_this_area = incurs_per_area if incurs_per_area < incursions_remaining else incursions_remaining
-        for picked_room in sample(temple.valid_rooms_remaining, incurs_in_this_area):
-            target_exists = any([target_room not in temple.valid_room_types_remaining for target_room in target_rooms])
-            decision_type = prio_upgrade_unless_target if target_exists else prio_sidegrade_unless_target
-            temple.upgrade_room(room=picked_room,
-                                new_room_type=prio_adjacent_nexus(default_decision=decision_type,
-                                                                  temple=temple,
-                                                                  room=picked_room,
-                                                                  target_rooms=target_rooms),
-                                rr=rr)
-            incursions_remaining -= 1
-            if picked_room.type in target_rooms:
-                break
-    temple.apply_nexus()
-    return temple
-
-
-def calc_ratio_t3_rooms(run_method_func, num_runs: int = 100000, aotv: bool = False, rr: bool = False) -> float:
+
+
+def count_t3_room_levels(run_method_func,
+                         num_runs: int = 100000,
+                         aotv: bool = False,
+                         rr: bool = False,
+                         sink=None,
+                         rng=None) -> Counter:
+    """
+    Run temples using the supplied function and count how many rooms finished at each tier.
+
+    :param run_method_func: The function to use for running the temples.
+    :param num_runs: How many temple runs to do.
+    :param aotv: Whether Artefacts of the Vaal is active.
+    :param rr: Whether Resource Reallocation is active.
+    :param sink: Optional object with a write(temple) method given every finished temple, e.g. an
+    outcome_log.OutcomeLogWriter.
+    :param rng: The source of randomness of the temples, e.g. a block_rng.BlockRNG. Defaults to the random module.
+    :return: A Counter of room tier -> number of rooms.
+    """
+    tier_totals = [0, 0, 0, 0]
+    temple = Temple(rng=rng)
+    for run in range(num_runs):
+        if run:
+            temple.reset()
+        current_temple = run_method_func(temple, aotv=aotv, rr=rr)
+        for room in current_temple.rooms:
+            tier_totals[room.tier] += 1
+        if sink is not None:
+            sink.write(current_temple)
+    return Counter({tier: total for tier, total in enumerate(tier_totals) if total})
+
+
+def calc_ratio_t3_rooms(run_method_func,
+                        num_runs: int = 100000,
+                        aotv: bool = False,
+                        rr: bool = False,
+                        sink=None,
+                        rng=None) -> float:
     """
     Calculate the ratio of T3 rooms in temples using the supplied function to run them, ignoring room types.
 
@@ -252,22 +167,100 @@ def calc_ratio_t3_rooms(run_method_func, num_runs: int = 100000, aotv: bool = Fa
     :param num_runs: How many temple runs to do.
     :param aotv: Whether Artefacts of the Vaal is active.
     :param rr: Whether Resource Reallocation is active.
+    :param sink: Optional object with a write(temple) method given every finished temple, e.g. an
+    outcome_log.OutcomeLogWriter.
+    :param rng: The source of randomness of the temples, e.g. a block_rng.BlockRNG. Defaults to the random module.
     :return: The ratio of T3 rooms.
     """
-    temple_room_level_totals = Counter()
-    for _ in range(num_runs):
-        current_temple = run_method_func(Temple(), aotv=aotv, rr=rr)
-        temple_room_level_totals += Counter(list(map(int, current_temple)))
+    temple_room_level_totals = count_t3_room_levels(run_method_func, num_runs=num_runs, aotv=aotv, rr=rr, sink=sink,
+                                                    rng=rng)
     ratio = round(temple_room_level_totals[3] / temple_room_level_totals.total(), 4)
     return ratio
 
 
+def count_target_tiers(run_method_func,
+                       target_rooms: list[ValidRoomType],
+                       initial_room: ValidRoomType | None = None,
+                       start_with_initial_room: bool = False,
+                       num_runs: int = 100000,
+                       aotv: bool = False,
+                       sink=None,
+                       rng=None) -> TargetDistribution:
+    """
+    Run temples using the supplied function and collect the final tier of each desired room, and how many of them
+    finished at T3. rr is assumed active.
+
+    :param run_method_func: The function to use for running the temples.
+    :param target_rooms: The desired target rooms.
+    :param initial_room: Which room to start the temple with or not, depending on start_with_initial_room.
+    :param start_with_initial_room: Controls whether the room specified by initial_room starts in the temple.
+    :param num_runs: How many temple runs to do.
+    :param aotv: Whether Artefacts of the Vaal is active.
+    :param sink: Optional object with a write(temple) method given every finished temple, e.g. an
+    outcome_log.OutcomeLogWriter.
+    :param rng: The source of randomness of the temples, e.g. a block_rng.BlockRNG. Defaults to the random module.
+    :return: TargetDistribution
+    """
+    if not isinstance(target_rooms, list):
+        target_rooms = [target_rooms]
+    distribution = TargetDistribution(target_rooms)
+    if not initial_room:
+        initial_room, start_with_initial_room = None, False
+    temple = Temple(desired_room=initial_room, start_with_desired_room=start_with_initial_room, rng=rng)
+    for run in range(num_runs):
+        if run:
+            temple.reset(desired_room=initial_room, start_with_desired_room=start_with_initial_room)
+        current_temple = run_method_func(temple, target_rooms=target_rooms, aotv=aotv, rr=True)
+        distribution.add(current_temple)
+        if sink is not None:
+            sink.write(current_temple)
+    return distribution
+
+
+def count_target_t3_results(run_method_func,
+                            target_rooms: list[ValidRoomType],
+                            initial_room: ValidRoomType | None = None,
+                            start_with_initial_room: bool = False,
+                            num_runs: int = 100000,
+                            aotv: bool = False,
+                            sink=None,
+                            rng=None) -> Counter:
+    """
+    Run temples using the supplied function and count how many of them finished with a T3 desired room. rr is assumed
+    active.
+
+    :param run_method_func: The function to use for running the temples.
+    :param target_rooms: The desired target rooms.
+    :param initial_room: Which room to start the temple with or not, depending on start_with_initial_room.
+    :param start_with_initial_room: Controls whether the room specified by initial_room starts in the temple.
+    :param num_runs: How many temple runs to do.
+    :param aotv: Whether Artefacts of the Vaal is active.
+    :param sink: Optional object with a write(temple) method given every finished temple, e.g. an
+    outcome_log.OutcomeLogWriter.
+    :param rng: The source of randomness of the temples, e.g. a block_rng.BlockRNG. Defaults to the random module.
+    :return: A Counter of True (a desired room is T3) / False -> number of temples.
+    """
+    distribution = count_target_tiers(run_method_func,
+                                      target_rooms=target_rooms,
+                                      initial_room=initial_room,
+                                      start_with_initial_room=start_with_initial_room,
+                                      num_runs=num_runs,
+                                      aotv=aotv,
+                                      sink=sink,
+                                      rng=rng)
+    no_t3_targets = distribution.t3_counts[0]
+    return Counter({result: count for result, count in ((True, num_runs - no_t3_targets), (False, no_t3_targets))
+                    if count})
+
+
 def calc_ratio_target_t3_rooms(run_method_func,
                                target_rooms: list[ValidRoomType],
                                initial_room: ValidRoomType | None = None,
                                start_with_initial_room: bool = False,
                                num_runs: int = 100000,
-                               aotv: bool = False):
+                               aotv: bool = False,
+                               sink=None,
+                               rng=None):
     """
     Calculate the ratio of T3 desired rooms in temples using the supplied function to run them. rr is assumed active.
 
@@ -277,22 +270,19 @@ def calc_ratio_target_t3_rooms(run_method_func,
     :param start_with_initial_room: Controls whether the room specified by initial_room starts in the temple.
     :param num_runs: How many temple runs to do.
     :param aotv: Whether Artefacts of the Vaal is active.
+    :param sink: Optional object with a write(temple) method given every finished temple, e.g. an
+    outcome_log.OutcomeLogWriter.
+    :param rng: The source of randomness of the temples, e.g. a block_rng.BlockRNG. Defaults to the random module.
     :return: The ratio of T3 desired target rooms.
     """
-    results = Counter()
-    for _ in range(num_runs):
-        if initial_room:
-            temple = Temple(desired_room=initial_room, start_with_desired_room=start_with_initial_room)
-        else:
-            temple = Temple()
-        current_temple: Temple = run_method_func(temple, target_rooms=target_rooms, aotv=aotv, rr=True)
-        current_result: list[bool] = []
-        for target_room in target_rooms:
-            try:
-                current_result.append(current_temple[target_room].tier == 3)
-            except ValueError:
-                current_result.append(False)
-        results += Counter([True in current_result])
+    results = count_target_t3_results(run_method_func,
+                                      target_rooms=target_rooms,
+                                      initial_room=initial_room,
+                                      start_with_initial_room=start_with_initial_room,
+                                      num_runs=num_runs,
+                                      aotv=aotv,
+                                      sink=sink,
+                                      rng=rng)
     return round(results[True] / results.total(), 4)
 
 
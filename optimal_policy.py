@@ -0,0 +1,323 @@
+from collections import defaultdict
+from temple import Temple, ValidRoomType, ROOM_CONNECTIONS
+from strategy_spec import StrategySpec, UPGRADE
+from exact_solver import (ExactTempleSolver, EMPTY, OTHER, KEEP, ADJACENT_UNPICKED, ADJACENT_PICKED, APART_UNPICKED,
+                          APART_PICKED, NUM_ROOMS, NUM_POSITIONS_BY_DEGREE, SETTLED, hypergeometric_splits,
+                          _with, _add_room, _add_counts)
+
+# The solver's bookkeeping: positions once a target exists, incursions counted across areas so an area can end early,
+# and the nexus settled once decisions are fixed. The decisions themselves are the solver's.
+POLICY_SPEC = StrategySpec(UPGRADE, prio_nexus=True, upgrade_once_target_exists=True, early_stop=True)
+
+
+class OptimalPolicySolver(ExactTempleSolver):
+    def __init__(self, target_room: ValidRoomType = ValidRoomType.ITEM_DOUBLE_CORRUPT,
+                 aotv: bool = False,
+                 rr: bool = True,
+                 initial_room: ValidRoomType | None = None,
+                 start_with_initial_room: bool = False,
+                 num_starting_tiered_rooms: int = 7):
+        """
+        Solves the temple as a Markov decision process for the probability of a T3 target room, over the state
+        abstraction of ExactTempleSolver: the target and nexus rooms, with their position once the target exists, and
+        the other rooms as tier counts adjacent to the target or apart from it.
+
+        At every incursion the policy chooses which offered room type a room takes, or to keep its type, and afterwards
+        whether to end the area there. Remaining incursions carry over to the next area, as with early stop. A state's
+        value is the best of its choices, memoized like the solver's, so each state is solved once.
+
+        The policy only sees the abstraction, and a few choices are ruled out to keep it solvable:
+        - The target and nexus rooms always keep their type. Sidegrading a non-special room to another non-special
+          type is never better than keeping it, which also gets the rr bonus.
+        - Once the target and nexus both exist, the only choice left is, at the start of each area (or when that
+          happens mid-area), whether to end the area as soon as the target room is picked.
+        The value is exact for the exported policy, and the best within these choices.
+
+        Solving takes several minutes and a few GB of memory, like the prio_nexus strategies of ExactTempleSolver.
+
+        :param target_room: The desired target room.
+        :param aotv: Whether Artefacts of the Vaal is active.
+        :param rr: Whether Resource Reallocation is active.
+        :param initial_room: Which room to start the temple with or not, depending on start_with_initial_room.
+        :param start_with_initial_room: Controls whether the room specified by initial_room starts in the temple.
+        :param num_starting_tiered_rooms: How many rooms to start at tier 1.
+        """
+        super().__init__(POLICY_SPEC,
+                         target_rooms=[target_room],
+                         aotv=aotv,
+                         rr=rr,
+                         initial_room=initial_room,
+                         start_with_initial_room=start_with_initial_room,
+                         num_starting_tiered_rooms=num_starting_tiered_rooms)
+        self.target_class = self.decision_targets[0]
+        self.target_slot = self.class_slot(self.target_class)
+        self.probability = None
+
+    # Choices
+
+    def candidate_results(self, room_class: int, options: tuple) -> set[int]:
+        """
+        Returns the choices for a room given its upgrade options: KEEP or the room class to sidegrade it to.
+        """
+        if room_class not in (EMPTY, OTHER):
+            return {KEEP}
+        results = {KEEP} if room_class == OTHER else set()
+        for option in options:
+            if option != OTHER or room_class == EMPTY:
+                results.add(option)
+        return results
+
+    def _after_incursion(self, specials: tuple, groups: tuple, area_left: int, rest: int) -> float:
+        """
+        Value after an incursion: continuing the area, or ending it if that is better.
+        """
+        result = self.value(specials, groups, area_left - 1, rest - 1)
+        if area_left > 1:
+            result = max(result, self.value(specials, groups, 0, rest - 1))
+        return result
+
+    def result_value(self, specials: tuple, groups: tuple, pick: tuple, result: int, area_left: int,
+                     rest: int) -> float:
+        """
+        Value of choosing result for the picked room. Once decisions are fixed, the state is settled right away rather
+        than at the end of the area, which keeps positions out of the memo, and many positions settle alike.
+
+        :param pick: (slot, group, tier) of the picked room, slot None for a non-special room of group.
+        :param result: KEEP or the room class to sidegrade to.
+        """
+        slot, group, tier = pick
+        if slot is None:
+            room_class = EMPTY if tier == 0 else OTHER
+            base_specials = specials
+            base_groups = _with(groups, group, _add_room(groups[group], tier, -1))
+        else:
+            room_class = self.slot_class(slot)
+            base_specials = _with(specials, slot, None)
+            base_groups = groups
+        new_class = room_class if result == KEEP else result
+        states = defaultdict(float)
+        for tier_probability, new_tier in self._tier_outcomes(result, tier):
+            for probability, new_specials, new_groups in self._move(base_specials, base_groups, slot, group,
+                                                                    new_class, new_tier, specials, tier_probability):
+                if self._decisions_fixed(new_specials) and not self._is_settled(new_specials):
+                    for settled_probability, settled_specials, settled_groups in self._settle(new_specials,
+                                                                                              new_groups):
+                        states[(settled_specials, settled_groups)] += probability * settled_probability
+                else:
+                    states[(new_specials, new_groups)] += probability
+        return sum(probability * self._after_incursion(new_specials, new_groups, area_left, rest)
+                   for (new_specials, new_groups), probability in states.items())
+
+    def _positioned(self, specials: tuple, groups: tuple, probability: float) -> list:
+        """
+        When the target room appears while the nexus already exists, both take uniformly random positions and decisions
+        are fixed at once, so the state goes straight to its settled distribution: the nexus degree, whether the target
+        is next to it, and which rooms are its other neighbours.
+        """
+        target, nexus = specials[self.target_slot], specials[self.nexus_slot]
+        if target is None or nexus is None or target[1] is not None or nexus[1] is not None:
+            return super()._positioned(specials, groups, probability)
+        rooms = (_add_counts(groups[ADJACENT_UNPICKED], groups[APART_UNPICKED])
+                 + _add_counts(groups[ADJACENT_PICKED], groups[APART_PICKED]))
+        states = []
+        for degree, num_positions in NUM_POSITIONS_BY_DEGREE.items():
+            for adjacent in (True, False):
+                adjacent_probability = degree / (NUM_ROOMS - 1) if adjacent else 1 - degree / (NUM_ROOMS - 1)
+                settled = _with(specials, self.target_slot, (target[0], SETTLED, target[2]))
+                settled = _with(settled, self.nexus_slot, (nexus[0], (SETTLED, adjacent), nexus[2]))
+                for drawn, split_probability in hypergeometric_splits(rooms, degree - adjacent):
+                    rest = _add_counts(rooms, drawn, -1)
+                    states.append((probability * num_positions / NUM_ROOMS * adjacent_probability * split_probability,
+                                   settled, (drawn[:4], drawn[4:], rest[:4], rest[4:])))
+        return states
+
+    def value(self, specials: tuple, groups: tuple, area_left: int, rest: int) -> float:
+        """
+        See ExactTempleSolver.value. Settled states with a single incursion left in the area (and picked rooms) are
+        only reached right after decisions become fixed, from far more distinct states than the rest, and that one
+        incursion is quick to resolve, so they aren't memoized.
+        """
+        target = specials[self.target_slot]
+        if (area_left == 1 and self._is_settled(specials) and target[0] < 3
+                and (target[2] or specials[self.nexus_slot][2]
+                     or any(groups[ADJACENT_PICKED]) or any(groups[APART_PICKED]))
+                and self._any_eligible(specials, groups)):
+            return self._incursion_value(specials, groups, area_left, rest)
+        return super().value(specials, groups, area_left, rest)
+
+    def fixed_value(self, specials: tuple, groups: tuple, area_left: int, rest: int, early_stop: bool) -> float:
+        """
+        Value of resolving the rest of the area with fixed decisions, ending it once the target is picked or not.
+        """
+        return sum(probability * self.value(new_specials, new_groups, 0, rest - used)
+                   for (new_specials, new_groups, used), probability
+                   in self._fixed_area_outcomes(specials, groups, area_left, early_stop).items())
+
+    def fixed_choice(self, specials: tuple, groups: tuple, area_left: int, rest: int) -> tuple[float, bool]:
+        """
+        Returns the value of a state with fixed decisions and whether its area should end once the target is picked.
+        """
+        target = specials[self.target_slot]
+        # Ending the area on the target only makes a difference with another incursion after it.
+        if area_left == 1 or target[0] == 3 or target[2]:
+            return self.fixed_value(specials, groups, area_left, rest, False), False
+        return max((self.fixed_value(specials, groups, area_left, rest, early_stop), early_stop)
+                   for early_stop in (False, True))
+
+    def _incursion_value(self, specials: tuple, groups: tuple, area_left: int, rest: int) -> float:
+        if self._decisions_fixed(specials):
+            return self.fixed_choice(specials, groups, area_left, rest)[0]
+        picks = []
+        for slot, special in enumerate(specials):
+            if special is not None and special[0] < 3 and not special[2]:
+                picks.append((1, (slot, None, special[0])))
+        for group in (ADJACENT_UNPICKED, APART_UNPICKED):
+            for tier in range(3):
+                if groups[group][tier]:
+                    picks.append((groups[group][tier], (None, group, tier)))
+        num_eligible = sum(count for count, _ in picks)
+        pool = self._pool(specials, groups)
+        total = 0.0
+        for count, pick in picks:
+            slot, _, tier = pick
+            if slot is not None:
+                total += count / num_eligible * self.result_value(specials, groups, pick, KEEP, area_left, rest)
+                continue
+            room_class = EMPTY if tier == 0 else OTHER
+            result_values = {}
+            pick_value = 0.0
+            for draw_probability, options in self._draws(pool, 2 if tier == 0 else 1):
+                best = 0.0
+                for result in self.candidate_results(room_class, options):
+                    if result not in result_values:
+                        result_values[result] = self.result_value(specials, groups, pick, result, area_left, rest)
+                    best = max(best, result_values[result])
+                pick_value += draw_probability * best
+            total += count / num_eligible * pick_value
+        return total
+
+    def solve_policy(self) -> float:
+        """
+        Solves the optimal policy, keeping the memoized values the exported policy looks its choices up in.
+
+        :return: The exact probability of a T3 target room under the optimal policy.
+        """
+        if self.probability is None:
+            self.probability = self.solve(lambda target_tiers, num_t3: float(target_tiers[0] == 3), counts_t3=False)
+        return self.probability
+
+    # The policy on a Temple
+
+    def temple_state(self, temple: Temple, picked: set[int]) -> tuple[tuple, tuple]:
+        """
+        Returns the abstract state of a temple mid-run, settled once decisions are fixed (see _after_incursion).
+
+        :param temple: The Temple.
+        :param picked: The indices of the rooms picked in the current area.
+        :return: (specials, groups)
+        """
+        target_index = temple.room_index(self.target_rooms[0])
+        nexus_index = temple.room_index(ValidRoomType.ADJACENT_ROOM_LEVELS)
+        specials = [None] * (self.nexus_slot + 1)
+        for slot, index in ((self.target_slot, target_index), (self.nexus_slot, nexus_index)):
+            if index is not None:
+                specials[slot] = (temple.rooms[index].tier, index if target_index is not None else None,
+                                  index in picked)
+        if target_index is not None and nexus_index is not None:
+            nexus_connections = ROOM_CONNECTIONS[nexus_index]
+            specials[self.target_slot] = specials[self.target_slot][:1] + (SETTLED,) + specials[self.target_slot][2:]
+            specials[self.nexus_slot] = (specials[self.nexus_slot][0], (SETTLED, target_index in nexus_connections),
+                                         specials[self.nexus_slot][2])
+            # Rooms next to the nexus take the place of the rooms next to the target.
+            adjacent_positions = set(nexus_connections)
+        elif target_index is not None:
+            adjacent_positions = set(ROOM_CONNECTIONS[target_index])
+        else:
+            adjacent_positions = set()
+        groups = [[0] * 4 for _ in range(4)]
+        for room in temple.rooms:
+            if room.index != target_index and room.index != nexus_index:
+                group = ADJACENT_UNPICKED if room.index in adjacent_positions else APART_UNPICKED
+                groups[group + (room.index in picked)][room.tier] += 1
+        return tuple(specials), tuple(map(tuple, groups))
+
+    def choose_room_type(self, temple: Temple, room, picked: set[int], area_left: int, rest: int) -> ValidRoomType:
+        """
+        Draws the picked room's upgrade options and returns the room type the optimal policy upgrades it to.
+        """
+        specials, groups = self.temple_state(temple, picked)
+        options = temple.get_room_upgrade_option(2 if room.tier == 0 else 1)
+        if room.type is not None and self.room_class(room.type) != OTHER:
+            return room.type
+        target_index = temple.room_index(self.target_rooms[0])
+        adjacent = target_index is not None and room.index in ROOM_CONNECTIONS[target_index]
+        pick = (None, ADJACENT_UNPICKED if adjacent else APART_UNPICKED, room.tier)
+        option_classes = tuple(self.room_class(option) for option in options)
+        room_class = EMPTY if room.type is None else OTHER
+        best_result, best_value = None, -1.0
+        for result in sorted(self.candidate_results(room_class, option_classes)):
+            result_value = self.result_value(specials, groups, pick, result, area_left, rest)
+            if result_value > best_value:
+                best_result, best_value = result, result_value
+        if best_result == KEEP:
+            return room.type
+        return options[option_classes.index(best_result)]
+
+    def policy(self):
+        """
+        Returns the optimal policy as a run_t_* function of (temple, **kwargs), solving it first if needed. It plays
+        this solver's target room, aotv and rr, whatever kwargs it is given.
+        """
+        self.solve_policy()
+        target_room = self.target_rooms[0]
+
+        def run_t_optimal_policy(temple: Temple, **kwargs) -> Temple:
+            rest = self.incurs_per_area * self.num_areas
+            while rest > 0 and temple.valid_rooms_remaining:
+                area_left = min(self.incurs_per_area, rest)
+                picked = set()
+                early_stop = None
+                for room in temple.pick_incursion_rooms(min(area_left, len(temple.valid_rooms_remaining))):
+                    specials, groups = self.temple_state(temple, picked)
+                    if self._decisions_fixed(specials):
+                        if early_stop is None:
+                            early_stop = self.fixed_choice(specials, groups, area_left, rest)[1]
+                        options = temple.get_room_upgrade_option(2 if room.tier == 0 else 1)
+                        temple.upgrade_room(room, options[0] if room.type is None else room.type, self.rr)
+                        picked.add(room.index)
+                        area_left, rest = area_left - 1, rest - 1
+                        if early_stop and room.type is target_room:
+                            break
+                        continue
+                    temple.upgrade_room(room, self.choose_room_type(temple, room, picked, area_left, rest), self.rr)
+                    picked.add(room.index)
+                    area_left, rest = area_left - 1, rest - 1
+                    if area_left > 0:
+                        specials, groups = self.temple_state(temple, picked)
+                        if self.value(specials, groups, 0, rest) > self.value(specials, groups, area_left, rest):
+                            break
+            temple.apply_nexus()
+            return temple
+
+        run_t_optimal_policy.solver = self
+        return run_t_optimal_policy
+
+
+def optimal_target_t3_probability(target_room: ValidRoomType,
+                                  initial_room: ValidRoomType | None = None,
+                                  start_with_initial_room: bool = False,
+                                  aotv: bool = False) -> float:
+    """
+    The exact probability of a T3 target room under the optimal policy, the ceiling for
+    exact_solver.exact_ratio_target_t3_rooms of a single target room. rr is assumed active.
+
+    :param target_room: The desired target room.
+    :param initial_room: Which room to start the temple with or not, depending on start_with_initial_room.
+    :param start_with_initial_room: Controls whether the room specified by initial_room starts in the temple.
+    :param aotv: Whether Artefacts of the Vaal is active.
+    :return: float
+    """
+    return OptimalPolicySolver(target_room,
+                               aotv=aotv,
+                               initial_room=initial_room,
+                               start_with_initial_room=start_with_initial_room).solve_policy()
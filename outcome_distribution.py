@@ -0,0 +1,235 @@
+from temple import Temple, ValidRoomType, ROOM_CONNECTIONS
+
+ROOM_TYPES: list[ValidRoomType] = list(ValidRoomType)
+ROOM_TYPE_INDICES: dict[ValidRoomType, int] = {room_type: index for index, room_type in enumerate(ROOM_TYPES)}
+NUM_ROOMS = len(ROOM_CONNECTIONS)
+NUM_TIERS = 4
+
+
+class OutcomeDistribution:
+    def __init__(self):
+        """
+        Accumulates the complete outcome of many finished temples in fixed-size tables, allocated once:
+
+        slot_tiers[room][tier]: how many temples finished with room (its index, see temple.ROOM_CONNECTIONS) at tier.
+        type_tiers[room type][tier]: how many temples finished with the room type (its index in ValidRoomType) at tier.
+        Temples without the room type aren't counted, so tier 0 stays empty (see type_distribution).
+        t3_counts[n]: how many temples finished with n T3 rooms.
+        """
+        self.num_runs = 0
+        self.slot_tiers = [[0] * NUM_TIERS for _ in range(NUM_ROOMS)]
+        self.type_tiers = [[0] * NUM_TIERS for _ in ROOM_TYPES]
+        self.t3_counts = [0] * (NUM_ROOMS + 1)
+
+    def add(self, temple: Temple):
+        """
+        Adds a finished temple to the distribution.
+
+        :param temple: The finished Temple.
+        :return: None
+        """
+        num_t3_rooms = 0
+        for room in temple.rooms:
+            tier = room.tier
+            self.slot_tiers[room.index][tier] += 1
+            if room.type is not None:
+                self.type_tiers[ROOM_TYPE_INDICES[room.type]][tier] += 1
+            if tier == 3:
+                num_t3_rooms += 1
+        self.t3_counts[num_t3_rooms] += 1
+        self.num_runs += 1
+
+    def __iadd__(self, other):
+        for totals, other_totals in zip(self.slot_tiers + self.type_tiers + [self.t3_counts],
+                                        other.slot_tiers + other.type_tiers + [other.t3_counts]):
+            for index, count in enumerate(other_totals):
+                totals[index] += count
+        self.num_runs += other.num_runs
+        return self
+
+    @property
+    def tier_totals(self) -> list[int]:
+        """
+        How many rooms finished at each tier, over every room of every temple.
+        """
+        return [sum(tiers[tier] for tiers in self.slot_tiers) for tier in range(NUM_TIERS)]
+
+    @property
+    def t3_ratio(self) -> float:
+        """
+        The ratio of T3 rooms, as main.calc_ratio_t3_rooms.
+        """
+        return self.tier_totals[3] / (self.num_runs * NUM_ROOMS)
+
+    def slot_distribution(self, room: int) -> list[float]:
+        """
+        Returns the probability of the room finishing at each tier.
+
+        :param room: The index of the room.
+        :return: list[float], indexed by tier.
+        """
+        return [count / self.num_runs for count in self.slot_tiers[room]]
+
+    def type_distribution(self, room_type: ValidRoomType) -> list[float]:
+        """
+        Returns the probability of the room type finishing at each tier, tier 0 meaning it isn't in the temple.
+
+        :param room_type: The room type.
+        :return: list[float], indexed by tier.
+        """
+        tiers = self.type_tiers[ROOM_TYPE_INDICES[room_type]]
+        return [(self.num_runs - sum(tiers[1:])) / self.num_runs] + [count / self.num_runs for count in tiers[1:]]
+
+    def t3_count_distribution(self) -> list[float]:
+        """
+        Returns the probability of a temple finishing with each number of T3 rooms.
+
+        :return: list[float], indexed by the number of T3 rooms.
+        """
+        return [count / self.num_runs for count in self.t3_counts]
+
+    def target_t3_rate(self, room_type: ValidRoomType) -> float:
+        """
+        Returns the ratio of temples finishing with the room type at T3.
+
+        :param room_type: The room type.
+        :return: float
+        """
+        return self.type_tiers[ROOM_TYPE_INDICES[room_type]][3] / self.num_runs
+
+    def target_t3_rates(self, target_rooms: list[ValidRoomType]) -> dict[ValidRoomType, float]:
+        """
+        Returns the ratio of temples finishing with each target room at T3.
+
+        :param target_rooms: The desired target rooms.
+        :return: dict[ValidRoomType, float]
+        """
+        return {room_type: self.target_t3_rate(room_type) for room_type in target_rooms}
+
+    def __repr__(self):
+        return (f"OutcomeDistribution({self.num_runs} runs, T3 ratio {round(self.t3_ratio, 4)}, "
+                f"T3 rooms per temple {[round(p, 4) for p in self.t3_count_distribution()]})")
+
+
+class TargetDistribution:
+    def __init__(self, target_rooms: list[ValidRoomType]):
+        """
+        Accumulates the final tier of each target room, and how many of them finished at T3, over many finished
+        temples.
+
+        tiers[target][tier]: how many temples finished with the target (its index in target_rooms) at tier, tier 0
+        meaning it isn't in the temple.
+        t3_counts[k]: how many temples finished with exactly k target rooms at T3.
+
+        :param target_rooms: The desired target rooms. Duplicates are ignored.
+        """
+        self.target_rooms = list(dict.fromkeys(target_rooms))
+        self.num_runs = 0
+        self.tiers = [[0] * NUM_TIERS for _ in self.target_rooms]
+        self.t3_counts = [0] * (len(self.target_rooms) + 1)
+
+    def add(self, temple: Temple):
+        """
+        Adds a finished temple to the distribution.
+
+        :param temple: The finished Temple.
+        :return: None
+        """
+        num_t3_targets = 0
+        for target, target_room in enumerate(self.target_rooms):
+            index = temple.room_index(target_room)
+            tier = 0 if index is None else temple.rooms[index].tier
+            self.tiers[target][tier] += 1
+            if tier == 3:
+                num_t3_targets += 1
+        self.t3_counts[num_t3_targets] += 1
+        self.num_runs += 1
+
+    def __iadd__(self, other):
+        if other.target_rooms != self.target_rooms:
+            raise ValueError("can only add TargetDistributions of the same target rooms.")
+        for totals, other_totals in zip(self.tiers + [self.t3_counts], other.tiers + [other.t3_counts]):
+            for index, count in enumerate(other_totals):
+                totals[index] += count
+        self.num_runs += other.num_runs
+        return self
+
+    def tier_distribution(self, target_room: ValidRoomType) -> list[float]:
+        """
+        Returns the probability of the target room finishing at each tier, tier 0 meaning it isn't in the temple.
+
+        :param target_room: One of the target rooms.
+        :return: list[float], indexed by tier.
+        """
+        return [count / self.num_runs for count in self.tiers[self.target_rooms.index(target_room)]]
+
+    def t3_rate(self, target_room: ValidRoomType) -> float:
+        """
+        Returns the ratio of temples finishing with the target room at T3.
+
+        :param target_room: One of the target rooms.
+        :return: float
+        """
+        return self.tiers[self.target_rooms.index(target_room)][3] / self.num_runs
+
+    def exactly_t3(self, k: int) -> float:
+        """
+        Returns the ratio of temples finishing with exactly k target rooms at T3.
+
+        :param k: The number of T3 target rooms.
+        :return: float
+        """
+        return self.t3_counts[k] / self.num_runs
+
+    @property
+    def any_t3(self) -> float:
+        """
+        The ratio of temples finishing with at least one target room at T3, as main.calc_ratio_target_t3_rooms.
+        """
+        return 1 - self.exactly_t3(0)
+
+    @property
+    def all_t3(self) -> float:
+        """
+        The ratio of temples finishing with every target room at T3.
+        """
+        return self.exactly_t3(len(self.target_rooms))
+
+    def __repr__(self):
+        rates = ', '.join(f"{target_room.value} {round(self.t3_rate(target_room), 4)}"
+                          for target_room in self.target_rooms)
+        return (f"TargetDistribution({self.num_runs} runs, T3 rates: {rates}, any {round(self.any_t3, 4)}, "
+                f"all {round(self.all_t3, 4)})")
+
+
+def collect_outcome_distribution(run_method_func,
+                                 num_runs: int = 100000,
+                                 target_rooms: None | list[ValidRoomType] = None,
+                                 initial_room: ValidRoomType | None = None,
+                                 start_with_initial_room: bool = False,
+                                 aotv: bool = False,
+                                 rr: bool = False) -> OutcomeDistribution:
+    """
+    Run temples using the supplied function and collect their full OutcomeDistribution in one pass.
+
+    :param run_method_func: The function to use for running the temples.
+    :param num_runs: How many temple runs to do.
+    :param target_rooms: The desired target rooms passed on to run_method_func. If None, its default is used.
+    :param initial_room: Which room to start the temple with or not, depending on start_with_initial_room.
+    :param start_with_initial_room: Controls whether the room specified by initial_room starts in the temple.
+    :param aotv: Whether Artefacts of the Vaal is active.
+    :param rr: Whether Resource Reallocation is active.
+    :return: OutcomeDistribution
+    """
+    kwargs = {'aotv': aotv, 'rr': rr}
+    if target_rooms is not None:
+        kwargs['target_rooms'] = target_rooms
+    if not initial_room:
+        initial_room, start_with_initial_room = None, False
+    distribution = OutcomeDistribution()
+    temple = Temple(desired_room=initial_room, start_with_desired_room=start_with_initial_room)
+    for run in range(num_runs):
+        if run:
+            temple.reset(desired_room=initial_room, start_with_desired_room=start_with_initial_room)
+        distribution.add(run_method_func(temple, **kwargs))
+    return distribution
@@ -0,0 +1,179 @@
+import json
+import os
+import struct
+import numpy as np
+from temple import Temple, ValidRoomType, ROOM_CONNECTIONS
+
+ROOM_TYPES: list[ValidRoomType] = list(ValidRoomType)
+ROOM_TYPE_IDS: dict[ValidRoomType | None, int] = {room_type: index for index, room_type in enumerate(ROOM_TYPES)}
+# The type id of un-tiered rooms.
+EMPTY = -1
+ROOM_TYPE_IDS[None] = EMPTY
+NUM_ROOMS = len(ROOM_CONNECTIONS)
+MAGIC = b'AOTVLOG1'
+# A record: the run number, then the tier and type id of each room, in room index order. Little-endian, no padding.
+RECORD = struct.Struct(f'<I{NUM_ROOMS}B{NUM_ROOMS}b')
+RECORD_DTYPE = np.dtype([('run', '<u4'), ('tiers', 'u1', (NUM_ROOMS,)), ('types', 'i1', (NUM_ROOMS,))])
+ADJACENCY = np.zeros((NUM_ROOMS, NUM_ROOMS), dtype=bool)
+for _room, _connections in enumerate(ROOM_CONNECTIONS):
+    ADJACENCY[_room, list(_connections)] = True
+
+
+class OutcomeLogWriter:
+    def __init__(self, path: str, metadata: dict | None = None, chunk_size: int = 4096):
+        """
+        A sink for the count_* and calc_ratio_* drivers of main, streaming every finished temple to an append-only
+        binary file as one fixed-width RECORD. Records are packed into a buffer of chunk_size records, allocated once,
+        which is written out whenever it fills up, so memory use doesn't grow with the number of runs.
+
+        The file starts with MAGIC, the length of a JSON header and the header itself: the metadata, the record layout
+        and the room type names the type ids refer to.
+
+        :param path: The file to create. An existing file is overwritten.
+        :param metadata: Anything worth keeping about the runs, e.g. the strategy, aotv and rr. Must be JSON-able.
+        :param chunk_size: How many records to buffer between writes.
+        """
+        self.path = path
+        self.num_records = 0
+        self._buffer = bytearray(RECORD.size * chunk_size)
+        self._buffered = 0
+        self._chunk_size = chunk_size
+        header = json.dumps({'metadata': metadata or {},
+                             'record_format': RECORD.format,
+                             'room_types': [room_type.name for room_type in ROOM_TYPES]}).encode()
+        self._file = open(path, 'wb')
+        self._file.write(MAGIC + struct.pack('<I', len(header)) + header)
+
+    def write(self, temple: Temple):
+        """
+        Appends a finished temple to the log.
+
+        :param temple: The finished Temple.
+        :return: None
+        """
+        rooms = temple.rooms
+        RECORD.pack_into(self._buffer, self._buffered * RECORD.size,
+                         self.num_records,
+                         *[room.tier for room in rooms],
+                         *[ROOM_TYPE_IDS[room.type] for room in rooms])
+        self.num_records += 1
+        self._buffered += 1
+        if self._buffered == self._chunk_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes out the buffered records.
+
+        :return: None
+        """
+        self._file.write(memoryview(self._buffer)[:self._buffered * RECORD.size])
+        self._file.flush()
+        self._buffered = 0
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class OutcomeLog:
+    def __init__(self, path: str):
+        """
+        Reads a log written by OutcomeLogWriter. The records are memory-mapped, not loaded: records, and the run,
+        tiers and types arrays, are views of the file. A partially written last record is ignored.
+
+        Raises ValueError if path isn't an outcome log.
+
+        :param path: The log file.
+        """
+        with open(path, 'rb') as file:
+            if file.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not an outcome log.")
+            header_length, = struct.unpack('<I', file.read(4))
+            header = json.loads(file.read(header_length))
+        if header['record_format'] != RECORD.format:
+            raise ValueError(f"unsupported record format {header['record_format']}.")
+        self.path = path
+        self.metadata: dict = header['metadata']
+        self.room_types: list[ValidRoomType] = [ValidRoomType[name] for name in header['room_types']]
+        offset = len(MAGIC) + 4 + header_length
+        num_records = (os.path.getsize(path) - offset) // RECORD_DTYPE.itemsize
+        self.records = (np.memmap(path, dtype=RECORD_DTYPE, mode='r', offset=offset, shape=(num_records,))
+                        if num_records else np.empty(0, dtype=RECORD_DTYPE))
+
+    @property
+    def run(self) -> np.ndarray:
+        """
+        The run number of each record, shape (records,).
+        """
+        return self.records['run']
+
+    @property
+    def tiers(self) -> np.ndarray:
+        """
+        The tier of each room of each record, shape (records, 11).
+        """
+        return self.records['tiers']
+
+    @property
+    def types(self) -> np.ndarray:
+        """
+        The type id of each room of each record, shape (records, 11). See type_id.
+        """
+        return self.records['types']
+
+    def type_id(self, room_type: ValidRoomType) -> int:
+        """
+        Returns the id room_type is stored as in this log.
+
+        :param room_type: The room type.
+        :return: int
+        """
+        return self.room_types.index(room_type)
+
+    def type_rooms(self, room_type: ValidRoomType) -> np.ndarray:
+        """
+        Returns the index of the room of room_type in each record, or EMPTY if the record has no such room.
+
+        :param room_type: The room type.
+        :return: np.ndarray of shape (records,)
+        """
+        is_type = self.types == self.type_id(room_type)
+        return np.where(is_type.any(axis=1), is_type.argmax(axis=1), EMPTY)
+
+    def type_tiers(self, room_type: ValidRoomType) -> np.ndarray:
+        """
+        Returns the tier of the room of room_type in each record, or 0 if the record has no such room.
+
+        :param room_type: The room type.
+        :return: np.ndarray of shape (records,)
+        """
+        rooms = self.type_rooms(room_type)
+        tiers = np.take_along_axis(self.tiers, np.maximum(rooms, 0)[:, None], axis=1)[:, 0]
+        return np.where(rooms == EMPTY, 0, tiers)
+
+    def adjacent(self, room_type: ValidRoomType, other_room_type: ValidRoomType) -> np.ndarray:
+        """
+        Returns whether the rooms of the two room types are connected in each record, e.g. for conditioning on the
+        nexus ending up next to a target room.
+
+        :param room_type: The room type.
+        :param other_room_type: The other room type.
+        :return: np.ndarray of bool, shape (records,)
+        """
+        rooms, other_rooms = self.type_rooms(room_type), self.type_rooms(other_room_type)
+        both = (rooms != EMPTY) & (other_rooms != EMPTY)
+        return both & ADJACENCY[np.maximum(rooms, 0), np.maximum(other_rooms, 0)]
+
+    def __len__(self):
+        return len(self.records)
+
+    def __repr__(self):
+        return f"OutcomeLog({self.path}, {len(self)} records, {self.metadata})"
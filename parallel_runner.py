@@ -0,0 +1,134 @@
+import os
+import random
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from temple import ValidRoomType
+from main import count_t3_room_levels, count_target_t3_results
+from block_rng import BlockRNG
+
+
+def shard_sizes(num_runs: int, num_shards: int) -> list[int]:
+    """
+    Splits num_runs into num_shards near-equal parts. The first num_runs % num_shards shards get one extra run.
+
+    :param num_runs: The total number of temple runs.
+    :param num_shards: How many parts to split the runs into.
+    :return: list[int]
+    """
+    base, extra = divmod(num_runs, num_shards)
+    return [base + 1 if shard < extra else base for shard in range(num_shards)]
+
+
+def shard_seed(seed: int, shard: int) -> str:
+    """
+    Derives the seed of one shard's RNG stream. String seeds are hashed with SHA-512 by random.seed, so every shard
+    gets an independent stream that doesn't depend on PYTHONHASHSEED or the process it runs in.
+
+    :param seed: The seed of the whole run.
+    :param shard: The index of the shard.
+    :return: str
+    """
+    return f"{seed}/{shard}"
+
+
+def _run_shard(count_func, seed: str, num_runs: int, kwargs: dict) -> Counter:
+    random.seed(seed)
+    return count_func(num_runs=num_runs, **kwargs)
+
+
+def _run_block_shard(count_func, rng: BlockRNG, num_runs: int, kwargs: dict) -> Counter:
+    return count_func(num_runs=num_runs, rng=rng, **kwargs)
+
+
+def run_sharded(count_func, num_runs: int, seed: int = 0, num_workers: int | None = None, block_rng: bool = False,
+                **kwargs) -> Counter:
+    """
+    Shards num_runs across a process pool, seeds each shard independently and merges the partial Counters. Merging
+    happens in shard order, so the same seed and num_workers always give the same result.
+
+    With block_rng, each shard draws from its own BlockRNG, spawned from BlockRNG(seed), instead of the reseeded
+    random module. The results are then a different (but as reproducible) sample than without it.
+
+    :param count_func: The counting function to run in each worker, e.g. main.count_t3_room_levels.
+    :param num_runs: The total number of temple runs.
+    :param seed: The seed of the whole run.
+    :param num_workers: How many worker processes (and shards) to use. Defaults to os.cpu_count().
+    :param block_rng: Whether the shards draw from spawned block_rng.BlockRNG streams.
+    :param kwargs: Passed on to count_func.
+    :return: The merged Counter.
+    """
+    num_workers = num_workers or os.cpu_count() or 1
+    sizes = shard_sizes(num_runs, num_workers)
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        if block_rng:
+            partials = executor.map(_run_block_shard,
+                                    [count_func] * num_workers,
+                                    BlockRNG(seed).spawn(num_workers),
+                                    sizes,
+                                    [kwargs] * num_workers)
+        else:
+            partials = executor.map(_run_shard,
+                                    [count_func] * num_workers,
+                                    [shard_seed(seed, shard) for shard in range(num_workers)],
+                                    sizes,
+                                    [kwargs] * num_workers)
+        totals = Counter()
+        for partial in partials:
+            totals.update(partial)
+    return totals
+
+
+def parallel_calc_ratio_t3_rooms(run_method_func,
+                                 num_runs: int = 100000,
+                                 aotv: bool = False,
+                                 rr: bool = False,
+                                 seed: int = 0,
+                                 num_workers: int | None = None,
+                                 block_rng: bool = False) -> float:
+    """
+    Multi-core equivalent of main.calc_ratio_t3_rooms.
+
+    :param run_method_func: The function to use for running the temples. Must be picklable (module level).
+    :param num_runs: How many temple runs to do.
+    :param aotv: Whether Artefacts of the Vaal is active.
+    :param rr: Whether Resource Reallocation is active.
+    :param seed: The seed of the whole run.
+    :param num_workers: How many worker processes to use. Defaults to os.cpu_count().
+    :param block_rng: Whether the shards draw from spawned block_rng.BlockRNG streams.
+    :return: The ratio of T3 rooms.
+    """
+    temple_room_level_totals = run_sharded(count_t3_room_levels, num_runs, seed=seed, num_workers=num_workers,
+                                           block_rng=block_rng, run_method_func=run_method_func, aotv=aotv, rr=rr)
+    return round(temple_room_level_totals[3] / temple_room_level_totals.total(), 4)
+
+
+def parallel_calc_ratio_target_t3_rooms(run_method_func,
+                                        target_rooms: list[ValidRoomType],
+                                        initial_room: ValidRoomType | None = None,
+                                        start_with_initial_room: bool = False,
+                                        num_runs: int = 100000,
+                                        aotv: bool = False,
+                                        seed: int = 0,
+                                        num_workers: int | None = None,
+                                        block_rng: bool = False) -> float:
+    """
+    Multi-core equivalent of main.calc_ratio_target_t3_rooms. rr is assumed active.
+
+    :param run_method_func: The function to use for running the temples. Must be picklable (module level).
+    :param target_rooms: The desired target rooms.
+    :param initial_room: Which room to start the temple with or not, depending on start_with_initial_room.
+    :param start_with_initial_room: Controls whether the room specified by initial_room starts in the temple.
+    :param num_runs: How many temple runs to do.
+    :param aotv: Whether Artefacts of the Vaal is active.
+    :param seed: The seed of the whole run.
+    :param num_workers: How many worker processes to use. Defaults to os.cpu_count().
+    :param block_rng: Whether the shards draw from spawned block_rng.BlockRNG streams.
+    :return: The ratio of T3 desired target rooms.
+    """
+    results = run_sharded(count_target_t3_results, num_runs, seed=seed, num_workers=num_workers, block_rng=block_rng,
+                          run_method_func=run_method_func,
+                          target_rooms=target_rooms,
+                          initial_room=initial_room,
+                          start_with_initial_room=start_with_initial_room,
+                          aotv=aotv)
+    return round(results[True] / results.total(), 4)
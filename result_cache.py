@@ -0,0 +1,196 @@
+import hashlib
+import inspect
+import json
+import os
+import random
+from collections import Counter
+from temple import ValidRoomType
+from main import count_t3_room_levels, count_target_t3_results
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.result_cache')
+# Changes to any of these files invalidate every cached result.
+MODEL_FILES = ('temple.py', 'temple_room.py', 'room_type_pool.py', 'up_room_logic.py', 'strategy_spec.py',
+               'strategy_engine.py')
+
+
+def model_hash() -> str:
+    """
+    Returns a hash of the temple model source files in MODEL_FILES.
+
+    :return: str
+    """
+    model = hashlib.sha256()
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for file_name in MODEL_FILES:
+        with open(os.path.join(directory, file_name), 'rb') as file:
+            model.update(file.read())
+    return model.hexdigest()
+
+
+def _encode(value):
+    if isinstance(value, ValidRoomType):
+        return value.name
+    if isinstance(value, (list, tuple)):
+        return [_encode(item) for item in value]
+    return value
+
+
+def cache_key(count_func, run_method_func, seed, **kwargs) -> str:
+    """
+    Returns the content address of an evaluation: a hash of the counting function, the strategy function and its
+    source, the temple model sources, the seed and every other parameter except num_runs.
+
+    :param count_func: The counting function, e.g. main.count_target_t3_results.
+    :param run_method_func: The function to use for running the temples.
+    :param seed: The seed of the evaluation.
+    :param kwargs: The other parameters passed on to count_func.
+    :return: str
+    """
+    description = {'count_func': count_func.__name__,
+                   'strategy': f"{run_method_func.__module__}.{run_method_func.__qualname__}",
+                   'strategy_source': hashlib.sha256(inspect.getsource(run_method_func).encode()).hexdigest(),
+                   'model': model_hash(),
+                   'seed': seed,
+                   'kwargs': {key: _encode(value) for key, value in kwargs.items()}}
+    return hashlib.sha256(json.dumps(description, sort_keys=True).encode()).hexdigest()
+
+
+class ResultCache:
+    def __init__(self, cache_dir: str = CACHE_DIR):
+        """
+        An on-disk store of aggregated result Counters. Each evaluation is one JSON file named after its cache_key,
+        holding the Counter of every sample size computed so far.
+
+        :param cache_dir: The directory to store the results in. Created on the first write.
+        """
+        self.cache_dir = cache_dir
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _load(self, key: str) -> dict:
+        try:
+            with open(self._path(key)) as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def get(self, key: str, num_runs: int) -> tuple[int, Counter] | None:
+        """
+        Returns the largest cached sample of at least num_runs runs, as (number of runs, Counter). A larger sample
+        answers a smaller request, with a more precise result.
+
+        :param key: The cache_key of the evaluation.
+        :param num_runs: The number of runs requested.
+        :return: (number of runs, Counter), or None if no sample is large enough.
+        """
+        samples = self._load(key)
+        sizes = [int(size) for size in samples if int(size) >= num_runs]
+        if not sizes:
+            return None
+        largest = max(sizes)
+        return largest, Counter({result: count for result, count in samples[str(largest)]})
+
+    def put(self, key: str, num_runs: int, results: Counter):
+        """
+        Stores the Counter of a sample of num_runs runs.
+
+        :param key: The cache_key of the evaluation.
+        :param num_runs: The number of runs of the sample.
+        :param results: The aggregated Counter of the sample.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        samples = self._load(key)
+        # Counter keys are tiers (int) or results (bool), a list of pairs keeps their type through JSON.
+        samples[str(num_runs)] = sorted(results.items())
+        temp_path = f"{self._path(key)}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as file:
+            json.dump(samples, file)
+        os.replace(temp_path, self._path(key))
+
+    def clear(self):
+        """
+        Deletes every cached result.
+        """
+        if not os.path.isdir(self.cache_dir):
+            return
+        for file_name in os.listdir(self.cache_dir):
+            if file_name.endswith('.json'):
+                os.remove(os.path.join(self.cache_dir, file_name))
+
+
+def cached_count(count_func, run_method_func, num_runs: int = 100000, seed: int | None = 0,
+                 cache: ResultCache | None = None, **kwargs) -> Counter:
+    """
+    Returns count_func's Counter for the evaluation, from the cache if a large enough sample exists. Otherwise the
+    global RNG is seeded with seed (unless None), the temples are run and the result is stored.
+
+    :param count_func: The counting function, e.g. main.count_t3_room_levels.
+    :param run_method_func: The function to use for running the temples.
+    :param num_runs: How many temple runs to do.
+    :param seed: The seed of the evaluation.
+    :param cache: The ResultCache to use. Defaults to one in CACHE_DIR.
+    :param kwargs: Passed on to count_func.
+    :return: The aggregated Counter.
+    """
+    cache = cache or ResultCache()
+    key = cache_key(count_func, run_method_func, seed, **kwargs)
+    cached = cache.get(key, num_runs)
+    if cached is not None:
+        return cached[1]
+    if seed is not None:
+        random.seed(seed)
+    results = count_func(run_method_func, num_runs=num_runs, **kwargs)
+    cache.put(key, num_runs, results)
+    return results
+
+
+def cached_calc_ratio_t3_rooms(run_method_func,
+                               num_runs: int = 100000,
+                               aotv: bool = False,
+                               rr: bool = False,
+                               seed: int | None = 0,
+                               cache: ResultCache | None = None) -> float:
+    """
+    Cached equivalent of main.calc_ratio_t3_rooms.
+
+    :param run_method_func: The function to use for running the temples.
+    :param num_runs: How many temple runs to do.
+    :param aotv: Whether Artefacts of the Vaal is active.
+    :param rr: Whether Resource Reallocation is active.
+    :param seed: The seed of the evaluation.
+    :param cache: The ResultCache to use. Defaults to one in CACHE_DIR.
+    :return: The ratio of T3 rooms.
+    """
+    temple_room_level_totals = cached_count(count_t3_room_levels, run_method_func, num_runs=num_runs, seed=seed,
+                                            cache=cache, aotv=aotv, rr=rr)
+    return round(temple_room_level_totals[3] / temple_room_level_totals.total(), 4)
+
+
+def cached_calc_ratio_target_t3_rooms(run_method_func,
+                                      target_rooms: list[ValidRoomType],
+                                      initial_room: ValidRoomType | None = None,
+                                      start_with_initial_room: bool = False,
+                                      num_runs: int = 100000,
+                                      aotv: bool = False,
+                                      seed: int | None = 0,
+                                      cache: ResultCache | None = None) -> float:
+    """
+    Cached equivalent of main.calc_ratio_target_t3_rooms. rr is assumed active.
+
+    :param run_method_func: The function to use for running the temples.
+    :param target_rooms: The desired target rooms.
+    :param initial_room: Which room to start the temple with or not, depending on start_with_initial_room.
+    :param start_with_initial_room: Controls whether the room specified by initial_room starts in the temple.
+    :param num_runs: How many temple runs to do.
+    :param aotv: Whether Artefacts of the Vaal is active.
+    :param seed: The seed of the evaluation.
+    :param cache: The ResultCache to use. Defaults to one in CACHE_DIR.
+    :return: The ratio of T3 desired target rooms.
+    """
+    results = cached_count(count_target_t3_results, run_method_func, num_runs=num_runs, seed=seed, cache=cache,
+                           target_rooms=target_rooms,
+                           initial_room=initial_room,
+                           start_with_initial_room=start_with_initial_room,
+                           aotv=aotv)
+    return round(results[True] / results.total(), 4)
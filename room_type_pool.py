@@ -0,0 +1,99 @@
+class RoomTypePool:
+    def __init__(self, room_types=()):
+        """
+        An unordered pool of distinct room types with O(1) membership, add, remove, replace and sampling. The types
+        are kept in an array, with a map of each type to its position in it. Removing a type moves the last one into
+        its place.
+
+        :param room_types: The room types to start the pool with.
+        """
+        self._room_types = list(room_types)
+        self._positions = {room_type: position for position, room_type in enumerate(self._room_types)}
+
+    def reset(self, room_types):
+        """
+        Refills the pool in place with room_types, in their order, as if it had just been created with them.
+
+        :param room_types: The room types to refill the pool with.
+        :return: None
+        """
+        self._room_types[:] = room_types
+        self._positions.clear()
+        for position, room_type in enumerate(self._room_types):
+            self._positions[room_type] = position
+
+    def add(self, room_type):
+        """
+        Adds a room type to the pool.
+
+        Raises ValueError if room_type is already in the pool.
+
+        :param room_type: The room type to add.
+        :return: None
+        """
+        if room_type in self._positions:
+            raise ValueError(f"{room_type} is already in the pool.")
+        self._positions[room_type] = len(self._room_types)
+        self._room_types.append(room_type)
+
+    def remove(self, room_type):
+        """
+        Removes a room type from the pool.
+
+        Raises ValueError if room_type isn't in the pool.
+
+        :param room_type: The room type to remove.
+        :return: None
+        """
+        position = self._positions.pop(room_type, None)
+        if position is None:
+            raise ValueError(f"{room_type} is not in the pool.")
+        last = self._room_types.pop()
+        if position < len(self._room_types):
+            self._room_types[position] = last
+            self._positions[last] = position
+
+    def replace(self, room_type, new_room_type):
+        """
+        Replaces a room type of the pool with one that isn't in it, like a sidegrade does.
+
+        Raises ValueError if room_type isn't in the pool.
+
+        :param room_type: The room type to take out of the pool.
+        :param new_room_type: The room type to put in its place.
+        :return: None
+        """
+        position = self._positions.pop(room_type, None)
+        if position is None:
+            raise ValueError(f"{room_type} is not in the pool.")
+        self._room_types[position] = new_room_type
+        self._positions[new_room_type] = position
+
+    def sample(self, rng, count: int = 1) -> list:
+        """
+        Returns count distinct random room types of the pool, in random order.
+
+        :param rng: The source of randomness, anything with randrange like random.Random.
+        :param count: How many room types to sample. Can only be 1 or 2.
+        :return: list
+        """
+        size = len(self._room_types)
+        first = rng.randrange(size)
+        if count == 1:
+            return [self._room_types[first]]
+        second = rng.randrange(size - 1)
+        if second >= first:
+            second += 1
+        return [self._room_types[first], self._room_types[second]]
+
+    def __len__(self):
+        return len(self._room_types)
+
+    def __iter__(self):
+        yield from self._room_types
+
+    def __contains__(self, item):
+        return item in self._positions
+
+    def __repr__(self):
+        return f"RoomTypePool({self._room_types})"
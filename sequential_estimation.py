@@ -0,0 +1,231 @@
+from collections import Counter
+from math import exp, lgamma, log, sqrt
+from statistics import NormalDist
+from temple import ValidRoomType
+from main import count_t3_room_levels, count_target_t3_results
+
+WILSON = "wilson"
+CLOPPER_PEARSON = "clopper_pearson"
+
+
+class RatioEstimate:
+    def __init__(self, ratio: float, low: float, high: float, num_runs: int, successes: int, trials: int):
+        """
+        The result of a sequential estimation: the estimated ratio, its confidence interval and the budget spent.
+
+        :param ratio: The estimated ratio.
+        :param low: The lower bound of the confidence interval.
+        :param high: The upper bound of the confidence interval.
+        :param num_runs: How many temple runs were used.
+        :param successes: The number of successes counted.
+        :param trials: The number of trials counted (temples, or rooms for T3 room ratios).
+        """
+        self.ratio = ratio
+        self.low = low
+        self.high = high
+        self.num_runs = num_runs
+        self.successes = successes
+        self.trials = trials
+
+    @property
+    def half_width(self) -> float:
+        return (self.high - self.low) / 2
+
+    def __repr__(self):
+        return f"{round(self.ratio, 4)} [{round(self.low, 4)}, {round(self.high, 4)}] ({self.num_runs} runs)"
+
+
+def wilson_interval(successes: int, trials: int, confidence: float = 0.95) -> tuple[float, float]:
+    """
+    Returns the Wilson score interval of a binomial proportion.
+
+    :param successes: The number of successes.
+    :param trials: The number of trials.
+    :param confidence: The confidence level of the interval.
+    :return: (low, high)
+    """
+    if trials == 0:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    ratio = successes / trials
+    denominator = 1 + z * z / trials
+    centre = (ratio + z * z / (2 * trials)) / denominator
+    spread = z * sqrt(ratio * (1 - ratio) / trials + z * z / (4 * trials * trials)) / denominator
+    return max(0.0, centre - spread), min(1.0, centre + spread)
+
+
+def _beta_continued_fraction(a: float, b: float, x: float) -> float:
+    # Lentz's method for the continued fraction of the regularised incomplete beta function.
+    tiny = 1e-300
+    c = 1.0
+    d = 1 - (a + b) * x / (a + 1)
+    d = 1 / (d if abs(d) > tiny else tiny)
+    result = d
+    for m in range(1, 10000):
+        for numerator in (m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+                          -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1))):
+            d = 1 + numerator * d
+            d = 1 / (d if abs(d) > tiny else tiny)
+            c = 1 + numerator / c
+            c = c if abs(c) > tiny else tiny
+            result *= c * d
+        if abs(c * d - 1) < 1e-15:
+            break
+    return result
+
+
+def regularized_incomplete_beta(a: float, b: float, x: float) -> float:
+    """
+    Returns I_x(a, b), the CDF of the Beta(a, b) distribution at x.
+    """
+    if x <= 0:
+        return 0.0
+    if x >= 1:
+        return 1.0
+    front = exp(lgamma(a + b) - lgamma(a) - lgamma(b) + a * log(x) + b * log(1 - x))
+    if x < (a + 1) / (a + b + 2):
+        return front * _beta_continued_fraction(a, b, x) / a
+    return 1 - front * _beta_continued_fraction(b, a, 1 - x) / b
+
+
+def _beta_quantile(probability: float, a: float, b: float) -> float:
+    low, high = 0.0, 1.0
+    for _ in range(100):
+        middle = (low + high) / 2
+        if regularized_incomplete_beta(a, b, middle) < probability:
+            low = middle
+        else:
+            high = middle
+    return (low + high) / 2
+
+
+def clopper_pearson_interval(successes: int, trials: int, confidence: float = 0.95) -> tuple[float, float]:
+    """
+    Returns the exact (Clopper-Pearson) interval of a binomial proportion, from quantiles of the Beta distribution.
+
+    :param successes: The number of successes.
+    :param trials: The number of trials.
+    :param confidence: The confidence level of the interval.
+    :return: (low, high)
+    """
+    if trials == 0:
+        return 0.0, 1.0
+    alpha = 1 - confidence
+    low = 0.0 if successes == 0 else _beta_quantile(alpha / 2, successes, trials - successes + 1)
+    high = 1.0 if successes == trials else _beta_quantile(1 - alpha / 2, successes + 1, trials - successes)
+    return low, high
+
+
+INTERVALS = {WILSON: wilson_interval, CLOPPER_PEARSON: clopper_pearson_interval}
+
+
+def sequential_estimate(count_batch,
+                        success_key,
+                        epsilon: float = 0.005,
+                        max_runs: int = 1000000,
+                        batch_size: int = 10000,
+                        confidence: float = 0.95,
+                        method: str = WILSON) -> RatioEstimate:
+    """
+    Runs temples in batches, keeping a running confidence interval of the ratio, until the interval's half-width falls
+    below epsilon or max_runs temples have been run.
+
+    Raises ValueError if method is not WILSON or CLOPPER_PEARSON.
+
+    :param count_batch: Function of num_runs returning a Counter of outcomes, e.g. main.count_target_t3_results.
+    :param success_key: The Counter key counted as a success. Every other key counts as a failure.
+    :param epsilon: The target half-width of the confidence interval.
+    :param max_runs: The maximum number of temple runs.
+    :param batch_size: How many temple runs to do between checks of the interval.
+    :param confidence: The confidence level of the interval.
+    :param method: WILSON or CLOPPER_PEARSON.
+    :return: RatioEstimate
+    """
+    if method not in INTERVALS:
+        raise ValueError(f"invalid method {method}. Should be one of {list(INTERVALS)}.")
+    interval = INTERVALS[method]
+    totals = Counter()
+    num_runs = 0
+    while True:
+        current_batch = min(batch_size, max_runs - num_runs)
+        totals += count_batch(current_batch)
+        num_runs += current_batch
+        successes, trials = totals[success_key], totals.total()
+        low, high = interval(successes, trials, confidence)
+        if (high - low) / 2 < epsilon or num_runs >= max_runs:
+            return RatioEstimate(successes / trials, low, high, num_runs, successes, trials)
+
+
+def sequential_calc_ratio_t3_rooms(run_method_func,
+                                   aotv: bool = False,
+                                   rr: bool = False,
+                                   epsilon: float = 0.005,
+                                   max_runs: int = 1000000,
+                                   batch_size: int = 10000,
+                                   confidence: float = 0.95,
+                                   method: str = WILSON) -> RatioEstimate:
+    """
+    Sequential equivalent of main.calc_ratio_t3_rooms: stops as soon as the ratio is known to within epsilon.
+
+    Rooms of the same temple are counted as separate trials, so the interval is somewhat narrower than the true one.
+
+    :param run_method_func: The function to use for running the temples.
+    :param aotv: Whether Artefacts of the Vaal is active.
+    :param rr: Whether Resource Reallocation is active.
+    :param epsilon: The target half-width of the confidence interval.
+    :param max_runs: The maximum number of temple runs.
+    :param batch_size: How many temple runs to do between checks of the interval.
+    :param confidence: The confidence level of the interval.
+    :param method: WILSON or CLOPPER_PEARSON.
+    :return: RatioEstimate
+    """
+    return sequential_estimate(lambda num_runs: count_t3_room_levels(run_method_func,
+                                                                     num_runs=num_runs,
+                                                                     aotv=aotv,
+                                                                     rr=rr),
+                               3,
+                               epsilon=epsilon,
+                               max_runs=max_runs,
+                               batch_size=batch_size,
+                               confidence=confidence,
+                               method=method)
+
+
+def sequential_calc_ratio_target_t3_rooms(run_method_func,
+                                          target_rooms: list[ValidRoomType],
+                                          initial_room: ValidRoomType | None = None,
+                                          start_with_initial_room: bool = False,
+                                          aotv: bool = False,
+                                          epsilon: float = 0.005,
+                                          max_runs: int = 1000000,
+                                          batch_size: int = 10000,
+                                          confidence: float = 0.95,
+                                          method: str = WILSON) -> RatioEstimate:
+    """
+    Sequential equivalent of main.calc_ratio_target_t3_rooms: stops as soon as the ratio is known to within epsilon.
+    rr is assumed active.
+
+    :param run_method_func: The function to use for running the temples.
+    :param target_rooms: The desired target rooms.
+    :param initial_room: Which room to start the temple with or not, depending on start_with_initial_room.
+    :param start_with_initial_room: Controls whether the room specified by initial_room starts in the temple.
+    :param aotv: Whether Artefacts of the Vaal is active.
+    :param epsilon: The target half-width of the confidence interval.
+    :param max_runs: The maximum number of temple runs.
+    :param batch_size: How many temple runs to do between checks of the interval.
+    :param confidence: The confidence level of the interval.
+    :param method: WILSON or CLOPPER_PEARSON.
+    :return: RatioEstimate
+    """
+    return sequential_estimate(lambda num_runs: count_target_t3_results(run_method_func,
+                                                                        target_rooms=target_rooms,
+                                                                        initial_room=initial_room,
+                                                                        start_with_initial_room=start_with_initial_room,
+                                                                        num_runs=num_runs,
+                                                                        aotv=aotv),
+                               True,
+                               epsilon=epsilon,
+                               max_runs=max_runs,
+                               batch_size=batch_size,
+                               confidence=confidence,
+                               method=method)
@@ -0,0 +1,166 @@
+import random
+from math import sqrt
+from temple import Temple, ValidRoomType
+
+
+def crn_temple(seed, run: int,
+               initial_room: ValidRoomType | None = None,
+               start_with_initial_room: bool = False) -> Temple:
+    """
+    Builds the temple of one common-random-numbers run. The starting rooms, the incursion room picks and the upgrade
+    option draws each get their own stream seeded from (seed, run), so every strategy run on this temple starts from
+    the same rooms, and its n-th room pick and n-th option draw use the same random numbers as any other strategy's.
+
+    :param seed: The seed of the whole comparison.
+    :param run: The index of the run.
+    :param initial_room: Which room to start the temple with or not, depending on start_with_initial_room.
+    :param start_with_initial_room: Controls whether the room specified by initial_room starts in the temple.
+    :return: Temple
+    """
+    rng, pick_rng, option_rng = (random.Random(f"{seed}/{run}/{purpose}") for purpose in ('temple', 'pick', 'option'))
+    return Temple(desired_room=initial_room,
+                  start_with_desired_room=start_with_initial_room,
+                  rng=rng,
+                  pick_rng=pick_rng,
+                  option_rng=option_rng)
+
+
+def temple_result(temple: Temple, target_rooms: None | list[ValidRoomType] = None) -> float:
+    """
+    Scores a finished temple: 1.0 if a target room is T3 and 0.0 otherwise, or the ratio of T3 rooms if target_rooms
+    is None.
+
+    :param temple: The finished Temple.
+    :param target_rooms: The desired target rooms.
+    :return: float
+    """
+    if target_rooms is None:
+        return [int(room) for room in temple].count(3) / len(temple)
+    return float(any(room.tier == 3 and room.type in target_rooms for room in temple))
+
+
+class PairedDifference:
+    def __init__(self, num_runs: int, total: float, total_squares: float, independent_variance: float):
+        """
+        The difference between a strategy and the baseline strategy, measured on the same temples.
+
+        :param num_runs: The number of paired runs.
+        :param total: The sum of the per-run differences.
+        :param total_squares: The sum of the squared per-run differences.
+        :param independent_variance: The variance of the mean difference had both strategies used independent runs.
+        """
+        self.num_runs = num_runs
+        self.mean = total / num_runs
+        self.variance = (total_squares - num_runs * self.mean ** 2) / (num_runs - 1) if num_runs > 1 else 0.0
+        self.independent_variance = independent_variance
+
+    @property
+    def standard_error(self) -> float:
+        return sqrt(max(self.variance, 0.0) / self.num_runs)
+
+    @property
+    def independent_standard_error(self) -> float:
+        return sqrt(self.independent_variance)
+
+    @property
+    def variance_reduction(self) -> float:
+        """
+        How many times fewer runs the paired comparison needs than independent runs for the same standard error.
+        """
+        paired_variance = max(self.variance, 0.0) / self.num_runs
+        return self.independent_variance / paired_variance if paired_variance else float('inf')
+
+    def __repr__(self):
+        return f"{self.mean:+.4f} ± {1.96 * self.standard_error:.4f}"
+
+
+class StrategyComparison:
+    def __init__(self, names: list[str], num_runs: int, ratios: list[float], differences: list[PairedDifference]):
+        """
+        The result of compare_strategies.
+
+        :param names: The names of the compared strategies. The first one is the baseline.
+        :param num_runs: The number of runs per strategy.
+        :param ratios: The ratio of each strategy.
+        :param differences: The paired difference of each strategy to the baseline.
+        """
+        self.names = names
+        self.num_runs = num_runs
+        self.ratios = dict(zip(names, ratios))
+        self.differences = dict(zip(names, differences))
+
+    def report(self) -> str:
+        """
+        Returns a table of each strategy's ratio and difference to the baseline, with the 95% interval of the
+        difference and the variance reduction over independent runs.
+
+        :return: str
+        """
+        width = max(len(name) for name in self.names)
+        lines = [f"{'strategy':<{width}}  ratio   difference        reduction",
+                 f"{self.names[0]:<{width}}  {self.ratios[self.names[0]]:.4f}  (baseline)"]
+        for name in self.names[1:]:
+            difference = self.differences[name]
+            lines.append(f"{name:<{width}}  {self.ratios[name]:.4f}  {str(difference):<16}  "
+                         f"{difference.variance_reduction:.1f}x")
+        return '\n'.join(lines)
+
+    def __repr__(self):
+        return self.report()
+
+
+def compare_strategies(run_method_funcs: list,
+                       target_rooms: None | list[ValidRoomType] = None,
+                       initial_room: ValidRoomType | None = None,
+                       start_with_initial_room: bool = False,
+                       num_runs: int = 10000,
+                       aotv: bool = False,
+                       rr: bool = True,
+                       seed=0) -> StrategyComparison:
+    """
+    Runs every strategy on the same temples with common random numbers (see crn_temple), and measures each strategy's
+    difference to the first one on a per-temple basis. As the runs are paired, the noise the strategies share cancels
+    out of the difference.
+
+    :param run_method_funcs: The functions to use for running the temples. The first one is the baseline.
+    :param target_rooms: The desired target rooms. If None, strategies are compared on their ratio of T3 rooms.
+    :param initial_room: Which room to start the temple with or not, depending on start_with_initial_room.
+    :param start_with_initial_room: Controls whether the room specified by initial_room starts in the temple.
+    :param num_runs: How many temple runs to do per strategy.
+    :param aotv: Whether Artefacts of the Vaal is active.
+    :param rr: Whether Resource Reallocation is active.
+    :param seed: The seed of the comparison.
+    :return: StrategyComparison
+    """
+    kwargs = {'aotv': aotv, 'rr': rr}
+    if target_rooms is not None:
+        if not isinstance(target_rooms, list):
+            target_rooms = [target_rooms]
+        kwargs['target_rooms'] = target_rooms
+    num_strategies = len(run_method_funcs)
+    totals = [0.0] * num_strategies
+    total_squares = [0.0] * num_strategies
+    difference_totals = [0.0] * num_strategies
+    difference_squares = [0.0] * num_strategies
+    for run in range(num_runs):
+        results = [temple_result(run_method_func(crn_temple(seed, run, initial_room, start_with_initial_room),
+                                                 **kwargs),
+                                 target_rooms)
+                   for run_method_func in run_method_funcs]
+        for index, result in enumerate(results):
+            difference = result - results[0]
+            totals[index] += result
+            total_squares[index] += result * result
+            difference_totals[index] += difference
+            difference_squares[index] += difference * difference
+    variances = [(squares - total * total / num_runs) / (num_runs - 1) if num_runs > 1 else 0.0
+                 for total, squares in zip(totals, total_squares)]
+    differences = [PairedDifference(num_runs,
+                                    difference_totals[index],
+                                    difference_squares[index],
+                                    (variances[index] + variances[0]) / num_runs)
+                   for index in range(num_strategies)]
+    return StrategyComparison([run_method_func.__name__ for run_method_func in run_method_funcs],
+                              num_runs,
+                              [total / num_runs for total in totals],
+                              differences)
@@ -0,0 +1,189 @@
+from functools import wraps
+from temple import Temple, ValidRoomType
+from temple_room import TempleRoom
+from strategy_spec import (UPGRADE, SIDEGRADE, SIDEGRADE_NO_T0, DEFAULT_TARGET_ROOMS, STRATEGY_SPECS, StrategySpec,
+                           get_strategy_spec)
+
+
+class Targets:
+    __slots__ = ('rooms', 'first', 'last')
+
+    def __init__(self, target_rooms: list):
+        """
+        The target rooms of one temple run, indexed once so decisions can look them up instead of scanning the list.
+
+        :param target_rooms: The desired target rooms, in order of the target_rooms argument.
+        """
+        self.rooms = target_rooms
+        # room type -> its first and last position in target_rooms. Where the up_room_logic functions loop over
+        # target_rooms, the first (or last) matching target is the one they end up choosing.
+        self.first: dict = {}
+        self.last: dict = {}
+        for position, room_type in enumerate(target_rooms):
+            self.first.setdefault(room_type, position)
+            self.last[room_type] = position
+
+    def exist_in(self, temple: Temple) -> bool:
+        """
+        Returns whether a target room is present within the temple.
+        """
+        room_types_remaining = temple.valid_room_types_remaining
+        for room_type in self.rooms:
+            if room_type not in room_types_remaining:
+                return True
+        return False
+
+
+def _last_target(options: list[ValidRoomType], targets: Targets, room_type):
+    position = -1
+    for option in options:
+        option_position = targets.last.get(option, -1)
+        if option_position > position:
+            position, room_type = option_position, option
+    return room_type
+
+
+def upgrade_unless_target(temple: Temple, room: TempleRoom, targets: Targets) -> ValidRoomType:
+    """
+    Compiled equivalent of up_room_logic.prio_upgrade_unless_target.
+    """
+    upgrade_options = temple.get_room_upgrade_option(2 if room.tier == 0 else 1)
+    return _last_target(upgrade_options, targets, upgrade_options[0] if room.type is None else room.type)
+
+
+def sidegrade_unless_target(temple: Temple, room: TempleRoom, targets: Targets) -> ValidRoomType:
+    """
+    Compiled equivalent of up_room_logic.prio_sidegrade_unless_target.
+    """
+    upgrade_options = temple.get_room_upgrade_option(2 if room.tier == 0 else 1)
+    room_type = room.type if room.type in targets.last else upgrade_options[0]
+    if room.tier == 0:
+        room_type = _last_target(upgrade_options, targets, room_type)
+    return room_type
+
+
+def sidegrade_unless_target_no_t0(temple: Temple, room: TempleRoom, targets: Targets) -> ValidRoomType:
+    """
+    Compiled equivalent of up_room_logic.prio_sidegrade_unless_target_no_t0. Like it, a tiered room draws its upgrade
+    option twice, so seeded runs match.
+    """
+    upgrade_options = temple.get_room_upgrade_option(2 if room.tier == 0 else 1)
+    if room.tier != 0:
+        return sidegrade_unless_target(temple, room, targets)
+    first_target = None
+    for option in upgrade_options:
+        if option in targets.first and (first_target is None or targets.first[option] < targets.first[first_target]):
+            first_target = option
+    if first_target is not None:
+        upgrade_options.remove(first_target)
+    return upgrade_options[0]
+
+
+def adjacent_nexus(default_decision, temple: Temple, room: TempleRoom, targets: Targets) -> ValidRoomType:
+    """
+    Compiled equivalent of up_room_logic.prio_adjacent_nexus.
+    """
+    if room.type is not None and room.type in targets.last:
+        return room.type
+    upgrade_options = temple.get_room_upgrade_option(2 if room.tier == 0 else 1)
+    if ((ValidRoomType.ADJACENT_ROOM_LEVELS in upgrade_options or room.type is ValidRoomType.ADJACENT_ROOM_LEVELS)
+            and any(temple.is_adjacent(room, target_room) for target_room in targets.rooms)):
+        return ValidRoomType.ADJACENT_ROOM_LEVELS
+    return default_decision(temple, room, targets)
+
+
+# StrategySpec decision -> (name of the up_room_logic equivalent, compiled decision).
+DECISIONS = {UPGRADE: ('prio_upgrade_unless_target', upgrade_unless_target),
+             SIDEGRADE: ('prio_sidegrade_unless_target', sidegrade_unless_target),
+             SIDEGRADE_NO_T0: ('prio_sidegrade_unless_target_no_t0', sidegrade_unless_target_no_t0)}
+
+
+def compile_decision(spec: StrategySpec, wrap_decision=None):
+    """
+    Composes the decision function of a strategy, taking (temple, room, targets) and returning the room type to
+    upgrade the room to.
+
+    :param spec: The StrategySpec of the strategy.
+    :param wrap_decision: Function of (up_room_logic name, decision) returning a replacement for the decision, applied
+    to every decision the strategy uses, e.g. to instrument them. None to use the decisions as is.
+    :return: The decision function.
+    """
+    wrap_decision = wrap_decision or (lambda name, decision: decision)
+    decision = wrap_decision(*DECISIONS[spec.decision])
+    if spec.upgrade_once_target_exists:
+        upgrade, until_target_exists = wrap_decision(*DECISIONS[UPGRADE]), decision
+
+        def decision(temple: Temple, room: TempleRoom, targets: Targets) -> ValidRoomType:
+            if targets.exist_in(temple):
+                return upgrade(temple, room, targets)
+            return until_target_exists(temple, room, targets)
+
+    if spec.prio_nexus:
+        nexus, default_decision = wrap_decision('prio_adjacent_nexus', adjacent_nexus), decision
+
+        def decision(temple: Temple, room: TempleRoom, targets: Targets) -> ValidRoomType:
+            return nexus(default_decision, temple, room, targets)
+
+    return decision
+
+
+def compile_strategy(spec: StrategySpec | str, wrap_decision=None):
+    """
+    Compiles a StrategySpec into a run_t_* function. The decision is composed once, here, and the target rooms are
+    indexed once per temple, so the run loop does no per-incursion interpretation of the spec.
+
+    :param spec: The StrategySpec, or the name of a run_t_* function in STRATEGY_SPECS.
+    :param wrap_decision: See compile_decision.
+    :return: A function of (temple, **kwargs) taking the run_t_* keywords (target_rooms, aotv, rr) and returning the
+    completed Temple.
+    """
+    spec = get_strategy_spec(spec)
+    decision = compile_decision(spec, wrap_decision)
+    use_target_rooms = spec.use_target_rooms
+    early_stop = spec.early_stop
+
+    def run(temple: Temple, **kwargs) -> Temple:
+        if use_target_rooms:
+            if 'target_room' in kwargs:
+                raise KeyError('invalid key target_room. Should be target_rooms.')
+            target_rooms = kwargs['target_rooms'] if 'target_rooms' in kwargs else DEFAULT_TARGET_ROOMS
+            if not isinstance(target_rooms, list):
+                target_rooms = [target_rooms]
+        else:
+            target_rooms = [None]
+        targets = Targets(target_rooms)
+        rr = kwargs['rr'] if 'rr' in kwargs else False
+        incurs_per_area, num_areas = (4, 3) if kwargs.get('aotv', False) else (3, 4)
+        incursions_remaining = incurs_per_area * num_areas
+        while incursions_remaining > 0:
+            for picked_room in temple.pick_incursion_rooms(min(incurs_per_area, incursions_remaining)):
+                temple.upgrade_room(picked_room, decision(temple, picked_room, targets), rr)
+                incursions_remaining -= 1
+                if early_stop and picked_room.type in targets.last:
+                    break
+        temple.apply_nexus()
+        return temple
+
+    run.spec = spec
+    return run
+
+
+def strategy(spec: StrategySpec | None = None):
+    """
+    Decorator turning a stub function into a compiled strategy: the stub's body is ignored and only its name and
+    docstring are kept, e.g.
+
+        @strategy(StrategySpec(SIDEGRADE, prio_nexus=True))
+        def run_t_sidegrade_prio_nexus(temple: Temple, **kwargs) -> Temple:
+            \"\"\"Docstring.\"\"\"
+
+    The spec is registered in STRATEGY_SPECS under the function's name, for the engines that simulate specs.
+
+    :param spec: The StrategySpec of the strategy. Defaults to the one in STRATEGY_SPECS for the function's name.
+    :return: The decorator.
+    """
+    def decorator(func):
+        func_spec = spec if spec is not None else get_strategy_spec(func.__name__)
+        STRATEGY_SPECS.setdefault(func.__name__, func_spec)
+        return wraps(func)(compile_strategy(func_spec))
+    return decorator
@@ -0,0 +1,183 @@
+import argparse
+from math import ceil, log2, sqrt
+from statistics import NormalDist
+from temple import ValidRoomType, ROOM_CONNECTIONS
+from sequential_estimation import RatioEstimate, wilson_interval
+from strategy_comparison import crn_temple
+
+
+class RaceEntry:
+    def __init__(self, name: str, estimate: RatioEstimate, eliminated_in_round: int | None = None):
+        """
+        One strategy's result in a race.
+
+        :param name: The name of the strategy.
+        :param estimate: Its ratio, with the confidence interval over the runs it got.
+        :param eliminated_in_round: The round it was dropped after, or None if it was never dropped.
+        """
+        self.name = name
+        self.estimate = estimate
+        self.eliminated_in_round = eliminated_in_round
+
+    def __repr__(self):
+        status = 'contender' if self.eliminated_in_round is None else f"dropped after round {self.eliminated_in_round}"
+        return f"{self.name}: {self.estimate}, {status}"
+
+
+class RaceResult:
+    def __init__(self, entries: list[RaceEntry], num_rounds: int, runs_used: int, budget: int):
+        """
+        The result of race_strategies.
+
+        :param entries: Every strategy, ranked: the contenders left by ratio, then the dropped strategies, the ones
+        dropped last first.
+        :param num_rounds: How many rounds were run.
+        :param runs_used: How many temple runs were used, over every strategy.
+        :param budget: The budget the race was given.
+        """
+        self.entries = entries
+        self.num_rounds = num_rounds
+        self.runs_used = runs_used
+        self.budget = budget
+
+    @property
+    def contenders(self) -> list[RaceEntry]:
+        return [entry for entry in self.entries if entry.eliminated_in_round is None]
+
+    def report(self) -> str:
+        """
+        Returns a table of the ranked strategies with their ratio, interval, number of runs and when they were dropped.
+
+        :return: str
+        """
+        width = max(len(entry.name) for entry in self.entries)
+        lines = [f"{'rank':<4}  {'strategy':<{width}}  ratio   interval          runs      dropped"]
+        for rank, entry in enumerate(self.entries, 1):
+            estimate = entry.estimate
+            dropped = '-' if entry.eliminated_in_round is None else f"round {entry.eliminated_in_round}"
+            lines.append(f"{rank:<4}  {entry.name:<{width}}  {estimate.ratio:.4f}  "
+                         f"[{estimate.low:.4f}, {estimate.high:.4f}]  {estimate.num_runs:<8}  {dropped}")
+        lines.append(f"{self.runs_used} of {self.budget} runs used in {self.num_rounds} rounds.")
+        return '\n'.join(lines)
+
+    def __repr__(self):
+        return self.report()
+
+
+def _dominated(leader_results: list[float], results: list[float], z: float) -> bool:
+    """
+    Returns whether the paired per-run differences show the leader is better, at the one-sided level of z.
+    """
+    num_runs = len(results)
+    if num_runs < 2:
+        return False
+    differences = [leader_result - result for leader_result, result in zip(leader_results, results)]
+    mean = sum(differences) / num_runs
+    variance = sum((difference - mean) ** 2 for difference in differences) / (num_runs - 1)
+    return mean - z * sqrt(variance / num_runs) > 0
+
+
+def race_strategies(run_method_funcs: list,
+                    budget: int = 100000,
+                    target_rooms: None | list[ValidRoomType] = None,
+                    initial_room: ValidRoomType | None = None,
+                    start_with_initial_room: bool = False,
+                    aotv: bool = False,
+                    rr: bool = True,
+                    confidence: float = 0.95,
+                    seed=0) -> RaceResult:
+    """
+    Races strategies against each other within a total budget of temple runs, in the rounds of successive halving:
+    ceil(log2(number of strategies)) rounds, each spending an equal share of the remaining budget, split evenly
+    between the strategies still in the race. After every round, each strategy the leader is statistically better
+    than is dropped, so the later rounds concentrate the budget on the contenders. The race ends early once a single
+    contender is left.
+
+    Every strategy runs on the same common-random-numbers temples (see strategy_comparison.crn_temple), and a strategy
+    is only dropped when the paired per-run differences between it and the leader exclude zero, with a
+    Bonferroni correction over the strategies compared. The reported intervals are Wilson intervals over the runs each
+    strategy got (counting rooms as trials for the ratio of T3 rooms, like sequential_calc_ratio_t3_rooms).
+
+    Raises ValueError if fewer than two strategies are given, or the budget can't give each of them a run.
+
+    :param run_method_funcs: The functions to use for running the temples.
+    :param budget: The total number of temple runs, over every strategy.
+    :param target_rooms: The desired target rooms. If None, strategies are raced on their ratio of T3 rooms.
+    :param initial_room: Which room to start the temple with or not, depending on start_with_initial_room.
+    :param start_with_initial_room: Controls whether the room specified by initial_room starts in the temple.
+    :param aotv: Whether Artefacts of the Vaal is active.
+    :param rr: Whether Resource Reallocation is active.
+    :param confidence: The confidence level of the intervals, and of dropping a strategy.
+    :param seed: The seed of the race.
+    :return: RaceResult
+    """
+    if len(run_method_funcs) < 2:
+        raise ValueError("a race needs at least two strategies.")
+    if budget < len(run_method_funcs):
+        raise ValueError(f"a budget of {budget} runs can't give each of the {len(run_method_funcs)} strategies a run.")
+    kwargs = {'aotv': aotv, 'rr': rr}
+    if target_rooms is not None:
+        if not isinstance(target_rooms, list):
+            target_rooms = [target_rooms]
+        kwargs['target_rooms'] = target_rooms
+    names = [run_method_func.__name__ for run_method_func in run_method_funcs]
+    # Per-run result of each strategy: whether a target room is T3, or the number of T3 rooms.
+    results: list[list[int]] = [[] for _ in run_method_funcs]
+    eliminated_in_round: list[int | None] = [None] * len(run_method_funcs)
+    contenders = list(range(len(run_method_funcs)))
+    num_rounds = ceil(log2(len(run_method_funcs)))
+    budget_left = budget
+    num_runs = 0
+    rounds_run = 0
+    for round_number in range(1, num_rounds + 1):
+        runs_per_strategy = budget_left // (num_rounds - round_number + 1) // len(contenders)
+        if runs_per_strategy == 0:
+            break
+        for run in range(num_runs, num_runs + runs_per_strategy):
+            for index in contenders:
+                temple = run_method_funcs[index](crn_temple(seed, run, initial_room, start_with_initial_room),
+                                                 **kwargs)
+                if target_rooms is None:
+                    results[index].append(sum(room.tier == 3 for room in temple))
+                else:
+                    results[index].append(int(any(room.tier == 3 and room.type in target_rooms for room in temple)))
+        num_runs += runs_per_strategy
+        budget_left -= runs_per_strategy * len(contenders)
+        rounds_run = round_number
+        leader = max(contenders, key=lambda index: sum(results[index]))
+        z = NormalDist().inv_cdf(1 - (1 - confidence) / max(1, len(contenders) - 1))
+        for index in list(contenders):
+            if index != leader and _dominated(results[leader], results[index], z):
+                contenders.remove(index)
+                eliminated_in_round[index] = round_number
+        if len(contenders) == 1:
+            break
+    trials_per_run = 1 if target_rooms is not None else len(ROOM_CONNECTIONS)
+    entries = []
+    for index, name in enumerate(names):
+        successes, runs = sum(results[index]), len(results[index])
+        trials = runs * trials_per_run
+        low, high = wilson_interval(successes, trials, confidence)
+        entries.append(RaceEntry(name,
+                                 RatioEstimate(successes / trials if trials else 0.0, low, high, runs, successes,
+                                               trials),
+                                 eliminated_in_round[index]))
+    entries.sort(key=lambda entry: (entry.eliminated_in_round is not None,
+                                    -(entry.eliminated_in_round or 0),
+                                    -entry.estimate.ratio))
+    return RaceResult(entries, rounds_run, budget - budget_left, budget)
+
+
+if __name__ == '__main__':
+    import main
+    parser = argparse.ArgumentParser(description="Race the run_t_* strategies of main on the chance of a T3 target room.")
+    parser.add_argument('--budget', type=int, default=100000, help="temple runs over every strategy")
+    parser.add_argument('--aotv', action='store_true', help="Artefacts of the Vaal active")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    print(race_strategies([getattr(main, name) for name in vars(main) if name.startswith('run_t_')],
+                          budget=args.budget,
+                          target_rooms=[ValidRoomType.ITEM_DOUBLE_CORRUPT],
+                          initial_room=ValidRoomType.ITEM_DOUBLE_CORRUPT,
+                          aotv=args.aotv,
+                          seed=args.seed).report())
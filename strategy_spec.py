@@ -0,0 +1,69 @@
+from temple import ValidRoomType
+
+UPGRADE = "upgrade"
+SIDEGRADE = "sidegrade"
+SIDEGRADE_NO_T0 = "sidegrade_no_t0"
+# The target_rooms the run_t_* functions use when none are given.
+DEFAULT_TARGET_ROOMS = [ValidRoomType.ITEM_DOUBLE_CORRUPT]
+
+
+class StrategySpec:
+    def __init__(self, decision: str,
+                 prio_nexus: bool = False,
+                 upgrade_once_target_exists: bool = False,
+                 early_stop: bool = False,
+                 use_target_rooms: bool = True):
+        """
+        A declarative description of a run_t_* strategy, so engines other than the Temple object model can simulate it.
+
+        :param decision: Which up_room_logic decision to use. One of UPGRADE, SIDEGRADE or SIDEGRADE_NO_T0.
+        :param prio_nexus: Whether decisions are wrapped in prio_adjacent_nexus.
+        :param upgrade_once_target_exists: Switch to UPGRADE once a target room exists in the temple.
+        :param early_stop: Stop the current area once the picked room ends up as a target room.
+        :param use_target_rooms: Whether the strategy passes target_rooms to its decisions at all.
+        """
+        if decision not in (UPGRADE, SIDEGRADE, SIDEGRADE_NO_T0):
+            raise ValueError(f"invalid decision {decision}.")
+        self.decision = decision
+        self.prio_nexus = prio_nexus
+        self.upgrade_once_target_exists = upgrade_once_target_exists
+        self.early_stop = early_stop
+        self.use_target_rooms = use_target_rooms
+
+    def __repr__(self):
+        return (f'StrategySpec("{self.decision}", prio_nexus={self.prio_nexus}, '
+                f'upgrade_once_target_exists={self.upgrade_once_target_exists}, early_stop={self.early_stop}, '
+                f'use_target_rooms={self.use_target_rooms})')
+
+
+STRATEGY_SPECS = {
+    'run_t_always_upgrade': StrategySpec(UPGRADE, use_target_rooms=False),
+    'run_t_always_pick_target_rooms': StrategySpec(UPGRADE),
+    'run_t_place_desired_room_on_t2_no_t0': StrategySpec(SIDEGRADE_NO_T0),
+    'run_t_place_desired_room_on_t2': StrategySpec(SIDEGRADE),
+    'run_t_prio_t2_until_target_exists': StrategySpec(SIDEGRADE, upgrade_once_target_exists=True),
+    'run_t_prio_t2_until_target_exists_prio_nexus': StrategySpec(SIDEGRADE,
+                                                                 prio_nexus=True,
+                                                                 upgrade_once_target_exists=True),
+    'run_t_prio_t2_until_target_exists_prio_nexus_early_stop': StrategySpec(SIDEGRADE,
+                                                                            prio_nexus=True,
+                                                                            upgrade_once_target_exists=True,
+                                                                            early_stop=True),
+}
+
+
+def get_strategy_spec(strategy) -> StrategySpec:
+    """
+    Returns the StrategySpec for a run_t_* function. A StrategySpec is returned as is.
+
+    Raises KeyError if the function has no known spec.
+
+    :param strategy: A run_t_* function or a StrategySpec.
+    :return: StrategySpec
+    """
+    if isinstance(strategy, StrategySpec):
+        return strategy
+    name = getattr(strategy, '__name__', strategy)
+    if name not in STRATEGY_SPECS:
+        raise KeyError(f'no StrategySpec for {name}.')
+    return STRATEGY_SPECS[name]
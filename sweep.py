@@ -0,0 +1,237 @@
+import argparse
+import csv
+import itertools
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import main
+from main import count_t3_room_levels, count_target_t3_results
+from result_cache import CACHE_DIR, ResultCache, cache_key, cached_count
+from temple import ValidRoomType
+
+CSV = "csv"
+MARKDOWN = "markdown"
+COLUMNS = ('strategy', 'aotv', 'rr', 'target_rooms', 'initial_room', 'start_with_initial_room', 'num_runs', 'ratio',
+           'source')
+
+
+class SweepGrid:
+    def __init__(self, strategies: list[str],
+                 aotv: tuple[bool, ...] = (False, True),
+                 rr: tuple[bool, ...] = (True,),
+                 target_rooms: tuple[None | tuple[ValidRoomType, ...], ...] = (None,),
+                 initial_rooms: tuple[tuple[ValidRoomType | None, bool], ...] = ((None, False),),
+                 num_runs: int = 100000,
+                 seed: int = 0):
+        """
+        A grid of evaluations: every combination of the given values.
+
+        :param strategies: The names of the run_t_* functions of main to evaluate.
+        :param aotv: The values of aotv to evaluate.
+        :param rr: The values of rr to evaluate. Only used for the ratio of T3 rooms, as target room evaluations
+        assume rr active.
+        :param target_rooms: The target rooms to evaluate. None evaluates the ratio of T3 rooms instead.
+        :param initial_rooms: The (initial_room, start_with_initial_room) pairs to evaluate. Only used for target room
+        evaluations.
+        :param num_runs: How many temple runs to do per evaluation.
+        :param seed: The seed of every evaluation.
+        """
+        self.strategies = strategies
+        self.aotv = aotv
+        self.rr = rr
+        self.target_rooms = target_rooms
+        self.initial_rooms = initial_rooms
+        self.num_runs = num_runs
+        self.seed = seed
+
+    def jobs(self) -> list:
+        """
+        Expands the grid into its SweepJobs.
+
+        :return: list[SweepJob]
+        """
+        jobs = []
+        for strategy, aotv, rr, target_rooms, (initial_room, start_with_initial_room) in itertools.product(
+                self.strategies, self.aotv, self.rr, self.target_rooms, self.initial_rooms):
+            if target_rooms is None:
+                kwargs = {'aotv': aotv, 'rr': rr}
+            else:
+                kwargs = {'target_rooms': list(target_rooms),
+                          'initial_room': initial_room,
+                          'start_with_initial_room': start_with_initial_room,
+                          'aotv': aotv}
+            jobs.append(SweepJob(strategy, kwargs, self.num_runs, self.seed))
+        return jobs
+
+
+class SweepJob:
+    def __init__(self, strategy: str, kwargs: dict, num_runs: int, seed: int):
+        """
+        One evaluation of a sweep: the ratio of T3 rooms if kwargs has no target_rooms, the ratio of T3 target rooms
+        otherwise.
+
+        :param strategy: The name of the run_t_* function of main to evaluate.
+        :param kwargs: Passed on to main.count_t3_room_levels or main.count_target_t3_results.
+        :param num_runs: How many temple runs to do.
+        :param seed: The seed of the evaluation.
+        """
+        self.strategy = strategy
+        self.kwargs = kwargs
+        self.num_runs = num_runs
+        self.seed = seed
+        self.count_func = count_target_t3_results if 'target_rooms' in kwargs else count_t3_room_levels
+        self.key = cache_key(self.count_func, self.run_method_func, seed, **kwargs)
+
+    @property
+    def run_method_func(self):
+        return getattr(main, self.strategy)
+
+    @property
+    def cost(self) -> int:
+        """
+        The relative cost of the job, used to schedule the largest jobs first.
+        """
+        return self.num_runs
+
+    def ratio(self, results) -> float:
+        """
+        Returns the ratio the job evaluates from its aggregated Counter.
+        """
+        return round(results[3 if self.count_func is count_t3_room_levels else True] / results.total(), 4)
+
+    def row(self, results, source: str, num_runs: int | None = None) -> dict:
+        """
+        Returns the job's table row.
+
+        :param results: The aggregated Counter of the job.
+        :param source: Where the result came from, 'cache' or 'run'.
+        :param num_runs: The number of runs results covers, if not the job's (a larger cached sample).
+        :return: dict of COLUMNS
+        """
+        target_rooms = self.kwargs.get('target_rooms')
+        initial_room = self.kwargs.get('initial_room')
+        return {'strategy': self.strategy,
+                'aotv': self.kwargs['aotv'],
+                'rr': self.kwargs.get('rr', True),
+                'target_rooms': '+'.join(room.value for room in target_rooms) if target_rooms else '',
+                'initial_room': initial_room.value if initial_room else '',
+                'start_with_initial_room': self.kwargs.get('start_with_initial_room', ''),
+                'num_runs': num_runs or self.num_runs,
+                'ratio': self.ratio(results),
+                'source': source}
+
+
+def expand(grids: list[SweepGrid]) -> list[SweepJob]:
+    """
+    Expands grids into their jobs, dropping duplicates (by cache key) in order of first appearance.
+
+    :param grids: The grids of the sweep.
+    :return: list[SweepJob]
+    """
+    jobs = {}
+    for grid in grids:
+        for job in grid.jobs():
+            jobs.setdefault(job.key, job)
+    return list(jobs.values())
+
+
+class TableWriter:
+    def __init__(self, file, table_format: str = CSV):
+        """
+        Streams table rows to file as they come, flushing after each.
+
+        Raises ValueError if table_format is not CSV or MARKDOWN.
+
+        :param file: The text file to write to.
+        :param table_format: CSV or MARKDOWN.
+        """
+        if table_format not in (CSV, MARKDOWN):
+            raise ValueError(f"invalid table_format {table_format}. Should be one of {[CSV, MARKDOWN]}.")
+        self.file = file
+        self.table_format = table_format
+        if table_format == CSV:
+            self._writer = csv.DictWriter(file, fieldnames=COLUMNS)
+            self._writer.writeheader()
+        else:
+            file.write(f"| {' | '.join(COLUMNS)} |\n|{'---|' * len(COLUMNS)}\n")
+        file.flush()
+
+    def write(self, row: dict):
+        if self.table_format == CSV:
+            self._writer.writerow(row)
+        else:
+            self.file.write(f"| {' | '.join(str(row[column]) for column in COLUMNS)} |\n")
+        self.file.flush()
+
+
+def _run_job(count_func, strategy: str, num_runs: int, seed: int, cache_dir: str, kwargs: dict):
+    return cached_count(count_func, getattr(main, strategy), num_runs=num_runs, seed=seed,
+                        cache=ResultCache(cache_dir), **kwargs)
+
+
+def run_sweep(grids: list[SweepGrid],
+              writer: TableWriter | None = None,
+              num_workers: int | None = None,
+              cache_dir: str = CACHE_DIR) -> list[dict]:
+    """
+    Runs every job of the grids. Jobs already in the result cache are answered from it first. The rest run on a
+    process pool, largest first so the pool isn't left waiting on one long job at the end, and are stored in the
+    cache. Each job gives the same result as result_cache.cached_count with its seed, however it is scheduled.
+
+    :param grids: The grids of the sweep.
+    :param writer: The TableWriter to stream the rows to as jobs finish. None to only return them.
+    :param num_workers: How many worker processes to use. Defaults to os.cpu_count().
+    :param cache_dir: The directory of the ResultCache.
+    :return: The rows of every job, in the order they finished.
+    """
+    cache = ResultCache(cache_dir)
+    rows = []
+
+    def emit(row: dict):
+        rows.append(row)
+        if writer is not None:
+            writer.write(row)
+
+    jobs = []
+    for job in expand(grids):
+        cached = cache.get(job.key, job.num_runs)
+        if cached is None:
+            jobs.append(job)
+        else:
+            emit(job.row(cached[1], 'cache', cached[0]))
+    jobs.sort(key=lambda job: job.cost, reverse=True)
+    with ProcessPoolExecutor(max_workers=num_workers or os.cpu_count() or 1) as executor:
+        futures = {executor.submit(_run_job, job.count_func, job.strategy, job.num_runs, job.seed, cache_dir,
+                                   job.kwargs): job
+                   for job in jobs}
+        for future in as_completed(futures):
+            emit(futures[future].row(future.result(), 'run'))
+    return rows
+
+
+ALL_STRATEGIES = [name for name in vars(main) if name.startswith('run_t_')]
+IDC = (ValidRoomType.ITEM_DOUBLE_CORRUPT,)
+# The results table of main.py.
+RESULTS_GRIDS = [SweepGrid(['run_t_always_upgrade'], rr=(False, True)),
+                 SweepGrid(['run_t_always_upgrade', 'run_t_always_pick_target_rooms'], target_rooms=(IDC,)),
+                 SweepGrid(['run_t_always_pick_target_rooms'], target_rooms=(IDC,),
+                           initial_rooms=((ValidRoomType.ITEM_DOUBLE_CORRUPT, True),)),
+                 SweepGrid([name for name in ALL_STRATEGIES if name != 'run_t_always_upgrade'], target_rooms=(IDC,),
+                           initial_rooms=((ValidRoomType.ITEM_DOUBLE_CORRUPT, False),))]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Regenerate the results table.")
+    parser.add_argument('--format', choices=(CSV, MARKDOWN), default=MARKDOWN)
+    parser.add_argument('--output', help="file to write the table to, defaults to stdout")
+    parser.add_argument('--runs', type=int, default=100000, help="temple runs per evaluation")
+    parser.add_argument('--workers', type=int, help="worker processes, defaults to the number of CPUs")
+    args = parser.parse_args()
+    for results_grid in RESULTS_GRIDS:
+        results_grid.num_runs = args.runs
+    output = open(args.output, 'w', newline='') if args.output else sys.stdout
+    try:
+        run_sweep(RESULTS_GRIDS, TableWriter(output, args.format), num_workers=args.workers)
+    finally:
+        if args.output:
+            output.close()
@@ -1,5 +1,6 @@
+import random
 from temple_room import TempleRoom
-from random import sample, randint
+from room_type_pool import RoomTypePool
 from enum import Enum
 
 
@@ -31,50 +32,90 @@ class ValidRoomType(Enum):
     BREACH = "Breach"
 
 
+# The temple layout: ROOM_CONNECTIONS[i] are the indices of the rooms connected to room i, and bit j of
+# ROOM_ADJACENCY_MASKS[i] is set if room j is connected to room i.
+ROOM_CONNECTIONS: tuple[tuple[int, ...], ...] = ((2, 3),
+                                                 (4, 5),
+                                                 (0, 3, 6),
+                                                 (0, 2, 4, 6, 7),
+                                                 (1, 3, 5, 7, 8),
+                                                 (1, 4, 8),
+                                                 (2, 3, 7, 9),
+                                                 (3, 4, 6, 8, 9, 10),
+                                                 (4, 5, 7, 10),
+                                                 (6, 7, 10),
+                                                 (7, 8, 9))
+ROOM_ADJACENCY_MASKS: tuple[int, ...] = tuple(sum(1 << room for room in connections)
+                                              for connections in ROOM_CONNECTIONS)
+
+
 class Temple:
     def __init__(self, num_starting_tiered_rooms: int = 7,
                  desired_room: None | ValidRoomType = None,
-                 start_with_desired_room: bool = False):
+                 start_with_desired_room: bool = False,
+                 rng=None,
+                 pick_rng=None,
+                 option_rng=None):
         """
         An object representing a temple of Atzoatl.
         :param num_starting_tiered_rooms: How many rooms to start at tier 1.
         :param desired_room: The desired T3 room for this Temple.
         :param start_with_desired_room: controls whether this temple starts with a T1 version of the desired room.
+        :param rng: The source of randomness (anything with sample, randint and randrange, like random.Random or
+        block_rng.BlockRNG) for the starting rooms, Resource Reallocation and the nexus. Defaults to the random module.
+        :param pick_rng: The source of randomness for pick_incursion_rooms. Defaults to rng.
+        :param option_rng: The source of randomness for get_room_upgrade_option. Defaults to rng.
         """
-        self._room_types_remaining = list(ValidRoomType)
+        self.rng = rng if rng is not None else random
+        self.pick_rng = pick_rng if pick_rng is not None else self.rng
+        self.option_rng = option_rng if option_rng is not None else self.rng
+        self._room_types_remaining = RoomTypePool()
+        # room type -> index of the room of that type, kept current by upgrade_room.
+        self._room_indices: dict[ValidRoomType, int] = {}
         self.rooms: list[TempleRoom] = []
-        for _ in range(11):
-            self.rooms.append(TempleRoom())
-        rooms_to_tier = sample(range(len(self.rooms)), num_starting_tiered_rooms)
+        for index in range(len(ROOM_CONNECTIONS)):
+            room = TempleRoom()
+            room.index = index
+            self.rooms.append(room)
+        for room in self.rooms:
+            room.connections = [self.rooms[i] for i in ROOM_CONNECTIONS[room.index]]
+        self.reset(num_starting_tiered_rooms, desired_room, start_with_desired_room)
+
+    def reset(self, num_starting_tiered_rooms: int = 7,
+              desired_room: None | ValidRoomType = None,
+              start_with_desired_room: bool = False):
+        """
+        Re-rolls this temple in place, leaving it as a newly created Temple with the same sources of randomness would
+        be. Reusing one Temple across runs saves re-creating its rooms every run.
+
+        :param num_starting_tiered_rooms: How many rooms to start at tier 1.
+        :param desired_room: The desired T3 room for this Temple.
+        :param start_with_desired_room: controls whether this temple starts with a T1 version of the desired room.
+        :return: None
+        """
+        self._room_types_remaining.reset(ValidRoomType)
+        self._room_indices.clear()
+        for room in self.rooms:
+            room.tier = 0
+            room.type = None
+        rooms_to_tier = self.rng.sample(range(len(self.rooms)), num_starting_tiered_rooms)
         rooms_to_tier_types: list[ValidRoomType] = []
-        starting_room_types_remaining = self._room_types_remaining.copy()
+        starting_room_types_remaining = list(ValidRoomType)
         if desired_room is not None:
             if start_with_desired_room:
                 rooms_to_tier_types.append(desired_room)
                 num_starting_tiered_rooms -= 1
             starting_room_types_remaining.remove(desired_room)
-        rooms_to_tier_types.extend(sample(starting_room_types_remaining, num_starting_tiered_rooms))
-        for room_num in rooms_to_tier:
-            self.upgrade_room(room_num, rooms_to_tier_types[0])
-            rooms_to_tier_types.pop(0)
-        self.rooms[0].connections = [self.rooms[i] for i in (2, 3)]
-        self.rooms[1].connections = [self.rooms[i] for i in (4, 5)]
-        self.rooms[2].connections = [self.rooms[i] for i in (0, 3, 6)]
-        self.rooms[3].connections = [self.rooms[i] for i in (0, 2, 4, 6, 7)]
-        self.rooms[4].connections = [self.rooms[i] for i in (1, 3, 5, 7, 8)]
-        self.rooms[5].connections = [self.rooms[i] for i in (1, 4, 8)]
-        self.rooms[6].connections = [self.rooms[i] for i in (2, 3, 7, 9)]
-        self.rooms[7].connections = [self.rooms[i] for i in (3, 4, 6, 8, 9, 10)]
-        self.rooms[8].connections = [self.rooms[i] for i in (4, 5, 7, 10)]
-        self.rooms[9].connections = [self.rooms[i] for i in (6, 7, 10)]
-        self.rooms[10].connections = [self.rooms[i] for i in (7, 8, 9)]
+        rooms_to_tier_types.extend(self.rng.sample(starting_room_types_remaining, num_starting_tiered_rooms))
+        for room_num, room_type in zip(rooms_to_tier, rooms_to_tier_types):
+            self.upgrade_room(room_num, room_type)
 
     @property
-    def valid_room_types_remaining(self) -> list[ValidRoomType]:
+    def valid_room_types_remaining(self) -> RoomTypePool:
         """
-        Returns a list of valid room types that aren't currently present within this temple.
+        Returns the pool of valid room types that aren't currently present within this temple.
 
-        :return: list[str]
+        :return: RoomTypePool
         """
         return self._room_types_remaining
 
@@ -87,6 +128,35 @@ class Temple:
         """
         return [room for room in self.rooms if room.tier < 3]
 
+    def pick_incursion_rooms(self, count: int) -> list[TempleRoom]:
+        """
+        Returns count distinct random rooms that aren't T3, the rooms encountered in one area.
+
+        :param count: How many rooms to pick.
+        :return: list[TempleRoom]
+        """
+        return self.pick_rng.sample(self.valid_rooms_remaining, count)
+
+    def room_index(self, room_type: ValidRoomType) -> int | None:
+        """
+        Returns the index of the room of the given type, or None if that type isn't present within this temple.
+
+        :param room_type: The room type to look up.
+        :return: int | None
+        """
+        return self._room_indices.get(room_type)
+
+    def is_adjacent(self, room: TempleRoom, room_type: ValidRoomType) -> bool:
+        """
+        Returns whether a room of the given type is connected to room.
+
+        :param room: A room of this temple.
+        :param room_type: The room type to look for.
+        :return: bool
+        """
+        index = self._room_indices.get(room_type)
+        return index is not None and bool(ROOM_ADJACENCY_MASKS[room.index] >> index & 1)
+
     def get_room_upgrade_option(self, count: int = 1) -> list[ValidRoomType]:
         """
         Returns one or two room types that currently isn't present within this temple to act as a non-resident option.
@@ -97,7 +167,7 @@ class Temple:
         """
         if count != 1:
             count = 2
-        return sample(self._room_types_remaining, count)
+        return self._room_types_remaining.sample(self.option_rng, count)
 
     def upgrade_room(self, room: int | TempleRoom, new_room_type: ValidRoomType, rr: bool = False):
         """
@@ -127,11 +197,14 @@ class Temple:
 
         if room.type is None:
             self._room_types_remaining.remove(new_room_type)
+            self._room_indices[new_room_type] = room.index
         elif new_room_type != room.type:
-            self._room_types_remaining[self._room_types_remaining.index(new_room_type)] = room.type
+            self._room_types_remaining.replace(new_room_type, room.type)
+            del self._room_indices[room.type]
+            self._room_indices[new_room_type] = room.index
         upgrade_amount = 1
         if rr and new_room_type == room.type and room.tier == 1:
-            upgrade_amount = randint(1, 2)
+            upgrade_amount = self.rng.randint(1, 2)
         room += upgrade_amount
         room.type = new_room_type
 
@@ -142,17 +215,15 @@ class Temple:
 
         :return: None
         """
-        nexus_room: TempleRoom
-        try:
-            nexus_room_index = [room.type for room in self.rooms].index(ValidRoomType.ADJACENT_ROOM_LEVELS)
-            nexus_room = self.rooms[nexus_room_index]
-        except ValueError:
+        nexus_room_index = self._room_indices.get(ValidRoomType.ADJACENT_ROOM_LEVELS)
+        if nexus_room_index is None:
             return
+        nexus_room = self.rooms[nexus_room_index]
         connections_to_upgrade = [room for room in nexus_room.connections if room.tier > 0]
         if len(connections_to_upgrade) == 0:
             return
         if 3 > nexus_room.tier < len(connections_to_upgrade):
-            connections_to_upgrade = sample(connections_to_upgrade, nexus_room.tier)
+            connections_to_upgrade = self.rng.sample(connections_to_upgrade, nexus_room.tier)
         for room in connections_to_upgrade:
             room += 1 if room.tier < 3 else 0
 
@@ -166,8 +237,9 @@ class Temple:
         if isinstance(item, int):
             return self.rooms[item]
         else:
-            index = [room.type for room in self.rooms].index(item)
-            return self.rooms[index]
+            if item not in self._room_indices:
+                raise ValueError(f"{item} is not in temple.")
+            return self.rooms[self._room_indices[item]]
 
     def __contains__(self, item: TempleRoom):
         return item in self.rooms
@@ -1,4 +1,6 @@
 class TempleRoom:
+    __slots__ = ('tier', 'type', 'index', 'connections')
+
     def __init__(self, room_tier: int = 0, room_type=None):
         """
         An object that represents a room within a temple of Atzoatl.
@@ -7,6 +9,8 @@ class TempleRoom:
         """
         self.tier = room_tier
         self.type = room_type
+        # The position of this room within its temple, see temple.ROOM_CONNECTIONS.
+        self.index: int | None = None
         self.connections: list[TempleRoom] = []
 
     def __int__(self) -> int:
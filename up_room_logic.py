@@ -96,11 +96,9 @@ def prio_adjacent_nexus(default_decision,
     if room.type is not None and room.type in target_rooms:
         return room.type
     upgrade_options = temple.get_room_upgrade_option(2 if room.tier == 0 else 1)
-    adjacent_room_types = [adjacent_room.type for adjacent_room in room.connections]
-    target_rooms_in_adjacent_rooms = [target_room in adjacent_room_types for target_room in target_rooms]
     nexus_is_upgrade_option = (ValidRoomType.ADJACENT_ROOM_LEVELS in upgrade_options
                                or room.type is ValidRoomType.ADJACENT_ROOM_LEVELS)
-    if nexus_is_upgrade_option and any(target_rooms_in_adjacent_rooms):
+    if nexus_is_upgrade_option and any(temple.is_adjacent(room, target_room) for target_room in target_rooms):
         room_type = ValidRoomType.ADJACENT_ROOM_LEVELS
     else:
         room_type = default_decision(temple=temple,